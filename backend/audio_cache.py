@@ -0,0 +1,356 @@
+"""
+Hot audio file cache.
+
+Keeps the contents of frequently served files in memory (or memory-mapped),
+bounded by a total byte budget, so repeat requests are answered without a
+stat or open. Files are immutable, so an entry only needs its stat result
+rechecked once it is `ttl` seconds old (the data is kept when it still
+matches), which is also when deletions by other processes are noticed.
+Missing files are remembered for `negative_ttl` seconds.
+
+Eviction policies, all weighted by file size:
+
+    lru      least recently used
+    lfu      least frequently used (ties: least recently used)
+    tinylfu  W-TinyLFU: a small LRU admission window in front of a segmented
+             LRU main area; a file leaving the window only enters the main
+             area if a count-min sketch of recent accesses says it is used
+             more often than the file it would displace. Resists scans of
+             one-off requests.
+"""
+
+import asyncio
+import hashlib
+import mmap
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+class LRUPolicy:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.size = 0
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+
+    def access(self, key: str):
+        self._sizes.move_to_end(key)
+
+    def admit(self, key: str, size: int) -> List[str]:
+        """Add `key`; returns the keys evicted to make room (`key` itself if it was not admitted)"""
+        if size > self.capacity:
+            return [key]
+        self._sizes[key] = size
+        self.size += size
+        evicted = []
+        while self.size > self.capacity:
+            victim, victim_size = self._sizes.popitem(last=False)
+            self.size -= victim_size
+            evicted.append(victim)
+        return evicted
+
+    def remove(self, key: str):
+        size = self._sizes.pop(key, None)
+        if size is not None:
+            self.size -= size
+
+class LFUPolicy:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.size = 0
+        self._entries: Dict[str, List[int]] = {}  # key: [size, count]
+        self._buckets: Dict[int, "OrderedDict[str, None]"] = {}
+
+    def _bucket(self, count: int) -> "OrderedDict[str, None]":
+        return self._buckets.setdefault(count, OrderedDict())
+
+    def _unlink(self, key: str, count: int):
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+
+    def access(self, key: str):
+        entry = self._entries[key]
+        self._unlink(key, entry[1])
+        entry[1] += 1
+        self._bucket(entry[1])[key] = None
+
+    def admit(self, key: str, size: int) -> List[str]:
+        if size > self.capacity:
+            return [key]
+        evicted = []
+        while self.size + size > self.capacity:
+            bucket = self._buckets[min(self._buckets)]
+            victim = next(iter(bucket))
+            evicted.append(victim)
+            self.remove(victim)
+        self._entries[key] = [size, 1]
+        self._bucket(1)[key] = None
+        self.size += size
+        return evicted
+
+    def remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._unlink(key, entry[1])
+            self.size -= entry[0]
+
+class FrequencySketch:
+    """Count-min sketch of access counts (4 rows, 4-bit counters), halved every `sample_size` accesses"""
+
+    DEPTH = 4
+    MAX_COUNT = 15
+    # One odd multiplier per row: multiply-shift of the same 64-bit key hash
+    # then gives each row its own index, so keys sharing a slot in one row
+    # rarely share one in the others
+    MULTIPLIERS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+
+    def __init__(self, width: int):
+        self.width = 1 << max(6, (width - 1).bit_length())
+        self.sample_size = 10 * self.width
+        self._shift = 64 - (self.width.bit_length() - 1)
+        self._rows = [bytearray(self.width) for _ in range(self.DEPTH)]
+        self._additions = 0
+
+    def _slots(self, key: str):
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+        for row, multiplier in zip(self._rows, self.MULTIPLIERS):
+            yield row, ((digest * multiplier) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+
+    def estimate(self, key: str) -> int:
+        return min(row[slot] for row, slot in self._slots(key))
+
+    def increment(self, key: str):
+        for row, slot in self._slots(key):
+            if row[slot] < self.MAX_COUNT:
+                row[slot] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._additions //= 2
+            for row in self._rows:
+                row[:] = bytes(count >> 1 for count in row)
+
+class TinyLFUPolicy:
+    WINDOW_SHARE = 0.01
+    PROTECTED_SHARE = 0.8
+
+    def __init__(self, capacity: int, expected_entries: int):
+        self.capacity = capacity
+        self.sketch = FrequencySketch(expected_entries)
+        self.window_capacity = int(capacity * self.WINDOW_SHARE)
+        self.main_capacity = capacity - self.window_capacity
+        self.protected_capacity = int(self.main_capacity * self.PROTECTED_SHARE)
+        self._window: "OrderedDict[str, int]" = OrderedDict()
+        self._probation: "OrderedDict[str, int]" = OrderedDict()
+        self._protected: "OrderedDict[str, int]" = OrderedDict()
+        self.window_size = self.probation_size = self.protected_size = 0
+        self.rejections = 0
+
+    @property
+    def size(self) -> int:
+        return self.window_size + self.probation_size + self.protected_size
+
+    def access(self, key: str):
+        self.sketch.increment(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+        elif key in self._probation:
+            # Promote, demoting the protected segment's oldest entries if it overflows
+            size = self._probation.pop(key)
+            self.probation_size -= size
+            self._protected[key] = size
+            self.protected_size += size
+            while self.protected_size > self.protected_capacity and len(self._protected) > 1:
+                demoted, demoted_size = self._protected.popitem(last=False)
+                self.protected_size -= demoted_size
+                self._probation[demoted] = demoted_size
+                self.probation_size += demoted_size
+
+    def admit(self, key: str, size: int) -> List[str]:
+        self.sketch.increment(key)
+        if size > self.main_capacity:
+            return [key]
+        if size > self.window_capacity:
+            return self._admit_main(key, size)  # larger than the window: competes for the main area directly
+        self._window[key] = size
+        self.window_size += size
+        evicted = []
+        while self.window_size > self.window_capacity:
+            candidate, candidate_size = self._window.popitem(last=False)
+            self.window_size -= candidate_size
+            evicted += self._admit_main(candidate, candidate_size)
+        return evicted
+
+    def _admit_main(self, key: str, size: int) -> List[str]:
+        """Move a candidate into probation if it is used more often than everything it displaces"""
+        frequency = self.sketch.estimate(key)
+        victims = []
+        room = self.main_capacity - self.probation_size - self.protected_size
+        for segment in (self._probation, self._protected):
+            for victim, victim_size in segment.items():
+                if room >= size:
+                    break
+                if self.sketch.estimate(victim) >= frequency:
+                    self.rejections += 1
+                    return [key]
+                victims.append(victim)
+                room += victim_size
+        for victim in victims:
+            self.remove(victim)
+        self._probation[key] = size
+        self.probation_size += size
+        return victims
+
+    def remove(self, key: str):
+        if key in self._window:
+            self.window_size -= self._window.pop(key)
+        elif key in self._probation:
+            self.probation_size -= self._probation.pop(key)
+        elif key in self._protected:
+            self.protected_size -= self._protected.pop(key)
+
+def make_policy(name: str, capacity: int, expected_entries: int):
+    if name == 'lru':
+        return LRUPolicy(capacity)
+    if name == 'lfu':
+        return LFUPolicy(capacity)
+    if name == 'tinylfu':
+        return TinyLFUPolicy(capacity, expected_entries)
+    raise ValueError(f"Unknown cache policy: {name}")
+
+class CachedFile:
+    """A file's stat result and, when cached, its contents (bytes or an mmap)"""
+
+    __slots__ = ("stat", "data", "checked_at")
+
+    def __init__(self, stat: os.stat_result, data: Union[bytes, mmap.mmap, None], checked_at: float):
+        self.stat = stat
+        self.data = data
+        self.checked_at = checked_at
+
+class HotFileCache:
+    """Files by path, in memory within `capacity` bytes; see the module docstring"""
+
+    def __init__(
+        self, capacity: int, max_file_bytes: int, policy: str = 'tinylfu', storage: str = 'memory',
+        ttl: float = 300, negative_ttl: float = 10, max_negative: int = 10000, expected_file_bytes: int = 4 * 1024 * 1024
+    ):
+        if storage not in ('memory', 'mmap'):
+            raise ValueError(f"Unknown cache storage: {storage}")
+        self.capacity = max(0, capacity)
+        self.max_file_bytes = min(max_file_bytes, self.capacity)
+        self.policy_name = policy
+        self.policy = make_policy(policy, self.capacity, max(1, self.capacity // expected_file_bytes))
+        self.storage = storage
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_negative = max_negative
+        self._entries: Dict[str, CachedFile] = {}
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self._loads: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self.uncacheable = 0
+
+    async def get(self, path: Path) -> CachedFile:
+        """The file at `path`; FileNotFoundError if there is none"""
+        key = str(path)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and now - entry.checked_at < self.ttl:
+            self.hits += 1
+            self.policy.access(key)
+            return entry
+        missing_since = self._missing.get(key)
+        if missing_since is not None:
+            if now - missing_since < self.negative_ttl:
+                self.negative_hits += 1
+                raise FileNotFoundError(key)
+            del self._missing[key]
+
+        load = self._loads.get(key)
+        if load is None:
+            load = asyncio.ensure_future(self._load(key, path, entry))
+            self._loads[key] = load
+            load.add_done_callback(lambda _: self._loads.pop(key, None))
+        return await asyncio.shield(load)
+
+    async def _load(self, key: str, path: Path, stale: Optional[CachedFile]) -> CachedFile:
+        try:
+            stat = await asyncio.to_thread(os.stat, path)
+        except FileNotFoundError:
+            self.misses += 1
+            self._forget(key)
+            self._missing[key] = time.monotonic()
+            while len(self._missing) > self.max_negative:
+                self._missing.popitem(last=False)
+            raise
+        if stale is not None and (stale.stat.st_size, stale.stat.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            self.revalidations += 1
+            self.hits += 1
+            stale.checked_at = time.monotonic()
+            self.policy.access(key)
+            return stale
+
+        self.misses += 1
+        self._forget(key)
+        if not 0 < stat.st_size <= self.max_file_bytes:
+            self.uncacheable += 1
+            return CachedFile(stat, None, time.monotonic())
+        try:
+            data = await asyncio.to_thread(self._read, path)
+        except FileNotFoundError:
+            return await self._load(key, path, None)
+        entry = CachedFile(stat, data, time.monotonic())
+        evicted = self.policy.admit(key, stat.st_size)
+        if key not in evicted:
+            self._entries[key] = entry
+        for victim in evicted:
+            if victim != key:
+                self._entries.pop(victim, None)
+                self.evictions += 1
+        return entry
+
+    def _read(self, path: Path) -> Union[bytes, mmap.mmap]:
+        with open(path, 'rb') as f:
+            if self.storage == 'mmap':
+                # Closed when the last reference (a response still sending it, say) goes away
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return f.read()
+
+    def _forget(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self.policy.remove(key)
+
+    def invalidate(self, path: Path):
+        """Drop what is known about `path` (it was created, replaced or deleted)"""
+        key = str(path)
+        self._forget(key)
+        self._missing.pop(key, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.negative_hits
+        return {
+            "policy": self.policy_name,
+            "storage": self.storage,
+            "entries": len(self._entries),
+            "bytes": self.policy.size,
+            "capacity_bytes": self.capacity,
+            "max_file_bytes": self.max_file_bytes,
+            "negative_entries": len(self._missing),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "admission_rejections": getattr(self.policy, 'rejections', 0),
+            "uncacheable": self.uncacheable
+        }
@@ -0,0 +1,150 @@
+"""
+Waveform peak pyramids.
+
+For an uncompressed WAV or AIFF file, computes min/max peaks (all channels
+merged) at a base resolution of `base` samples per peak and at every power
+of two above it, until a level has fewer than MIN_PEAKS peaks. Samples are
+read through a memory map in blocks, so memory use does not grow with the
+file, and reduced with vectorized NumPy.
+
+The pyramid is one file, stored next to the audio:
+
+    header  "BLPK", version u16, level count u16, sample rate u32, bits u8, 3 pad bytes
+    index   per level: samples per peak u32, peak count u32, offset u64, size u64
+    levels  each a complete audiowaveform v2 .dat document (24-byte header,
+            then interleaved int8 or int16 min/max pairs), served as is
+
+Blocking file I/O and CPU work: call it from a worker thread.
+"""
+
+import os
+import struct
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from audio_probe import locate_pcm
+
+MAGIC = b'BLPK'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIB3x')
+ENTRY = struct.Struct('<IIQQ')
+DAT_HEADER = struct.Struct('<iIiiIi')  # version 2, flags, sample rate, samples per peak, length, channels
+DAT_FLAG_8_BIT = 0x1
+MIN_PEAKS = 64
+MAX_LEVELS = 20
+BLOCK_PEAKS = 4096  # peaks computed per block read from the file
+
+def sample_array(pcm: Dict[str, Any], raw: np.ndarray) -> Tuple[np.ndarray, float, float]:
+    """Samples from raw bytes, with the (offset, scale) that maps them to -1..1"""
+    width, order = pcm['sample_width'], pcm['byteorder']
+    if pcm['encoding'] == 'float':
+        return raw.view(f'{order}f{width}'), 0.0, 1.0
+    if pcm['encoding'] == 'uint':
+        return raw.view('u1'), 128.0, 128.0
+    if width == 3:
+        triplets = raw.reshape(-1, 3).astype(np.int32)
+        if order == '>':
+            triplets = triplets[:, ::-1]
+        values = triplets[:, 0] | (triplets[:, 1] << 8) | (triplets[:, 2] << 16)
+        return (values << 8) >> 8, 0.0, float(1 << 23)  # sign-extend from 24 bits
+    return raw.view(f'{order}i{width}'), 0.0, float(1 << (8 * width - 1))
+
+def base_peaks(path, pcm: Dict[str, Any], base: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalised (mins, maxs) at `base` samples per peak"""
+    frame_bytes = pcm['sample_width'] * pcm['channels']
+    frames = pcm['frames']
+    count = -(-frames // base)
+    mins = np.empty(count, dtype=np.float32)
+    maxs = np.empty(count, dtype=np.float32)
+    if not frames:
+        return mins, maxs
+    data = np.memmap(path, dtype=np.uint8, mode='r', offset=pcm['offset'], shape=(frames * frame_bytes,))
+    try:
+        block_frames = BLOCK_PEAKS * base
+        for first in range(0, frames, block_frames):
+            last = min(frames, first + block_frames)
+            samples, zero, scale = sample_array(pcm, np.asarray(data[first * frame_bytes:last * frame_bytes]))
+            samples = samples.reshape(-1, pcm['channels'])
+            peak = first // base
+            full = (last - first) // base
+            if full:
+                bins = samples[:full * base].reshape(full, base * pcm['channels'])
+                mins[peak:peak + full] = (bins.min(axis=1) - zero) / scale
+                maxs[peak:peak + full] = (bins.max(axis=1) - zero) / scale
+            if full * base < last - first:  # the partial peak at the end of the file
+                rest = samples[full * base:]
+                mins[peak + full] = (rest.min() - zero) / scale
+                maxs[peak + full] = (rest.max() - zero) / scale
+    finally:
+        del data
+    return mins, maxs
+
+def halve(mins: np.ndarray, maxs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    if len(mins) % 2:
+        mins, maxs = np.append(mins, mins[-1]), np.append(maxs, maxs[-1])
+    return mins.reshape(-1, 2).min(axis=1), maxs.reshape(-1, 2).max(axis=1)
+
+def dat_document(mins: np.ndarray, maxs: np.ndarray, sample_rate: int, samples_per_peak: int, bits: int) -> bytes:
+    full_scale = 127 if bits == 8 else 32767
+    dtype = '<i1' if bits == 8 else '<i2'
+    pairs = np.empty((len(mins), 2), dtype=dtype)
+    # Round outwards so quiet peaks never vanish
+    pairs[:, 0] = np.clip(np.floor(mins * full_scale), -full_scale - 1, full_scale)
+    pairs[:, 1] = np.clip(np.ceil(maxs * full_scale), -full_scale - 1, full_scale)
+    header = DAT_HEADER.pack(2, DAT_FLAG_8_BIT if bits == 8 else 0, sample_rate, samples_per_peak, len(mins), 1)
+    return header + pairs.tobytes()
+
+def build_peaks(audio_path, peaks_path, bits: int = 8, base: int = 256) -> bool:
+    """Write the peak pyramid of `audio_path` to `peaks_path`; False if the format cannot be read"""
+    pcm = locate_pcm(audio_path)
+    if pcm is None or not pcm['sample_rate']:
+        return False
+    mins, maxs = base_peaks(audio_path, pcm, base)
+    documents: List[Tuple[int, int, bytes]] = []
+    samples_per_peak = base
+    while True:
+        documents.append((samples_per_peak, len(mins), dat_document(mins, maxs, pcm['sample_rate'], samples_per_peak, bits)))
+        if len(mins) < 2 * MIN_PEAKS or len(documents) == MAX_LEVELS:
+            break
+        mins, maxs = halve(mins, maxs)
+        samples_per_peak *= 2
+
+    peaks_path = Path(peaks_path)
+    temp_path = peaks_path.with_name(f".{uuid.uuid4()}.peaks")
+    offset = HEADER.size + ENTRY.size * len(documents)
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(documents), pcm['sample_rate'], bits))
+            for samples_per_peak, length, document in documents:
+                f.write(ENTRY.pack(samples_per_peak, length, offset, len(document)))
+                offset += len(document)
+            for _, _, document in documents:
+                f.write(document)
+        os.replace(temp_path, peaks_path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    return True
+
+def peak_index(data: bytes) -> Dict[str, Any]:
+    """The header and level index of a peak pyramid file's contents"""
+    magic, version, count, sample_rate, bits = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a peak pyramid")
+    entries = [ENTRY.unpack_from(data, HEADER.size + ENTRY.size * level) for level in range(count)]
+    return {
+        "sample_rate": sample_rate,
+        "bits": bits,
+        "levels": [
+            {"level": level, "samples_per_peak": samples_per_peak, "length": length, "offset": offset, "size": size}
+            for level, (samples_per_peak, length, offset, size) in enumerate(entries)
+        ],
+    }
+
+def peak_level(data: bytes, level: int) -> bytes:
+    """The audiowaveform .dat document of one level (IndexError if there is no such level)"""
+    entry = peak_index(data)['levels'][level]
+    return data[entry['offset']:entry['offset'] + entry['size']]
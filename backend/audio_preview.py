@@ -0,0 +1,114 @@
+"""
+Preview renditions.
+
+For an uncompressed WAV or AIFF file, writes a small WAV for scrubbing and
+browsing: resampled to at most `sample_rate`, mixed down to at most
+`channels` (1 or 2) and requantized to at most `bits` (8 or 16). The source's
+own rate, channel count and sample width are never exceeded, so a preview is
+no larger than its original (one already within the limits is rewritten
+without resampling). A 48 kHz 24-bit stereo upload becomes about a ninth of
+its size at the 16 kHz mono 16-bit defaults.
+
+Resampling (skipped when the rate does not change) is windowed-sinc
+interpolation (Kaiser window) with the cutoff lowered to the output Nyquist
+frequency, so it also serves as the anti-aliasing filter. The kernel is
+tabulated at PHASES fractional positions between input frames (a polyphase
+filter bank). Samples are read through a memory map in blocks of output
+frames, so memory use does not grow with the file.
+
+Blocking file I/O and CPU work: call it from a worker thread or process.
+"""
+
+import os
+import uuid
+import wave
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+from audio_probe import locate_pcm
+from audio_peaks import sample_array
+
+ZERO_CROSSINGS = 8  # per side of the interpolation kernel, at the cutoff frequency
+KAISER_BETA = 8.0
+ROLLOFF = 0.94  # cutoff as a fraction of the lower Nyquist frequency
+PHASES = 512  # fractional positions the kernel is tabulated at
+BLOCK_FRAMES = 16384  # output frames computed per block
+
+def read_frames(data: np.ndarray, pcm: Dict[str, Any], first: int, last: int) -> np.ndarray:
+    """Frames first..last (clamped to the file, zero outside it) as float32 in -1..1, shape (frames, channels)"""
+    frame_bytes = pcm['sample_width'] * pcm['channels']
+    lo, hi = max(first, 0), min(last, pcm['frames'])
+    out = np.zeros((last - first, pcm['channels']), dtype=np.float32)
+    if lo < hi:
+        samples, zero, scale = sample_array(pcm, np.asarray(data[lo * frame_bytes:hi * frame_bytes]))
+        out[lo - first:hi - first] = (samples.reshape(-1, pcm['channels']) - zero) / scale
+    return out
+
+def kernel_table(cutoff: float, half: int) -> np.ndarray:
+    """Interpolation weights per fractional phase (PHASES + 1 rows), each summing to one"""
+    taps = np.arange(-half + 1, half + 1)
+    offsets = taps[None, :] - (np.arange(PHASES + 1) / PHASES)[:, None]
+    window = np.i0(KAISER_BETA * np.sqrt(np.clip(1 - (offsets / half) ** 2, 0, None))) / np.i0(KAISER_BETA)
+    table = np.sinc(cutoff * offsets) * window
+    return (table / table.sum(axis=1, keepdims=True)).astype(np.float32)  # unity gain at DC
+
+def mix(frames: np.ndarray, channels: int) -> np.ndarray:
+    if frames.shape[1] == channels:
+        return frames
+    if channels == 1:
+        return frames.mean(axis=1, keepdims=True)
+    return np.repeat(frames[:, :1], 2, axis=1) if frames.shape[1] == 1 else frames[:, :2]
+
+def quantize(samples: np.ndarray, bits: int) -> bytes:
+    if bits == 8:  # WAV stores 8-bit samples unsigned
+        return np.clip(np.round(samples * 127.0) + 128, 0, 255).astype('u1').tobytes()
+    return np.clip(np.round(samples * 32767.0), -32768, 32767).astype('<i2').tobytes()
+
+def build_preview(audio_path, preview_path, sample_rate: int = 16000, channels: int = 1, bits: int = 16) -> bool:
+    """Write the preview rendition of `audio_path` to `preview_path`; False if the format cannot be read"""
+    pcm = locate_pcm(audio_path)
+    if pcm is None or not pcm['sample_rate'] or not pcm['channels']:
+        return False
+    sample_rate = min(sample_rate, pcm['sample_rate'])
+    channels = min(channels, pcm['channels'])
+    bits = min(bits, 8 * pcm['sample_width'])
+    ratio = pcm['sample_rate'] / sample_rate  # input frames per output frame, at least 1
+    if ratio > 1:
+        cutoff = ROLLOFF / ratio  # in cycles per input frame, times two
+        half = int(np.ceil(ZERO_CROSSINGS / cutoff))
+        table = kernel_table(cutoff, half)
+    out_frames = int(pcm['frames'] / ratio)
+
+    preview_path = Path(preview_path)
+    temp_path = preview_path.with_name(f".{uuid.uuid4()}.preview")
+    frame_bytes = pcm['sample_width'] * pcm['channels']
+    data = None
+    if pcm['frames']:
+        data = np.memmap(audio_path, dtype=np.uint8, mode='r', offset=pcm['offset'], shape=(pcm['frames'] * frame_bytes,))
+    try:
+        with wave.open(str(temp_path), 'wb') as w:
+            w.setnchannels(channels)
+            w.setsampwidth(bits // 8)
+            w.setframerate(sample_rate)
+            for first in range(0, out_frames, BLOCK_FRAMES):
+                last = min(out_frames, first + BLOCK_FRAMES)
+                if ratio == 1:
+                    block = mix(read_frames(data, pcm, first, last), channels)
+                else:
+                    positions = np.arange(first, last) * ratio
+                    base = np.floor(positions).astype(np.int64)
+                    phase = np.round((positions - base) * PHASES).astype(np.int64)
+                    source = mix(read_frames(data, pcm, base[0] - half + 1, base[-1] + half + 1), channels)
+                    block = np.empty((len(base), channels), dtype=np.float32)
+                    windows = (base - base[0])[:, None] + np.arange(2 * half)[None, :]
+                    for channel in range(channels):
+                        block[:, channel] = np.einsum('ft,ft->f', table[phase], source[windows, channel])
+                w.writeframes(quantize(block, bits))
+        os.replace(temp_path, preview_path)
+    finally:
+        del data
+        if temp_path.exists():
+            temp_path.unlink()
+    return True
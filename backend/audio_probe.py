@@ -0,0 +1,344 @@
+"""
+Header-only audio metadata probe.
+
+Reads the container headers of WAV (RIFF, RIFX, RF64), AIFF/AIFC, FLAC, MP3
+and Ogg (Vorbis, Opus, FLAC) files and reports duration, sample rate, channel
+count and bit depth without decoding any audio. Only a few kilobytes at the
+start of the file are read (plus the last page of an Ogg stream and the last
+128 bytes of an MP3); chunks in between are skipped with seek().
+
+Blocking file I/O: call it from a worker thread.
+"""
+
+import os
+import struct
+from typing import Any, BinaryIO, Dict, Optional
+
+HEAD_BYTES = 64 * 1024
+OGG_TAIL_BYTES = 64 * 1024
+
+def probe_audio(path) -> Optional[Dict[str, Any]]:
+    """
+    Return {"format", "duration", "sample_rate", "channels", "bit_depth"} for
+    a supported audio file, or None if the format is not recognised or the
+    headers are damaged. bit_depth is None for lossy formats, duration is
+    None when the headers do not say how long the stream is.
+    """
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            head = f.read(HEAD_BYTES)
+            for magic, probe in PROBES:
+                if head.startswith(magic):
+                    return probe(f, head, size)
+            if head[:3] == b'ID3' or is_mpeg_sync(head, 0):
+                return probe_id3_wrapped(f, head, size)
+    except (OSError, ValueError, struct.error, IndexError):
+        return None
+    return None
+
+def audio_info(fmt: str, sample_rate: int, channels: int, bit_depth: Optional[int], frames: Optional[float]) -> Dict[str, Any]:
+    if not sample_rate or not channels:
+        raise ValueError("missing sample rate or channel count")
+    return {
+        "format": fmt,
+        "duration": round(frames / sample_rate, 6) if frames is not None else None,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "bit_depth": bit_depth,
+    }
+
+# WAV
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def read_wav_layout(f: BinaryIO, head: bytes, size: int) -> Dict[str, Any]:
+    """The fmt fields of a WAV file and where its data chunk is"""
+    endian = '>' if head[:4] == b'RIFX' else '<'
+    if head[8:12] != b'WAVE':
+        raise ValueError("not a WAVE file")
+    layout: Dict[str, Any] = {"byteorder": endian, "data_offset": None, "data_size": None, "fact_frames": None}
+    ds64_data_size = None
+    offset = 12
+    while offset + 8 <= size and ('format_tag' not in layout or layout['data_offset'] is None):
+        f.seek(offset)
+        chunk_id, chunk_size = struct.unpack(endian + '4sI', f.read(8))
+        if chunk_id == b'fmt ':
+            fmt = f.read(min(chunk_size, 40))
+            (layout['format_tag'], layout['channels'], layout['sample_rate'],
+             layout['byte_rate'], layout['block_align'], layout['bits']) = struct.unpack(endian + 'HHIIHH', fmt[:16])
+            if layout['format_tag'] == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                layout['format_tag'], = struct.unpack(endian + 'H', fmt[24:26])  # first two bytes of the SubFormat GUID
+        elif chunk_id == b'ds64':
+            _, ds64_data_size = struct.unpack(endian + 'QQ', f.read(16))
+        elif chunk_id == b'fact':
+            layout['fact_frames'], = struct.unpack(endian + 'I', f.read(4))
+        elif chunk_id == b'data':
+            data_size = ds64_data_size if chunk_size == 0xFFFFFFFF and ds64_data_size is not None else chunk_size
+            layout['data_offset'] = offset + 8
+            layout['data_size'] = min(data_size, size - offset - 8)  # a truncated file plays what is there
+        offset += 8 + chunk_size + (chunk_size & 1)
+    if 'format_tag' not in layout:
+        raise ValueError("no fmt chunk")
+    return layout
+
+def probe_wav(f: BinaryIO, head: bytes, size: int) -> Dict[str, Any]:
+    layout = read_wav_layout(f, head, size)
+    sample_rate, channels, bits, data_size = layout['sample_rate'], layout['channels'], layout['bits'], layout['data_size']
+    if layout['format_tag'] in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT) and layout['block_align']:
+        frames = data_size // layout['block_align'] if data_size is not None else None
+        return audio_info("wav", sample_rate, channels, bits, frames)
+    # Compressed WAV (ADPCM, GSM, MP3...): the fact chunk counts frames, else estimate from the byte rate
+    if layout['fact_frames'] is not None:
+        frames = layout['fact_frames']
+    elif data_size is not None and layout['byte_rate']:
+        frames = data_size / layout['byte_rate'] * sample_rate
+    else:
+        frames = None
+    return audio_info("wav", sample_rate, channels, bits or None, frames)
+
+# AIFF
+AIFC_PCM = {b'NONE': ('>', 'int'), b'twos': ('>', 'int'), b'sowt': ('<', 'int'), b'fl32': ('>', 'float'), b'FL32': ('>', 'float'),
+            b'fl64': ('>', 'float'), b'FL64': ('>', 'float')}
+
+def extended_to_float(data: bytes) -> float:
+    """80-bit IEEE 754 extended precision (the AIFF sample rate)"""
+    exponent, mantissa = struct.unpack('>HQ', data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+def read_aiff_layout(f: BinaryIO, head: bytes, size: int) -> Dict[str, Any]:
+    """The COMM fields of an AIFF/AIFC file and where its sound data is"""
+    if head[8:12] not in (b'AIFF', b'AIFC'):
+        raise ValueError("not an AIFF file")
+    layout: Dict[str, Any] = {"compression": b'NONE', "data_offset": None}
+    offset = 12
+    while offset + 8 <= size and ('channels' not in layout or layout['data_offset'] is None):
+        f.seek(offset)
+        chunk_id, chunk_size = struct.unpack('>4sI', f.read(8))
+        if chunk_id == b'COMM':
+            layout['channels'], layout['frames'], layout['bits'] = struct.unpack('>HIH', f.read(8))
+            layout['sample_rate'] = int(round(extended_to_float(f.read(10))))
+            if head[8:12] == b'AIFC' and chunk_size >= 22:
+                layout['compression'] = f.read(4)
+        elif chunk_id == b'SSND':
+            data_offset, _ = struct.unpack('>II', f.read(8))
+            layout['data_offset'] = offset + 16 + data_offset
+        offset += 8 + chunk_size + (chunk_size & 1)
+    if 'channels' not in layout:
+        raise ValueError("no COMM chunk")
+    return layout
+
+def probe_aiff(f: BinaryIO, head: bytes, size: int) -> Dict[str, Any]:
+    layout = read_aiff_layout(f, head, size)
+    bits = layout['bits'] if layout['compression'] in AIFC_PCM else None
+    return audio_info("aiff", layout['sample_rate'], layout['channels'], bits, layout['frames'])
+
+# FLAC
+def parse_streaminfo(block: bytes, fmt: str = "flac") -> Dict[str, Any]:
+    """The 34-byte STREAMINFO metadata block"""
+    packed, = struct.unpack('>Q', block[10:18])
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    bits = ((packed >> 36) & 0x1F) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    return audio_info(fmt, sample_rate, channels, bits, total_samples or None)
+
+def probe_flac(f: BinaryIO, head: bytes, size: int, start: int = 0) -> Dict[str, Any]:
+    block_header = head[start + 4:start + 8]
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        raise ValueError("FLAC stream does not start with STREAMINFO")
+    return parse_streaminfo(head[start + 8:start + 8 + 34])
+
+# MP3
+MPEG_BITRATES = {  # kbit/s by (version is MPEG-1, layer), index 1..14
+    (True, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def is_mpeg_sync(data: bytes, offset: int) -> bool:
+    return offset + 1 < len(data) and data[offset] == 0xFF and data[offset + 1] & 0xE0 == 0xE0
+
+def parse_mpeg_header(data: bytes, offset: int) -> Optional[Dict[str, Any]]:
+    if offset + 4 > len(data) or not is_mpeg_sync(data, offset):
+        return None
+    header, = struct.unpack('>I', data[offset:offset + 4])
+    version = (header >> 19) & 0x3  # 3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5
+    layer = 4 - ((header >> 17) & 0x3)
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 0x3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = MPEG_BITRATES[(mpeg1, layer)][bitrate_index - 1] * 1000
+    sample_rate = MPEG_SAMPLE_RATES[version][rate_index]
+    padding = (header >> 9) & 0x1
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 3 and not mpeg1:
+        samples, length = 576, 72 * bitrate // sample_rate + padding
+    else:
+        samples, length = 1152, 144 * bitrate // sample_rate + padding
+    return {
+        "mpeg1": mpeg1, "layer": layer, "bitrate": bitrate, "sample_rate": sample_rate,
+        "channels": 1 if (header >> 6) & 0x3 == 3 else 2, "samples": samples, "length": length,
+    }
+
+def find_mpeg_frame(data: bytes, start: int) -> Optional[int]:
+    """First frame header at or after `start` that is followed by another valid one"""
+    offset = data.find(b'\xff', start)
+    while 0 <= offset < len(data) - 4:
+        frame = parse_mpeg_header(data, offset)
+        if frame:
+            following = offset + frame['length']
+            if following + 4 > len(data) or parse_mpeg_header(data, following):
+                return offset
+        offset = data.find(b'\xff', offset + 1)
+    return None
+
+def probe_mp3(f: BinaryIO, head: bytes, size: int, start: int, base: int = 0) -> Dict[str, Any]:
+    """`head` holds the file from byte `base` on; the first frame is searched from head[start:]"""
+    offset = find_mpeg_frame(head, start)
+    if offset is None:
+        raise ValueError("no MPEG audio frame")
+    frame = parse_mpeg_header(head, offset)
+
+    # VBR files carry a frame count in a Xing/Info or VBRI header in the first frame
+    side_info = (32 if frame['channels'] == 2 else 17) if frame['mpeg1'] else (17 if frame['channels'] == 2 else 9)
+    xing = offset + 4 + side_info
+    frames = None
+    if head[xing:xing + 4] in (b'Xing', b'Info'):
+        flags, = struct.unpack('>I', head[xing + 4:xing + 8])
+        if flags & 0x1:
+            frames, = struct.unpack('>I', head[xing + 8:xing + 12])
+    elif head[offset + 36:offset + 40] == b'VBRI':
+        frames, = struct.unpack('>I', head[offset + 50:offset + 54])
+
+    if frames is not None:
+        total_samples = frames * frame['samples']
+    else:
+        # CBR: the audio is everything between the tags, at the first frame's bitrate
+        end = size
+        f.seek(max(0, size - 128))
+        if f.read(3) == b'TAG':
+            end -= 128
+        total_samples = (end - base - offset) * 8 / frame['bitrate'] * frame['sample_rate']
+    return audio_info("mp3", frame['sample_rate'], frame['channels'], None, total_samples)
+
+def id3v2_length(head: bytes) -> int:
+    if head[:3] != b'ID3' or len(head) < 10:
+        return 0
+    length = 10 + ((head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | (head[9] & 0x7F))
+    return length + 10 if head[5] & 0x10 else length  # footer present
+
+def probe_id3_wrapped(f: BinaryIO, head: bytes, size: int) -> Dict[str, Any]:
+    """MP3, or a FLAC stream some taggers prefix with an ID3v2 tag"""
+    start, base = id3v2_length(head), 0
+    if start + 4096 > len(head) and size > len(head):
+        # A large tag (cover art): read on from where it ends
+        f.seek(start)
+        head, base, start = f.read(HEAD_BYTES), start, 0
+    if head[start:start + 4] == b'fLaC':
+        return probe_flac(f, head, size, start)
+    return probe_mp3(f, head, size, start, base)
+
+# Ogg
+def ogg_pages(data: bytes):
+    """(offset, granule position, serial, first packet bytes) for each page header in `data`"""
+    offset = data.find(b'OggS')
+    while 0 <= offset and offset + 27 <= len(data):
+        if data[offset + 4] != 0:  # stream structure version; anything else is audio data that looks like a capture pattern
+            offset = data.find(b'OggS', offset + 4)
+            continue
+        granule, serial = struct.unpack('<qI', data[offset + 6:offset + 18])
+        segments = data[offset + 26]
+        body = offset + 27 + segments
+        yield offset, granule, serial, data[body:body + sum(data[offset + 27:body])]
+        offset = data.find(b'OggS', offset + 4)
+
+def probe_ogg(f: BinaryIO, head: bytes, size: int) -> Dict[str, Any]:
+    _, _, serial, packet = next(ogg_pages(head))
+    pre_skip = 0
+    if packet[:7] == b'\x01vorbis':
+        channels, sample_rate = struct.unpack('<BI', packet[11:16])
+        info = audio_info("ogg", sample_rate, channels, None, None)
+        granule_rate = sample_rate
+    elif packet[:8] == b'OpusHead':
+        channels, pre_skip = struct.unpack('<BH', packet[9:12])
+        info = audio_info("opus", 48000, channels, None, None)  # Opus always decodes at 48 kHz
+        granule_rate = 48000
+    elif packet[:5] == b'\x7fFLAC' and packet[9:13] == b'fLaC':
+        info = parse_streaminfo(packet[17:17 + 34], "ogg")
+        granule_rate = info['sample_rate']
+    else:
+        raise ValueError("unsupported Ogg codec")
+
+    # The granule position of the stream's last page is its length in samples
+    f.seek(max(0, size - OGG_TAIL_BYTES))
+    last = None
+    for _, granule, page_serial, _ in ogg_pages(f.read(OGG_TAIL_BYTES)):
+        if page_serial == serial and granule >= 0:
+            last = granule
+    if last is not None:
+        info['duration'] = round(max(0, last - pre_skip) / granule_rate, 6)
+    return info
+
+def locate_pcm(path) -> Optional[Dict[str, Any]]:
+    """
+    Where the samples of an uncompressed WAV or AIFF file are, for reading them
+    directly: {"offset", "frames", "channels", "sample_rate", "sample_width"
+    (bytes), "encoding" ("int", "uint" or "float"), "byteorder" ("<" or ">")}.
+    None for other formats, which need a decoder.
+    """
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            head = f.read(HEAD_BYTES)
+            if head[:4] in (b'RIFF', b'RIFX', b'RF64'):
+                layout = read_wav_layout(f, head, size)
+                if layout['format_tag'] not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT) or layout['data_offset'] is None:
+                    return None
+                width = layout['block_align'] // layout['channels'] if layout['channels'] else 0
+                frames = layout['data_size'] // layout['block_align'] if layout['block_align'] else 0
+                if layout['format_tag'] == WAVE_FORMAT_IEEE_FLOAT:
+                    encoding = "float"
+                else:
+                    encoding = "uint" if width == 1 else "int"  # 8-bit WAV is unsigned
+                byteorder = layout['byteorder']
+            elif head[:4] == b'FORM':
+                layout = read_aiff_layout(f, head, size)
+                if layout['compression'] not in AIFC_PCM or layout['data_offset'] is None:
+                    return None
+                byteorder, encoding = AIFC_PCM[layout['compression']]
+                width = (layout['bits'] + 7) // 8
+                if encoding == "float":
+                    width = 8 if layout['compression'] in (b'fl64', b'FL64') else 4
+                frames = min(layout['frames'], (size - layout['data_offset']) // max(1, width * layout['channels']))
+            else:
+                return None
+    except (OSError, ValueError, struct.error, IndexError):
+        return None
+    if width not in (1, 2, 3, 4, 8) or not layout['channels'] or (encoding == "float" and width not in (4, 8)):
+        return None
+    return {
+        "offset": layout['data_offset'], "frames": frames, "channels": layout['channels'],
+        "sample_rate": layout['sample_rate'], "sample_width": width, "encoding": encoding, "byteorder": byteorder,
+    }
+
+PROBES = (
+    (b'RIFF', probe_wav),
+    (b'RIFX', probe_wav),
+    (b'RF64', probe_wav),
+    (b'FORM', probe_aiff),
+    (b'fLaC', probe_flac),
+    (b'OggS', probe_ogg),
+)
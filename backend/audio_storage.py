@@ -0,0 +1,178 @@
+"""
+Audio object storage.
+
+Stored audio and everything derived from it (peaks, previews) are objects
+addressed by key: a file id such as "{sha256}.wav", or a file id plus a
+suffix. Uploads are always received into a local scratch directory first
+and handed to the storage once complete; processing that needs a real file
+works on a local copy. Drivers:
+
+    local  objects are files in one directory (the default)
+    s3     objects live in an S3 bucket, or any S3-compatible store (MinIO,
+           Ceph, a moto server...) through an endpoint URL. Large files go
+           up as multipart uploads, and downloads are redirects to presigned
+           URLs, so API workers never proxy audio bytes.
+
+All methods are coroutines; blocking I/O runs in worker threads.
+"""
+
+import asyncio
+import mimetypes
+import os
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+def content_type(key: str) -> str:
+    """The media type an object is stored with, matching what local storage serves it as"""
+    if key.endswith('.preview.wav'):
+        return "audio/wav"
+    media_type, _ = mimetypes.guess_type(key)
+    return media_type or "application/octet-stream"
+
+class LocalStorage:
+    name = "local"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        """Where an object lives on disk (local storage only)"""
+        return self.root / key
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.path(key).exists)
+
+    async def put_file(self, source: Path, key: str):
+        """Store a complete local file under `key`, consuming it"""
+        await asyncio.to_thread(os.replace, source, self.path(key))
+
+    async def read(self, key: str) -> bytes:
+        return await asyncio.to_thread(self.path(key).read_bytes)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.path(key).unlink, True)
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[Path]:
+        """A local file with the object's content for the duration of the block (FileNotFoundError if none)"""
+        if not await self.exists(key):
+            raise FileNotFoundError(key)
+        yield self.path(key)
+
+    @asynccontextmanager
+    async def local_output(self, key: str) -> AsyncIterator[Path]:
+        """A local path to write the object to; whatever is there after the block is stored as `key`"""
+        yield self.path(key)
+
+    def download_url(self, key: str) -> Optional[str]:
+        """A URL clients can fetch the object from directly, if the storage has one"""
+        return None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"driver": self.name}
+
+class S3Storage:
+    name = "s3"
+
+    def __init__(
+        self, bucket: str, scratch: Path, prefix: str = "", endpoint_url: Optional[str] = None,
+        region: Optional[str] = None, access_key_id: Optional[str] = None, secret_access_key: Optional[str] = None,
+        presign_ttl: int = 3600, multipart_threshold: int = 8 * 1024 * 1024,
+        multipart_chunk: int = 8 * 1024 * 1024, max_concurrency: int = 4
+    ):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.scratch = Path(scratch)
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.presign_ttl = presign_ttl
+        self.client = boto3.client(
+            's3', endpoint_url=endpoint_url, region_name=region,
+            aws_access_key_id=access_key_id, aws_secret_access_key=secret_access_key,
+            config=Config(signature_version='s3v4', max_pool_connections=max(10, 2 * max_concurrency))
+        )
+        # Files over the threshold are sent (and fetched) in parallel parts
+        self.transfer = TransferConfig(
+            multipart_threshold=multipart_threshold, multipart_chunksize=multipart_chunk,
+            max_concurrency=max_concurrency, use_threads=True
+        )
+        self.uploads = self.downloads = self.presigned = 0
+
+    def object_key(self, key: str) -> str:
+        return self.prefix + key
+
+    async def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    async def put_file(self, source: Path, key: str):
+        await asyncio.to_thread(
+            self.client.upload_file, str(source), self.bucket, self.object_key(key),
+            ExtraArgs={"ContentType": content_type(key)}, Config=self.transfer
+        )
+        self.uploads += 1
+        await asyncio.to_thread(Path(source).unlink, True)
+
+    async def read(self, key: str) -> bytes:
+        from botocore.exceptions import ClientError
+        try:
+            response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(key)
+            raise
+        return await asyncio.to_thread(response['Body'].read)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self.object_key(key))
+
+    def _scratch_path(self, key: str) -> Path:
+        return self.scratch / f".{uuid.uuid4()}.{key.rsplit('.', 1)[-1]}"
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[Path]:
+        if not await self.exists(key):
+            raise FileNotFoundError(key)
+        path = self._scratch_path(key)
+        try:
+            await asyncio.to_thread(
+                self.client.download_file, self.bucket, self.object_key(key), str(path), Config=self.transfer
+            )
+            self.downloads += 1
+            yield path
+        finally:
+            await asyncio.to_thread(path.unlink, True)
+
+    @asynccontextmanager
+    async def local_output(self, key: str) -> AsyncIterator[Path]:
+        path = self._scratch_path(key)
+        try:
+            yield path
+            if await asyncio.to_thread(path.exists):
+                await self.put_file(path, key)
+        finally:
+            await asyncio.to_thread(path.unlink, True)
+
+    def download_url(self, key: str) -> Optional[str]:
+        self.presigned += 1
+        return self.client.generate_presigned_url(
+            'get_object', Params={"Bucket": self.bucket, "Key": self.object_key(key)}, ExpiresIn=self.presign_ttl
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "driver": self.name,
+            "uploads": self.uploads,
+            "downloads": self.downloads,
+            "presigned_urls": self.presigned
+        }
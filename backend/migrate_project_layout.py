@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Online migration of legacy projects to the normalized storage layout.
+
+Moves the `tracks` array embedded in each project document (and the clips
+embedded in each track) into the `tracks` and `clips` collections. The API can
+keep serving while this runs: every project is migrated with the same
+idempotent routine the server uses for lazy migration on first access.
+
+Usage:
+    python migrate_project_layout.py [--batch-size 100] [--pause 0.1] [--dry-run]
+"""
+
+import argparse
+import asyncio
+
+from server import db, client, ensure_indexes, normalize_project_layout, PROJECT_LAYOUT
+
+
+async def migrate(batch_size: int, pause: float, dry_run: bool):
+    await ensure_indexes()
+
+    pending = {"layout": {"$ne": PROJECT_LAYOUT}}
+    total = await db.projects.count_documents(pending)
+    print(f"Projects awaiting migration: {total}")
+    if dry_run or not total:
+        return
+
+    migrated = skipped = failed = 0
+    last_id = None
+    while True:
+        query = dict(pending)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.projects.find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        for project in batch:
+            try:
+                if await normalize_project_layout(project):
+                    migrated += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                failed += 1
+                print(f"❌ Failed to migrate project {project.get('id')}: {e}")
+        last_id = batch[-1]["_id"]
+
+        print(f"Progress: {migrated} migrated, {skipped} already migrated, {failed} failed")
+        if pause:
+            await asyncio.sleep(pause)
+
+    print(f"✅ Done: {migrated} migrated, {skipped} already migrated, {failed} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate projects to the normalized tracks/clips layout")
+    parser.add_argument("--batch-size", type=int, default=100, help="projects read per batch")
+    parser.add_argument("--pause", type=float, default=0.1, help="seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="only count projects that need migration")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(migrate(args.batch_size, args.pause, args.dry_run))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,62 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import ClientDisconnect
+from multipart.multipart import MultipartParser, parse_options_header
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne, InsertOne, DeleteMany, ReplaceOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError, PyMongoError
+from bson import ObjectId
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Dict, Any, Callable, Tuple
 import uuid
+import copy
 from datetime import datetime, timedelta
 import jwt
 import bcrypt
-import shutil
 import json
 import asyncio
-import io
 import base64
+import time
+import hashlib
+import random
+import socket
+from collections import deque, OrderedDict, Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from audio_cache import CachedFile, HotFileCache
+from audio_peaks import build_peaks, peak_index, peak_level
+from audio_preview import build_preview
+from audio_probe import probe_audio
+from audio_storage import LocalStorage, S3Storage
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Create uploads directory
+# Create uploads directory (where audio is stored with local storage, and scratch space with any storage)
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Audio storage: local (files in UPLOAD_DIR) or s3 (any S3-compatible object store)
+AUDIO_STORAGE = os.environ.get('AUDIO_STORAGE', 'local')
+S3_BUCKET = os.environ.get('S3_BUCKET', '')
+S3_PREFIX = os.environ.get('S3_PREFIX', 'audio')
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None  # e.g. http://localhost:9000 for MinIO
+S3_REGION = os.environ.get('S3_REGION') or None
+S3_ACCESS_KEY_ID = os.environ.get('S3_ACCESS_KEY_ID') or None  # unset: boto3's default credential chain
+S3_SECRET_ACCESS_KEY = os.environ.get('S3_SECRET_ACCESS_KEY') or None
+S3_PRESIGN_TTL = int(os.environ.get('S3_PRESIGN_TTL', '3600'))  # lifetime of download redirect URLs
+S3_MULTIPART_THRESHOLD = int(os.environ.get('S3_MULTIPART_THRESHOLD', str(8 * 1024 * 1024)))
+S3_MULTIPART_CHUNK_BYTES = int(os.environ.get('S3_MULTIPART_CHUNK_BYTES', str(8 * 1024 * 1024)))
+S3_MAX_CONCURRENCY = int(os.environ.get('S3_MAX_CONCURRENCY', '4'))  # parallel parts per transfer
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
@@ -37,11 +68,79 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Runtime metrics, exposed to authenticated users through GET /api/metrics.
+# Sources report counters only: no hostnames, paths, buckets or other
+# infrastructure identifiers.
+METRICS_SOURCES: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+def register_metrics(name: str, source: Callable[[], Dict[str, Any]]):
+    METRICS_SOURCES[name] = source
+
 # Security
 security = HTTPBearer()
 JWT_SECRET = os.environ.get('JWT_SECRET', 'bandlab-secret-key-2025')
 JWT_ALGORITHM = 'HS256'
 
+# Password hashing pool (bcrypt is CPU bound and must stay off the event loop)
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')  # thread or process
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', '32'))
+
+# Verified principal cache (saves a users lookup on every authenticated request)
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', '10000'))
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL', '60'))
+
+# Mixer write-behind: volume/pan/mute/solo edits are merged per track and
+# written at most this many milliseconds after they arrive (0 disables)
+MIXER_WRITE_BEHIND_MS = float(os.environ.get('MIXER_WRITE_BEHIND_MS', '250'))
+MIXER_MAX_PENDING_TRACKS = int(os.environ.get('MIXER_MAX_PENDING_TRACKS', '10000'))
+
+# Audio uploads
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(50 * 1024 * 1024)))
+UPLOAD_WRITE_BUFFER_BYTES = int(os.environ.get('UPLOAD_WRITE_BUFFER_BYTES', str(1024 * 1024)))
+MAX_STEM_FILES = int(os.environ.get('MAX_STEM_FILES', '32'))  # files per /audio/upload/stems request
+
+# Upload admission control: requests over these limits get 503 before their body is read
+UPLOAD_MAX_CONCURRENT = int(os.environ.get('UPLOAD_MAX_CONCURRENT', '32'))
+UPLOAD_MAX_INFLIGHT_BYTES = int(os.environ.get('UPLOAD_MAX_INFLIGHT_BYTES', str(1024 * 1024 * 1024)))
+UPLOAD_MAX_CONCURRENT_PER_USER = int(os.environ.get('UPLOAD_MAX_CONCURRENT_PER_USER', '4'))
+UPLOAD_MAX_INFLIGHT_BYTES_PER_USER = int(os.environ.get('UPLOAD_MAX_INFLIGHT_BYTES_PER_USER', str(256 * 1024 * 1024)))
+UPLOAD_RETRY_AFTER_SECONDS = int(os.environ.get('UPLOAD_RETRY_AFTER_SECONDS', '5'))
+
+# Waveform peak pyramids
+PEAK_BITS = int(os.environ.get('PEAK_BITS', '8'))  # 8 or 16 bit min/max values
+PEAK_BASE_SAMPLES = int(os.environ.get('PEAK_BASE_SAMPLES', '256'))  # samples per peak at the most detailed level
+
+# Hot audio cache: frequently served files are kept in memory (AUDIO_CACHE_BYTES=0 disables)
+AUDIO_CACHE_BYTES = int(os.environ.get('AUDIO_CACHE_BYTES', str(256 * 1024 * 1024)))
+AUDIO_CACHE_MAX_FILE_BYTES = int(os.environ.get('AUDIO_CACHE_MAX_FILE_BYTES', str(32 * 1024 * 1024)))
+AUDIO_CACHE_POLICY = os.environ.get('AUDIO_CACHE_POLICY', 'tinylfu')  # lru, lfu or tinylfu
+AUDIO_CACHE_STORAGE = os.environ.get('AUDIO_CACHE_STORAGE', 'memory')  # memory (read into the heap) or mmap
+AUDIO_CACHE_TTL = float(os.environ.get('AUDIO_CACHE_TTL', '300'))  # seconds before a cached file is stat'ed again
+AUDIO_CACHE_NEGATIVE_TTL = float(os.environ.get('AUDIO_CACHE_NEGATIVE_TTL', '10'))  # seconds a missing file is remembered
+
+# Preview renditions (?rendition=preview): upper limits, a source below them keeps its own format
+PREVIEW_SAMPLE_RATE = int(os.environ.get('PREVIEW_SAMPLE_RATE', '16000'))
+PREVIEW_CHANNELS = int(os.environ.get('PREVIEW_CHANNELS', '1'))  # 1 (mixed down) or 2
+PREVIEW_BITS = int(os.environ.get('PREVIEW_BITS', '16'))  # 8 or 16
+
+# Background jobs
+JOB_WORKERS_ENABLED = os.environ.get('JOB_WORKERS_ENABLED', 'true').lower() == 'true'  # run workers in this process
+JOB_EXECUTOR = os.environ.get('JOB_EXECUTOR', 'process')  # thread or process, for CPU-bound job work
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', os.cpu_count() or 2))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '2'))  # seconds between polls when idle
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '60'))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', '5'))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get('JOB_RETRY_MAX_SECONDS', '600'))
+JOB_RETENTION_SECONDS = float(os.environ.get('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))  # finished jobs
+
+# Resumable upload sessions
+MAX_UPLOAD_SESSION_BYTES = int(os.environ.get('MAX_UPLOAD_SESSION_BYTES', str(500 * 1024 * 1024)))
+UPLOAD_SESSION_CHUNK_BYTES = int(os.environ.get('UPLOAD_SESSION_CHUNK_BYTES', str(8 * 1024 * 1024)))  # suggested to clients
+UPLOAD_SESSION_TTL = float(os.environ.get('UPLOAD_SESSION_TTL', str(24 * 3600)))  # seconds since the last chunk
+UPLOAD_SWEEP_INTERVAL = float(os.environ.get('UPLOAD_SWEEP_INTERVAL', '600'))
+UPLOAD_FINALIZE_LEASE_SECONDS = float(os.environ.get('UPLOAD_FINALIZE_LEASE_SECONDS', '120'))  # before a stuck completion can be retried
+
 # Authentication Models
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -84,6 +183,9 @@ class AudioClip(BaseModel):
     audio_data: Optional[str] = None  # Base64 encoded audio
     waveform_data: Optional[List[float]] = None
     effects: List[Dict[str, Any]] = []
+    sample_rate: Optional[int] = None  # Probed from the file headers on upload
+    channels: Optional[int] = None
+    bit_depth: Optional[int] = None  # None for lossy formats
 
 class Track(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -113,6 +215,20 @@ class Project(BaseModel):
     is_public: bool = False
     tags: List[str] = []
     genre: Optional[str] = None
+    version: int = 0  # Incremented on every change to the project or its tracks/clips (but see MixerWriteBuffer)
+
+class ProjectSummary(BaseModel):
+    id: str
+    name: str
+    genre: Optional[str] = None
+    tags: List[str] = []
+    updated_at: datetime
+    track_count: int = 0
+    duration: float = 0.0  # End of the last clip, in seconds
+
+class ProjectSummaryPage(BaseModel):
+    items: List[ProjectSummary]
+    next_cursor: Optional[str] = None
 
 class ProjectCreate(BaseModel):
     name: str
@@ -129,6 +245,14 @@ class ProjectUpdate(BaseModel):
     tags: Optional[List[str]] = None
     genre: Optional[str] = None
 
+class BatchOperation(BaseModel):
+    op: str  # add_track, update_track, delete_track, reorder_tracks, add_clip, update_clip, delete_clip, add_effect, update_effect, remove_effect
+    track_id: Optional[str] = None
+    clip_id: Optional[str] = None
+    index: Optional[int] = None  # track position for add_track, effect index for the effect operations
+    track_ids: Optional[List[str]] = None  # new track order for reorder_tracks
+    data: Dict[str, Any] = {}  # track, clip or effect fields
+
 # Audio Effects Models
 class EffectParameter(BaseModel):
     name: str
@@ -209,65 +333,2658 @@ class Collaboration(BaseModel):
     permissions: List[str] = ["read", "write"]
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Upload Session Models
+class UploadSessionCreate(BaseModel):
+    project_id: str
+    track_id: str
+    filename: str
+    content_type: str
+    size: int  # total bytes the client will send
+
 # Legacy Models
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     client_name: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
-class StatusCheckCreate(BaseModel):
-    client_name: str
+class StatusCheckCreate(BaseModel):
+    client_name: str
+
+# Authentication Helper Functions
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+def verify_password(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+class PasswordHashPool:
+    """
+    Bounded executor for bcrypt hashing and verification.
+
+    At most `workers` calls run at once and at most `queue_limit` more may wait;
+    anything beyond that is rejected with 503 instead of piling up.
+    """
+
+    def __init__(self, kind: str, workers: int, queue_limit: int, latency_samples: int = 1024):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown password hash executor: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self._executor = None
+        self._latencies = deque(maxlen=latency_samples)
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, func: Callable, *args):
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": "1"}
+            )
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._latencies.append(time.perf_counter() - started)
+        self.completed += 1
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        samples = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            index = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+            return round(samples[index] * 1000, 2)
+
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "latency_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99)}
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_pool = PasswordHashPool(PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+register_metrics("password_hashing", password_pool.metrics)
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await password_pool.run(verify_password, password, hashed)
+
+def create_jwt_token(user_id: str) -> str:
+    payload = {
+        'user_id': user_id,
+        'exp': datetime.utcnow() + timedelta(days=30)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def decode_jwt_token(token: str) -> Dict[str, Any]:
+    try:
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def verify_jwt_token(token: str) -> str:
+    return decode_jwt_token(token)['user_id']
+
+class PrincipalCache:
+    """
+    TTL + LRU cache of tokens whose user has been confirmed to exist.
+
+    Keys are SHA-256 digests of the bearer token so raw tokens are never held
+    in memory longer than the request. Entries expire after `ttl` seconds or
+    when the token itself expires, whichever comes first.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_user: Dict[str, set] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token_digest: str) -> Optional[str]:
+        entry = self._entries.get(token_digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        user_id, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(token_digest)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token_digest)
+        self.hits += 1
+        return user_id
+
+    def put(self, token_digest: str, user_id: str, token_exp: Optional[float] = None):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, time.monotonic() + (token_exp - time.time()))
+        self._remove(token_digest)
+        self._entries[token_digest] = (user_id, expires_at)
+        self._by_user.setdefault(user_id, set()).add(token_digest)
+        while len(self._entries) > self.max_size:
+            oldest, _ = next(iter(self._entries.items()))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        for token_digest in list(self._by_user.get(user_id, ())):
+            self._remove(token_digest)
+            self.invalidations += 1
+
+    def _remove(self, token_digest: str):
+        entry = self._entries.pop(token_digest, None)
+        if entry is None:
+            return
+        digests = self._by_user.get(entry[0])
+        if digests is not None:
+            digests.discard(token_digest)
+            if not digests:
+                del self._by_user[entry[0]]
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+register_metrics("principal_cache", principal_cache.metrics)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    try:
+        payload = decode_jwt_token(credentials.credentials)
+        user_id = payload['user_id']
+        token_digest = principal_cache.digest(credentials.credentials)
+        if principal_cache.get(token_digest) == user_id:
+            return user_id
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "id": 1})
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        principal_cache.put(token_digest, user_id, payload.get('exp'))
+        return user_id
+    except Exception as e:
+        raise HTTPException(status_code=401, detail="Invalid authentication")
+
+# Audio Processing Utilities
+def encode_audio_to_base64(audio_data: bytes) -> str:
+    return base64.b64encode(audio_data).decode('utf-8')
+
+def decode_audio_from_base64(base64_data: str) -> bytes:
+    return base64.b64decode(base64_data)
+
+# Streaming uploads
+# Multipart bodies are parsed as they arrive instead of being buffered: file
+# parts are written to a temporary file next to their final location (off the
+# event loop, at most UPLOAD_WRITE_BUFFER_BYTES held in memory), size limits
+# are enforced on every chunk, and a file only appears under its final name,
+# by atomic rename, once it is complete.
+def is_audio_content_type(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith('audio/')
+
+class UploadedFile:
+    """A file part of a streamed upload, held in a temporary file until stored"""
+
+    def __init__(self, field_name: str, filename: str, content_type: Optional[str], temp_path: Path):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.temp_path = temp_path
+        self.size = 0
+        self.complete = False
+        self.stored_path: Optional[Path] = None
+        self._buffer = bytearray()
+        self._handle = None
+        self._sha256 = hashlib.sha256()
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the content, hashed as it was written"""
+        return self._sha256.hexdigest()
+
+    async def drain(self, limit: int):
+        """Write buffered data once `limit` bytes are pending (or the part is complete), off the event loop"""
+        if self._buffer and (len(self._buffer) >= limit or self.complete):
+            if self._handle is None:
+                self._handle = await asyncio.to_thread(open, self.temp_path, 'wb')
+            data, self._buffer = bytes(self._buffer), bytearray()
+            await asyncio.to_thread(self._write, data)
+        if self.complete:
+            if self._handle is None:
+                self._handle = await asyncio.to_thread(open, self.temp_path, 'wb')
+            await self.close()
+
+    def _write(self, data: bytes):
+        self._handle.write(data)
+        self._sha256.update(data)
+
+    async def close(self):
+        if self._handle is not None:
+            handle, self._handle = self._handle, None
+            await asyncio.to_thread(handle.close)
+
+    def extension(self, default: str) -> str:
+        return self.filename.split('.')[-1] if '.' in self.filename else default
+
+class StreamingUpload:
+    """A multipart/form-data request body, parsed as it streams in"""
+
+    def __init__(
+        self,
+        request: Request,
+        max_file_bytes: int = MAX_UPLOAD_BYTES,
+        max_files: int = 1,
+        accept: Callable[[Optional[str]], bool] = is_audio_content_type,
+        directory: Optional[Path] = None
+    ):
+        self.request = request
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.accept = accept
+        self.directory = directory or UPLOAD_DIR
+        self.fields: Dict[str, str] = {}
+        self.files: List[UploadedFile] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._field_name: Optional[str] = None
+        self._field_data = b""
+        self._file: Optional[UploadedFile] = None
+        self._writing: List[UploadedFile] = []
+
+    def field(self, name: str) -> str:
+        if name not in self.fields:
+            raise HTTPException(status_code=422, detail=f"Missing form field: {name}")
+        return self.fields[name]
+
+    def file(self, name: str) -> UploadedFile:
+        for uploaded in self.files:
+            if uploaded.field_name == name:
+                return uploaded
+        raise HTTPException(status_code=422, detail=f"Missing file: {name}")
+
+    async def parse(self) -> "StreamingUpload":
+        content_type, params = parse_options_header(self.request.headers.get('content-type', ''))
+        if content_type != b'multipart/form-data' or b'boundary' not in params:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+        content_length = self.request.headers.get('content-length')
+        if content_length and content_length.isdigit() and int(content_length) > self.max_files * self.max_file_bytes + 64 * 1024:
+            raise HTTPException(status_code=413, detail=f"File too large (max {self.max_file_bytes // (1024 * 1024)}MB)")
+
+        parser = MultipartParser(params[b'boundary'], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        try:
+            async for chunk in self.request.stream():
+                parser.write(chunk)
+                await self._drain()
+            parser.finalize()
+            if self._file is not None:
+                raise HTTPException(status_code=400, detail="Upload ended before the file was complete")
+            await self._drain()
+        except HTTPException:
+            await self.discard()
+            raise
+        except Exception as e:
+            await self.discard()
+            raise HTTPException(status_code=400, detail=f"Malformed upload: {e}")
+        return self
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        name = options.get(b'name', b'').decode('utf-8', 'replace')
+        if b'filename' not in options:
+            self._field_name, self._field_data = name, b""
+            return
+        content_type = self._headers.get(b'content-type', b'').decode('latin-1') or None
+        if not self.accept(content_type):
+            raise HTTPException(status_code=400, detail=f"Invalid file type: {content_type}")
+        if len(self.files) >= self.max_files:
+            raise HTTPException(status_code=400, detail=f"Too many files (max {self.max_files})")
+        self._file = UploadedFile(
+            name, options[b'filename'].decode('utf-8', 'replace'), content_type,
+            self.directory / f".{uuid.uuid4()}.part"
+        )
+        self.files.append(self._file)
+        self._writing.append(self._file)
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._file is None:
+            self._field_data += data[start:end]
+            if len(self._field_data) > 64 * 1024:
+                raise HTTPException(status_code=400, detail="Form field too large")
+            return
+        self._file.size += end - start
+        if self._file.size > self.max_file_bytes:
+            raise HTTPException(status_code=413, detail=f"File too large (max {self.max_file_bytes // (1024 * 1024)}MB)")
+        self._file._buffer += data[start:end]
+
+    def _on_part_end(self):
+        if self._file is None:
+            self.fields[self._field_name] = self._field_data.decode('utf-8', 'replace')
+        else:
+            self._file.complete = True
+            self._file = None
+
+    async def _drain(self):
+        for uploaded in list(self._writing):
+            await uploaded.drain(UPLOAD_WRITE_BUFFER_BYTES)
+            if uploaded.complete:
+                self._writing.remove(uploaded)
+
+    async def store(self, uploaded: UploadedFile, path: Path) -> Path:
+        """Move a complete file to its final location (atomic rename)"""
+        await asyncio.to_thread(os.replace, uploaded.temp_path, path)
+        uploaded.stored_path = path
+        return path
+
+    async def store_blob(self, uploaded: UploadedFile) -> Dict[str, Any]:
+        """Add a complete file to the content-addressed blob store"""
+        blob = await store_blob(uploaded.temp_path, uploaded.digest, uploaded.size, uploaded.extension('mp3'))
+        uploaded.stored_path = UPLOAD_DIR / blob['file_id']
+        return blob
+
+    async def discard(self):
+        """Remove temporary files that were not stored"""
+        for uploaded in self.files:
+            await uploaded.close()
+            if uploaded.stored_path is None:
+                await asyncio.to_thread(uploaded.temp_path.unlink, True)
+
+# Upload admission control
+class UploadAdmission:
+    """
+    Admission control for request bodies carrying audio.
+
+    Counts the uploads in progress and the bytes they may still send (their
+    Content-Length, or the most they are allowed when it is missing), in
+    total and per user. An upload that would take either count over its
+    limit is refused with 503 and Retry-After before any of its body is read.
+    An upload is always admitted when nothing else is in flight, so one
+    larger than the byte limits can still get through an idle server.
+    """
+
+    def __init__(self, max_uploads: int, max_bytes: int, max_user_uploads: int, max_user_bytes: int, retry_after: int):
+        self.max_uploads = max(1, max_uploads)
+        self.max_bytes = max_bytes
+        self.max_user_uploads = max(1, max_user_uploads)
+        self.max_user_bytes = max_user_bytes
+        self.retry_after = retry_after
+        self.uploads = 0
+        self.bytes = 0
+        self.user_uploads: Counter = Counter()
+        self.user_bytes: Counter = Counter()
+        self.admitted = 0
+        self.peak_uploads = 0
+        self.peak_bytes = 0
+        self.rejected: Counter = Counter()
+
+    def _refusal(self, user_id: str, size: int) -> Optional[str]:
+        if self.uploads >= self.max_uploads:
+            return "uploads"
+        if self.uploads and self.bytes + size > self.max_bytes:
+            return "bytes"
+        if self.user_uploads[user_id] >= self.max_user_uploads:
+            return "user_uploads"
+        if self.user_uploads[user_id] and self.user_bytes[user_id] + size > self.max_user_bytes:
+            return "user_bytes"
+        return None
+
+    @contextmanager
+    def admit(self, user_id: str, size: int):
+        """Hold a slot and `size` bytes of budget for the duration of the block"""
+        refusal = self._refusal(user_id, size)
+        if refusal:
+            self.rejected[refusal] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many uploads in progress, please retry" if refusal.startswith("user")
+                else "Upload capacity exhausted, please retry",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        self.uploads += 1
+        self.bytes += size
+        self.user_uploads[user_id] += 1
+        self.user_bytes[user_id] += size
+        self.admitted += 1
+        self.peak_uploads = max(self.peak_uploads, self.uploads)
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+        try:
+            yield
+        finally:
+            self.uploads -= 1
+            self.bytes -= size
+            self.user_uploads[user_id] -= 1
+            self.user_bytes[user_id] -= size
+            if not self.user_uploads[user_id]:
+                del self.user_uploads[user_id], self.user_bytes[user_id]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "uploads": self.uploads,
+            "inflight_bytes": self.bytes,
+            "users": len(self.user_uploads),
+            "max_uploads": self.max_uploads,
+            "max_inflight_bytes": self.max_bytes,
+            "max_user_uploads": self.max_user_uploads,
+            "max_user_inflight_bytes": self.max_user_bytes,
+            "peak_uploads": self.peak_uploads,
+            "peak_inflight_bytes": self.peak_bytes,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected)
+        }
+
+upload_admission = UploadAdmission(
+    UPLOAD_MAX_CONCURRENT, UPLOAD_MAX_INFLIGHT_BYTES, UPLOAD_MAX_CONCURRENT_PER_USER,
+    UPLOAD_MAX_INFLIGHT_BYTES_PER_USER, UPLOAD_RETRY_AFTER_SECONDS
+)
+register_metrics("upload_admission", upload_admission.metrics)
+
+def declared_body_size(request: Request, limit: int) -> int:
+    """The body size a request announces, capped at `limit` (which is also assumed when it announces none)"""
+    content_length = request.headers.get('content-length', '')
+    return min(int(content_length), limit) if content_length.isdigit() else limit
+
+# Audio storage
+# Where stored files live (see audio_storage.py). Uploads are received into
+# UPLOAD_DIR either way and handed over once complete.
+def make_audio_storage():
+    if AUDIO_STORAGE == 'local':
+        return LocalStorage(UPLOAD_DIR)
+    if AUDIO_STORAGE == 's3':
+        if not S3_BUCKET:
+            raise RuntimeError("AUDIO_STORAGE=s3 needs S3_BUCKET")
+        return S3Storage(
+            S3_BUCKET, UPLOAD_DIR, S3_PREFIX, S3_ENDPOINT_URL, S3_REGION, S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY,
+            S3_PRESIGN_TTL, S3_MULTIPART_THRESHOLD, S3_MULTIPART_CHUNK_BYTES, S3_MAX_CONCURRENCY
+        )
+    raise RuntimeError(f"Unknown AUDIO_STORAGE: {AUDIO_STORAGE}")
+
+audio_storage = make_audio_storage()
+register_metrics("audio_storage", lambda: audio_storage.metrics())
+
+# Audio blob store
+# Uploaded audio is stored once per distinct content, as the object {sha256}.{ext}
+# (the extension of the first upload). The blobs collection counts the clips
+# referring to each file through their file_url; the file is deleted when the
+# count drops to zero and no clip uses it any more. A blob being deleted is
+# marked `deleting`, and uploads of the same content wait for it to go rather
+# than take a reference to a file that is about to disappear.
+AUDIO_FILE_URL_PREFIX = "/api/audio/file/"
+BLOB_CLAIM_ATTEMPTS = 40
+BLOB_CLAIM_RETRY_DELAY = 0.05  # seconds
+BLOB_STALE_DELETE_CLAIM = timedelta(seconds=60)  # left behind by a collector that crashed
+
+blob_stats = {"stored": 0, "deduplicated": 0, "collected": 0}
+
+def blob_metrics() -> Dict[str, Any]:
+    return dict(blob_stats)
+
+register_metrics("blob_store", blob_metrics)
+
+def audio_file_id(file_url: Any) -> Optional[str]:
+    if isinstance(file_url, str) and file_url.startswith(AUDIO_FILE_URL_PREFIX):
+        return file_url[len(AUDIO_FILE_URL_PREFIX):]
+    return None
+
+def file_sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(UPLOAD_WRITE_BUFFER_BYTES):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+async def store_blob(path: Path, digest: str, size: int, extension: str) -> Dict[str, Any]:
+    """
+    Take a reference to the blob with this SHA-256. The file at `path` becomes
+    the blob's file if the content is new and is removed if it is a duplicate.
+    """
+    for _ in range(BLOB_CLAIM_ATTEMPTS):
+        try:
+            blob = await db.blobs.find_one_and_update(
+                {"digest": digest, "deleting": None},
+                {
+                    "$inc": {"refcount": 1},
+                    "$setOnInsert": {"file_id": f"{digest}.{extension}", "size": size, "created_at": datetime.utcnow()}
+                },
+                projection={"_id": 0}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+            break
+        except DuplicateKeyError:
+            # The blob is being deleted; wait until it is gone and store it afresh
+            await db.blobs.delete_one({"digest": digest, "deleting": {"$lt": datetime.utcnow() - BLOB_STALE_DELETE_CLAIM}})
+            await asyncio.sleep(BLOB_CLAIM_RETRY_DELAY)
+    else:
+        raise HTTPException(status_code=503, detail="Audio storage is busy, please retry the upload")
+
+    try:
+        if await audio_storage.exists(blob['file_id']):
+            await asyncio.to_thread(path.unlink, True)
+            blob_stats["deduplicated"] += 1
+        else:
+            await audio_storage.put_file(path, blob['file_id'])
+            invalidate_cached(blob['file_id'])
+            blob_stats["stored"] += 1
+    except Exception:
+        await change_blob_refcount(blob['file_id'], -1)
+        raise
+    return blob
+
+async def change_blob_refcount(file_id: str, delta: int) -> Optional[Dict[str, Any]]:
+    """Add `delta` references to a blob (None for files stored before the blob store)"""
+    blob = await db.blobs.find_one_and_update(
+        {"file_id": file_id}, {"$inc": {"refcount": delta}},
+        projection={"_id": 0}, return_document=ReturnDocument.AFTER
+    )
+    if blob and blob['refcount'] <= 0:
+        await collect_blob(blob['digest'])
+    return blob
+
+async def collect_blob(digest: str) -> bool:
+    """Delete a blob that nothing references any more; returns whether it was deleted"""
+    blob = await db.blobs.find_one_and_update(
+        {"digest": digest, "refcount": {"$lte": 0}, "deleting": None},
+        {"$set": {"deleting": datetime.utcnow()}},
+        projection={"_id": 0, "file_id": 1}
+    )
+    if not blob:
+        return False
+    # Clips copied without taking a reference (e.g. through a PATCH copy) still count
+    in_use = await db.clips.count_documents({"file_url": f"{AUDIO_FILE_URL_PREFIX}{blob['file_id']}"})
+    if in_use:
+        await db.blobs.update_one({"digest": digest}, {"$unset": {"deleting": ""}, "$max": {"refcount": in_use}})
+        return False
+    await remove_audio_file(blob['file_id'])
+    await db.blobs.delete_one({"digest": digest})
+    blob_stats["collected"] += 1
+    return True
+
+async def remove_audio_file(file_id: str):
+    """Delete a stored file and everything derived from it"""
+    for key in (file_id, peaks_key(file_id), preview_key(file_id)):
+        await audio_storage.delete(key)
+        invalidate_cached(key)
+
+async def update_file_references(removed: List[Any], added: List[Any] = ()):
+    """Move blob refcounts along with clips: the file_urls of clips removed and added"""
+    deltas = Counter(filter(None, map(audio_file_id, added)))
+    deltas.subtract(Counter(filter(None, map(audio_file_id, removed))))
+    for file_id, delta in deltas.items():
+        if delta:
+            await change_blob_refcount(file_id, delta)
+
+async def file_referenced(file_url: str) -> bool:
+    """Whether any clip, in any project, uses the file"""
+    return bool(
+        await db.clips.count_documents({"file_url": file_url}, limit=1) or
+        await db.projects.count_documents({"layout": {"$ne": PROJECT_LAYOUT}, "tracks.clips.file_url": file_url}, limit=1)
+    )
+
+async def clip_file_urls(query: Dict[str, Any]) -> List[str]:
+    clips = await db.clips.find({**query, "file_url": {"$ne": None}}, {"_id": 0, "file_url": 1}).to_list(None)
+    return [clip['file_url'] for clip in clips]
+
+# Waveform peaks and preview renditions
+# Min/max peak pyramids and low-rate preview WAVs are computed once per stored
+# file, by a background job or on first request, and kept next to it as
+# {file_id}.peaks and {file_id}.preview.wav (see audio_peaks.py and
+# audio_preview.py). Files are immutable, so what is derived from them is too
+# and can be cached by clients indefinitely.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+PCM_SUFFIXES = {'.wav', '.wave', '.aif', '.aiff', '.aifc'}  # what peaks and previews can be computed from
+
+derived_builds: Dict[str, asyncio.Task] = {}
+
+def peaks_key(file_id: str) -> str:
+    return f"{file_id}.peaks"
+
+def preview_key(file_id: str) -> str:
+    return f"{file_id}.preview.wav"
+
+async def build_derived(file_id: str, key: str, build: Callable, *args, run: Callable = asyncio.to_thread) -> bool:
+    """
+    Store build(source, target, *args), computed from the stored file `file_id`
+    by `run` (a worker thread by default), as `key`. False if the file is gone
+    or build could not read it.
+    """
+    try:
+        async with audio_storage.local_copy(file_id) as source, audio_storage.local_output(key) as target:
+            return await run(build, source, target, *args)
+    except FileNotFoundError:
+        return False
+    finally:
+        invalidate_cached(key)
+
+def start_derived_build(file_id: str, key: str, build: Callable, *args) -> asyncio.Task:
+    """build_derived() in the background (joining a build of `key` already running)"""
+    task = derived_builds.get(key)
+    if task is None:
+        task = asyncio.ensure_future(build_derived(file_id, key, build, *args))
+        derived_builds[key] = task
+
+        def finished(task: asyncio.Task):
+            derived_builds.pop(key, None)
+            if not task.cancelled() and task.exception():
+                logger.error(f"Building {key} failed: {task.exception()}")
+
+        task.add_done_callback(finished)
+    return task
+
+def start_peak_build(file_id: str) -> asyncio.Task:
+    """Compute the peaks of a file in the background"""
+    return start_derived_build(file_id, peaks_key(file_id), build_peaks, PEAK_BITS, PEAK_BASE_SAMPLES)
+
+def start_preview_build(file_id: str) -> asyncio.Task:
+    """Render the preview of a file in the background"""
+    return start_derived_build(
+        file_id, preview_key(file_id), build_preview, PREVIEW_SAMPLE_RATE, PREVIEW_CHANNELS, PREVIEW_BITS
+    )
+
+async def ensure_peaks(file_id: str) -> bool:
+    """Whether the peaks of a file exist, computing them if needed; False if its format cannot be read"""
+    if await audio_storage.exists(peaks_key(file_id)):
+        return True
+    return await asyncio.shield(start_peak_build(file_id))
+
+# Audio file serving
+# Stored files never change (their names are content digests or UUIDs), so
+# responses carry a strong ETag and immutable caching, and byte ranges are
+# served from the file itself: single ranges as 206, several as a
+# multipart/byteranges document. Unparseable or excessive Range headers are
+# ignored and the whole file is sent, as RFC 9110 allows.
+AUDIO_READ_CHUNK_BYTES = 256 * 1024
+MAX_BYTE_RANGES = 16
+
+# Contents of hot files, so that repeat plays are served without touching the
+# filesystem (see audio_cache.py). Used with local storage; everything that
+# creates or deletes a stored object invalidates its entry.
+audio_cache = HotFileCache(
+    AUDIO_CACHE_BYTES, AUDIO_CACHE_MAX_FILE_BYTES, AUDIO_CACHE_POLICY, AUDIO_CACHE_STORAGE,
+    AUDIO_CACHE_TTL, AUDIO_CACHE_NEGATIVE_TTL
+)
+register_metrics("audio_cache", audio_cache.metrics)
+
+def invalidate_cached(key: str):
+    if isinstance(audio_storage, LocalStorage):
+        audio_cache.invalidate(audio_storage.path(key))
+
+async def read_stored(key: str) -> bytes:
+    """The contents of a small stored object (FileNotFoundError if there is none)"""
+    if isinstance(audio_storage, LocalStorage):
+        cached = await audio_cache.get(audio_storage.path(key))
+        if cached.data is not None:
+            return cached.data
+    return await audio_storage.read(key)
+
+def parse_byte_ranges(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Inclusive (first, last) byte ranges of a Range header, sorted and merged.
+    None when the header is absent or should be ignored; 416 when no range
+    overlaps the file.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    specs = header[len('bytes='):].split(',')
+    if len(specs) > MAX_BYTE_RANGES:
+        return None
+    ranges = []
+    for spec in specs:
+        first, dash, last = spec.strip().partition('-')
+        if not dash or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+            return None
+        if not first:  # suffix range: the last N bytes
+            if int(last):
+                ranges.append((max(0, size - int(last)), size - 1))
+            continue
+        if last and int(last) < int(first):
+            return None
+        if int(first) < size:
+            ranges.append((int(first), min(int(last), size - 1) if last else size - 1))
+    if not ranges:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    merged: List[Tuple[int, int]] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+async def read_file_range(path: Path, cached: CachedFile, first: int, last: int):
+    """The bytes first..last (inclusive) of a file, in chunks: from the cache, or read off the event loop"""
+    if cached.data is not None:
+        for start in range(first, last + 1, AUDIO_READ_CHUNK_BYTES):
+            yield cached.data[start:min(start + AUDIO_READ_CHUNK_BYTES, last + 1)]
+        return
+    handle = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(handle.seek, first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(handle.read, min(AUDIO_READ_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(handle.close)
+
+def serve_audio_file(
+    request: Request, path: Path, cached: CachedFile, media_type: str, etag: str,
+    cache_control: str = IMMUTABLE_CACHE_CONTROL, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """A stored file as the answer to GET/HEAD, honouring If-None-Match, Range and If-Range"""
+    from email.utils import formatdate
+    from starlette.responses import StreamingResponse
+
+    size = cached.stat.st_size
+    last_modified = formatdate(cached.stat.st_mtime, usegmt=True)
+    headers = {
+        **(headers or {}), "ETag": etag, "Last-Modified": last_modified,
+        "Cache-Control": cache_control, "Accept-Ranges": "bytes"
+    }
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+
+    ranges = parse_byte_ranges(request.headers.get('range'), size)
+    if_range = request.headers.get('if-range')
+    if ranges is not None and if_range is not None and if_range not in (etag, last_modified):
+        ranges = None  # the client's partial copy is of something else: send it all
+    head = request.method == 'HEAD'
+
+    if ranges is None:
+        headers["Content-Length"] = str(size)
+        body = [] if head else read_file_range(path, cached, 0, size - 1)
+        return StreamingResponse(body, media_type=media_type, headers=headers)
+
+    if len(ranges) == 1:
+        first, last = ranges[0]
+        headers.update({"Content-Range": f"bytes {first}-{last}/{size}", "Content-Length": str(last - first + 1)})
+        body = [] if head else read_file_range(path, cached, first, last)
+        return StreamingResponse(body, status_code=206, media_type=media_type, headers=headers)
+
+    boundary = uuid.uuid4().hex
+    part_heads = [
+        f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Range: bytes {first}-{last}/{size}\r\n\r\n".encode()
+        for first, last in ranges
+    ]
+    tail = f"--{boundary}--\r\n".encode()
+    headers["Content-Length"] = str(
+        sum(len(part_head) + last - first + 1 + 2 for part_head, (first, last) in zip(part_heads, ranges)) + len(tail)
+    )
+
+    async def multipart():
+        for part_head, (first, last) in zip(part_heads, ranges):
+            yield part_head
+            async for chunk in read_file_range(path, cached, first, last):
+                yield chunk
+            yield b"\r\n"
+        yield tail
+
+    return StreamingResponse(
+        [] if head else multipart(), status_code=206,
+        media_type=f"multipart/byteranges; boundary={boundary}", headers=headers
+    )
+
+# Background jobs
+# Work that should not hold up a request (probing, peaks, transcoding...) is
+# queued in the `jobs` collection and run by worker tasks in every API process
+# (unless JOB_WORKERS_ENABLED is off). Handlers must be idempotent: a job whose
+# worker dies is run again once its lease expires.
+JOB_LEASE_FIELDS = {"lease_owner": "", "lease_expires_at": ""}
+
+class JobQueue:
+    """
+    Durable background jobs with leased claims.
+
+    A worker claims a queued job by taking a lease on it and renews the lease
+    while the handler runs. Jobs whose lease runs out because their worker
+    crashed or hung are put back in the queue by recover(). A failing job is
+    retried with exponential backoff until it has used the max_attempts of
+    its type. Each type gets `concurrency` worker tasks, which is how many of
+    its jobs this process runs at once. CPU-bound work goes through
+    run_cpu(), a process pool by default, so it runs on other cores than
+    the event loop.
+    """
+
+    def __init__(
+        self, lease_seconds: float, poll_interval: float, retry_base: float, retry_max: float,
+        executor_kind: str, processes: int
+    ):
+        if executor_kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown job executor: {executor_kind}")
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.executor_kind = executor_kind
+        self.processes = max(1, processes)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.types: Dict[str, Dict[str, Any]] = {}
+        self.running: Dict[str, int] = {}
+        self.enqueued = self.succeeded = self.retried = self.failed = self.recovered = 0
+        self._executor = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeups: Dict[str, asyncio.Event] = {}
+
+    def handler(self, job_type: str, concurrency: int = 1, max_attempts: int = 5):
+        """Register the coroutine function run for jobs of `job_type`; it gets the job payload"""
+        def register(func: Callable):
+            self.types[job_type] = {"handler": func, "concurrency": max(1, concurrency), "max_attempts": max(1, max_attempts)}
+            self.running[job_type] = 0
+            return func
+        return register
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any], user_id: Optional[str] = None, delay: float = 0) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "payload": payload,
+            "user_id": user_id,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": self.types[job_type]['max_attempts'],
+            "run_at": now + timedelta(seconds=delay),
+            "created_at": now,
+            "updated_at": now,
+            "last_error": None,
+            "result": None
+        }
+        await db.jobs.insert_one(job)
+        job.pop('_id', None)
+        self.enqueued += 1
+        if job_type in self._wakeups:
+            self._wakeups[job_type].set()
+        return job
+
+    async def claim(self, job_type: str) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        lease = {"lease_owner": self.worker_id, "lease_expires_at": now + timedelta(seconds=self.lease_seconds)}
+        job = await db.jobs.find_one_and_update(
+            {"type": job_type, "status": "queued", "run_at": {"$lte": now}},
+            {"$set": {"status": "running", "started_at": now, "updated_at": now, **lease}, "$inc": {"attempts": 1}},
+            projection={"_id": 0}, sort=[("run_at", ASCENDING)]
+        )
+        if job:  # the document as it was before the claim
+            job.update(status="running", attempts=job['attempts'] + 1, **lease)
+        return job
+
+    async def _finish(self, job: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        """Apply `update` if this worker still holds the job's lease"""
+        update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+        update["$unset"] = JOB_LEASE_FIELDS
+        result = await db.jobs.update_one({"id": job['id'], "status": "running", "lease_owner": self.worker_id}, update)
+        return bool(result.matched_count)
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def complete(self, job: Dict[str, Any], result: Any):
+        now = datetime.utcnow()
+        if await self._finish(job, {"$set": {
+            "status": "succeeded", "result": result, "finished_at": now,
+            "expires_at": now + timedelta(seconds=JOB_RETENTION_SECONDS)
+        }}):
+            self.succeeded += 1
+
+    async def retry_or_fail(self, job: Dict[str, Any], error: str):
+        now = datetime.utcnow()
+        if job['attempts'] < job['max_attempts']:
+            update = {"status": "queued", "run_at": now + timedelta(seconds=self.backoff(job['attempts'])), "last_error": error}
+            if await self._finish(job, {"$set": update}):
+                self.retried += 1
+        elif await self._finish(job, {"$set": {
+            "status": "failed", "last_error": error, "finished_at": now,
+            "expires_at": now + timedelta(seconds=JOB_RETENTION_SECONDS)
+        }}):
+            self.failed += 1
+
+    async def release(self, job: Dict[str, Any]):
+        """Give a job back to the queue without counting the attempt (on shutdown)"""
+        await self._finish(job, {"$set": {"status": "queued", "run_at": datetime.utcnow()}, "$inc": {"attempts": -1}})
+
+    async def recover(self) -> int:
+        """Requeue (or fail, when out of attempts) running jobs whose lease has expired"""
+        now = datetime.utcnow()
+        expired = await db.jobs.find(
+            {"status": "running", "lease_expires_at": {"$lt": now}},
+            {"_id": 0, "id": 1, "attempts": 1, "max_attempts": 1, "lease_owner": 1}
+        ).to_list(100)
+        recovered = 0
+        for job in expired:
+            if job['attempts'] < job['max_attempts']:
+                update = {"status": "queued", "run_at": now, "last_error": "Worker lease expired"}
+            else:
+                update = {"status": "failed", "last_error": "Worker lease expired", "finished_at": now,
+                          "expires_at": now + timedelta(seconds=JOB_RETENTION_SECONDS)}
+            result = await db.jobs.update_one(
+                {"id": job['id'], "status": "running", "lease_owner": job.get('lease_owner'), "lease_expires_at": {"$lt": now}},
+                {"$set": {**update, "updated_at": now}, "$unset": JOB_LEASE_FIELDS}
+            )
+            recovered += result.modified_count
+        self.recovered += recovered
+        return recovered
+
+    async def run_cpu(self, func: Callable, *args):
+        """Run CPU-bound work in the job executor (a function importable by worker processes)"""
+        if self._executor is None:
+            if self.executor_kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.processes, thread_name_prefix="jobs")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _heartbeat(self, job: Dict[str, Any]):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            result = await db.jobs.update_one(
+                {"id": job['id'], "status": "running", "lease_owner": self.worker_id},
+                {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+            )
+            if not result.matched_count:
+                logger.warning(f"Lost the lease on job {job['id']} ({job['type']})")
+                return
+
+    async def _run(self, job: Dict[str, Any]):
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        self.running[job['type']] += 1
+        try:
+            result = await self.types[job['type']]['handler'](job['payload'])
+        except asyncio.CancelledError:
+            await self.release(job)
+            raise
+        except Exception as e:
+            logger.warning(f"Job {job['id']} ({job['type']}) failed on attempt {job['attempts']}: {e}")
+            await self.retry_or_fail(job, f"{type(e).__name__}: {e}")
+        else:
+            await self.complete(job, result)
+        finally:
+            self.running[job['type']] -= 1
+            heartbeat.cancel()
+
+    async def _work(self, job_type: str):
+        wakeup = self._wakeups[job_type]
+        while True:
+            try:
+                job = await self.claim(job_type)
+            except Exception as e:
+                logger.error(f"Claiming a {job_type} job failed: {e}")
+                job = None
+            if job is None:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _recover_periodically(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 2)
+            try:
+                recovered = await self.recover()
+                if recovered:
+                    logger.info(f"Recovered {recovered} jobs with expired leases")
+            except Exception as e:
+                logger.error(f"Job recovery failed: {e}")
+
+    def start(self):
+        for job_type, spec in self.types.items():
+            self._wakeups[job_type] = asyncio.Event()
+            self._tasks += [asyncio.create_task(self._work(job_type)) for _ in range(spec['concurrency'])]
+        self._tasks.append(asyncio.create_task(self._recover_periodically()))
+
+    async def stop(self):
+        """Stop the workers; jobs they were running go back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self._wakeups = [], {}
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor_kind,
+            "types": {
+                job_type: {"concurrency": spec['concurrency'], "running": self.running[job_type]}
+                for job_type, spec in self.types.items()
+            },
+            "enqueued": self.enqueued,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "recovered": self.recovered
+        }
+
+jobs = JobQueue(
+    JOB_LEASE_SECONDS, JOB_POLL_INTERVAL, JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS,
+    JOB_EXECUTOR, JOB_WORKER_PROCESSES
+)
+register_metrics("jobs", jobs.metrics)
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: job.get(key) for key in (
+            "id", "type", "status", "payload", "attempts", "max_attempts", "run_at",
+            "created_at", "started_at", "finished_at", "last_error", "result"
+        )
+    }
+
+@jobs.handler("audio.probe", concurrency=4)
+async def probe_audio_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Read an uploaded file's metadata and fill it in on its blob and on the clips using it"""
+    file_id = payload['file_id']
+    try:
+        async with audio_storage.local_copy(file_id) as path:
+            audio = await asyncio.to_thread(probe_audio, path) or {}
+    except FileNotFoundError:
+        return {"probed": False, "reason": "file deleted"}
+    await db.blobs.update_one({"file_id": file_id}, {"$set": {"audio": audio}})
+    if not audio:
+        return {"probed": False}
+
+    file_url = f"{AUDIO_FILE_URL_PREFIX}{file_id}"
+    pending = {"file_url": file_url, "sample_rate": None}
+    affected = await db.clips.distinct("project_id", pending)
+    metadata = {key: audio.get(key) for key in ("sample_rate", "channels", "bit_depth")}
+    if audio.get('duration'):
+        # Clips still at the placeholder duration get the real one
+        await db.clips.update_many({**pending, "duration": {"$in": [0, None]}}, {"$set": {"duration": audio['duration']}})
+    await db.clips.update_many(pending, {"$set": metadata})
+    if affected:
+        await db.projects.update_many({"id": {"$in": affected}}, {"$inc": {"version": 1}})
+    return {"probed": True, **audio}
+
+@jobs.handler("audio.peaks", concurrency=2)
+async def peaks_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    file_id = payload['file_id']
+    if not await audio_storage.exists(file_id):
+        return {"peaks": False, "reason": "file deleted"}
+    built = await build_derived(file_id, peaks_key(file_id), build_peaks, PEAK_BITS, PEAK_BASE_SAMPLES, run=jobs.run_cpu)
+    return {"peaks": built}
+
+@jobs.handler("audio.preview", concurrency=2)
+async def preview_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    file_id = payload['file_id']
+    if not await audio_storage.exists(file_id):
+        return {"preview": False, "reason": "file deleted"}
+    built = await build_derived(
+        file_id, preview_key(file_id), build_preview, PREVIEW_SAMPLE_RATE, PREVIEW_CHANNELS, PREVIEW_BITS,
+        run=jobs.run_cpu
+    )
+    return {"preview": built}
+
+async def enqueue_audio_processing(blob: Dict[str, Any], user_id: str) -> List[Dict[str, Any]]:
+    """Queue the processing of a newly stored file; nothing to do for content seen before"""
+    if 'audio' in blob:
+        return []
+    # Claimed on the blob, so that identical uploads arriving before the jobs finish queue nothing
+    claim = await db.blobs.update_one(
+        {"file_id": blob['file_id'], "processing_enqueued": None}, {"$set": {"processing_enqueued": datetime.utcnow()}}
+    )
+    if not claim.modified_count:
+        return []
+    payload = {"file_id": blob['file_id']}
+    try:
+        queued = [await jobs.enqueue(job_type, payload, user_id) for job_type in ("audio.probe", "audio.peaks", "audio.preview")]
+    except Exception:
+        await db.blobs.update_one({"file_id": blob['file_id']}, {"$unset": {"processing_enqueued": ""}})
+        raise
+    return [{"id": job['id'], "type": job['type'], "status": job['status']} for job in queued]
+
+# Resumable upload sessions
+# A session reserves a sparse file of the declared size; chunks are written at
+# their offset (in any order, in parallel) and the byte ranges received are
+# recorded on the session once they are on disk. A client that loses its
+# connection asks for the received ranges and resends only what is missing.
+def merge_ranges(ranges: List[List[int]]) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def upload_session_path(session_id: str) -> Path:
+    return UPLOAD_DIR / f".{session_id}.upload"
+
+def upload_session_status(session: Dict[str, Any]) -> Dict[str, Any]:
+    received = merge_ranges(session.get('received') or [])
+    size = session['size']
+    missing, cursor = [], 0
+    for start, end in received + [[size, size]]:
+        if start > cursor:
+            missing.append([cursor, start])
+        cursor = max(cursor, end)
+    return {
+        "id": session['id'],
+        "project_id": session['project_id'],
+        "track_id": session['track_id'],
+        "filename": session['filename'],
+        "size": size,
+        "chunk_size": UPLOAD_SESSION_CHUNK_BYTES,
+        "status": session['status'],
+        "offset": received[0][1] if received and received[0][0] == 0 else 0,
+        "received": received,
+        "missing": missing,
+        "expires_at": session['expires_at'],
+        **({"clip": session['clip'], "file_id": session['file_id'], "jobs": session.get('jobs', [])}
+           if session['status'] == 'complete' else {})
+    }
+
+def pwrite_all(fd: int, data: bytes, offset: int):
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view, offset = view[written:], offset + written
+
+async def write_upload_chunk(request: Request, path: Path, offset: int, limit: int) -> Tuple[int, bool]:
+    """
+    Stream the request body into `path` at `offset`, at most `limit` bytes.
+    Returns (bytes written, whether the client disconnected); what arrived
+    before a disconnect is kept and flushed to disk.
+    """
+    fd = await asyncio.to_thread(os.open, path, os.O_WRONLY)
+    written, buffer, disconnected = 0, bytearray(), False
+    try:
+        try:
+            async for data in request.stream():
+                if written + len(buffer) + len(data) > limit:
+                    raise HTTPException(status_code=413, detail="Chunk extends past the declared upload size")
+                buffer += data
+                if len(buffer) >= UPLOAD_WRITE_BUFFER_BYTES:
+                    await asyncio.to_thread(pwrite_all, fd, bytes(buffer), offset + written)
+                    written, buffer = written + len(buffer), bytearray()
+        except ClientDisconnect:
+            disconnected = True
+        if buffer:
+            await asyncio.to_thread(pwrite_all, fd, bytes(buffer), offset + written)
+            written += len(buffer)
+        await asyncio.to_thread(os.fsync, fd)
+    finally:
+        await asyncio.to_thread(os.close, fd)
+    return written, disconnected
+
+async def load_upload_session(session_id: str, user_id: str) -> Dict[str, Any]:
+    session = await db.upload_sessions.find_one({"id": session_id}, {"_id": 0})
+    if not session or session['user_id'] != user_id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+async def sweep_upload_sessions() -> int:
+    """Remove expired sessions and their partial data; returns how many were removed"""
+    expired = await db.upload_sessions.find(
+        {"expires_at": {"$lt": datetime.utcnow()}}, {"_id": 0, "id": 1}
+    ).to_list(1000)
+    for session in expired:
+        await asyncio.to_thread(upload_session_path(session['id']).unlink, True)
+    if expired:
+        await db.upload_sessions.delete_many({"id": {"$in": [session['id'] for session in expired]}})
+    return len(expired)
+
+async def run_upload_session_sweeper():
+    while True:
+        await asyncio.sleep(UPLOAD_SWEEP_INTERVAL)
+        try:
+            removed = await sweep_upload_sessions()
+            if removed:
+                logger.info(f"Removed {removed} expired upload sessions")
+        except Exception as e:
+            logger.error(f"Upload session sweep failed: {e}")
+
+async def require_track(project_id: str, track_id: str):
+    if not await db.tracks.count_documents({"project_id": project_id, "id": track_id}, limit=1):
+        raise HTTPException(status_code=404, detail="Track not found in project")
+
+def uploaded_clip(
+    track_id: str, name: str, file_id: str, file_size: int, audio: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """A clip for a file in audio_storage, with the metadata probed from it.
+
+    `file_path` holds the storage key, not a filesystem path: files are read
+    through audio_storage and served from `file_url`.
+    """
+    audio = audio or {}
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "file_path": file_id,
+        "file_size": file_size,
+        "duration": audio.get('duration') or 0.0,  # 0.0: not known from the headers, calculated on frontend
+        "sample_rate": audio.get('sample_rate'),
+        "channels": audio.get('channels'),
+        "bit_depth": audio.get('bit_depth'),
+        "start_time": 0.0,  # Will be set on frontend
+        "track_id": track_id,
+        "type": "uploaded",  # Mark as uploaded clip
+        "created_at": datetime.utcnow().isoformat(),
+        "file_url": f"/api/audio/file/{file_id}"
+    }
+
+async def attach_uploaded_clip(
+    project_id: str, track_id: str, name: str, file_id: str, file_size: int,
+    audio: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Add a clip for a file in audio_storage to a track"""
+    clip_data = uploaded_clip(track_id, name, file_id, file_size, audio)
+    await db.clips.insert_one({**clip_data, "project_id": project_id})
+    await touch_project(project_id)
+    return clip_data
+
+# Project storage
+# Tracks and clips live in their own collections (keyed by project_id / track_id)
+# instead of being embedded in the project document. Projects written before
+# this layout still carry an embedded `tracks` array until they are migrated,
+# either lazily on first access or with migrate_project_layout.py.
+PROJECT_LAYOUT = 2
+PROJECT_ACCESS_PROJECTION = {
+    "_id": 0, "id": 1, "owner_id": 1, "collaborators": 1, "is_public": 1, "layout": 1, "version": 1, "mixer_version": 1
+}
+TRACK_PROJECTION = {"_id": 0, "project_id": 0, "position": 0}
+CLIP_PROJECTION = {"_id": 0, "project_id": 0}
+
+def split_track_document(project_id: str, track: Dict[str, Any], position: int):
+    """Split an embedded track into its track document and clip documents"""
+    track_doc = {k: v for k, v in track.items() if k != 'clips'}
+    track_doc['project_id'] = project_id
+    track_doc['position'] = position
+    clip_docs = [
+        {**clip, "project_id": project_id, "track_id": track_doc['id']}
+        for clip in track.get('clips') or []
+    ]
+    return track_doc, clip_docs
+
+async def insert_track(project_id: str, track: Dict[str, Any], position: int):
+    track_doc, clip_docs = split_track_document(project_id, track, position)
+    await db.tracks.insert_one(track_doc)
+    if clip_docs:
+        await db.clips.insert_many(clip_docs)
+        await update_file_references([], [clip.get('file_url') for clip in clip_docs])
+
+async def attach_tracks(projects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Load tracks and clips for normalized projects and embed them for the response"""
+    project_ids = [p['id'] for p in projects if 'tracks' not in p]
+    if not project_ids:
+        return projects
+
+    tracks, clips = await asyncio.gather(
+        db.tracks.find({"project_id": {"$in": project_ids}}, {"_id": 0, "position": 0})
+            .sort([("position", ASCENDING), ("_id", ASCENDING)]).to_list(None),
+        db.clips.find({"project_id": {"$in": project_ids}}, CLIP_PROJECTION)
+            .sort("_id", ASCENDING).to_list(None)
+    )
+
+    clips_by_track: Dict[str, List[Dict[str, Any]]] = {}
+    for clip in clips:
+        clips_by_track.setdefault(clip['track_id'], []).append(clip)
+
+    tracks_by_project: Dict[str, List[Dict[str, Any]]] = {}
+    for track in tracks:
+        track['clips'] = clips_by_track.get(track['id'], [])
+        project_id = track.pop('project_id')
+        tracks_by_project.setdefault(project_id, []).append(mixer_buffer.overlay(project_id, track))
+
+    for project in projects:
+        if 'tracks' not in project:
+            project['tracks'] = tracks_by_project.get(project['id'], [])
+    return projects
+
+async def load_track(project_id: str, track_id: str) -> Optional[Dict[str, Any]]:
+    track, clips = await asyncio.gather(
+        db.tracks.find_one({"project_id": project_id, "id": track_id}, TRACK_PROJECTION),
+        db.clips.find({"project_id": project_id, "track_id": track_id}, CLIP_PROJECTION)
+            .sort("_id", ASCENDING).to_list(None)
+    )
+    if track:
+        track['clips'] = clips
+        mixer_buffer.overlay(project_id, track)
+    return track
+
+async def replace_track_clips(project_id: str, track_id: str, clips: List[Dict[str, Any]]):
+    """Make the stored clips of a track match `clips`, touching only what changed"""
+    clip_docs = [AudioClip(**clip).dict() for clip in clips]
+    keep_ids = [clip['id'] for clip in clip_docs]
+    file_urls = await clip_file_urls({"project_id": project_id, "track_id": track_id})
+    await db.clips.delete_many({"project_id": project_id, "track_id": track_id, "id": {"$nin": keep_ids}})
+    if clip_docs:
+        await db.clips.bulk_write([
+            UpdateOne(
+                {"project_id": project_id, "id": clip['id']},
+                {"$set": {**clip, "project_id": project_id, "track_id": track_id}},
+                upsert=True
+            )
+            for clip in clip_docs
+        ], ordered=False)
+    await update_file_references(file_urls, [clip['file_url'] for clip in clip_docs])
+
+async def normalize_project_layout(project: Dict[str, Any]) -> bool:
+    """
+    Move the embedded tracks/clips of a legacy project into their collections.
+
+    Safe to run while the API is serving traffic: inserts never overwrite
+    documents that already exist, and if another worker migrated the project
+    first, whatever this call inserted is rolled back. Returns True if this
+    call performed the migration.
+    """
+    project_id = project['id']
+    track_ops, clip_ops = [], []
+    seen_tracks, seen_clips = set(), set()
+    for position, track in enumerate(project.get('tracks') or []):
+        if track['id'] in seen_tracks:
+            continue
+        seen_tracks.add(track['id'])
+        track_doc, clip_docs = split_track_document(project_id, track, position)
+        track_ops.append(UpdateOne({"project_id": project_id, "id": track_doc['id']}, {"$setOnInsert": track_doc}, upsert=True))
+        for clip_doc in clip_docs:
+            if clip_doc['id'] in seen_clips:
+                continue
+            seen_clips.add(clip_doc['id'])
+            clip_ops.append(UpdateOne({"project_id": project_id, "id": clip_doc['id']}, {"$setOnInsert": clip_doc}, upsert=True))
+
+    inserted = {}
+    for collection, ops in ((db.tracks, track_ops), (db.clips, clip_ops)):
+        if ops:
+            result = await collection.bulk_write(ops, ordered=False)
+            inserted[collection] = list(result.upserted_ids.values())
+
+    result = await db.projects.update_one(
+        {"id": project_id, "layout": {"$ne": PROJECT_LAYOUT}},
+        {"$set": {"layout": PROJECT_LAYOUT, "track_seq": len(seen_tracks)}, "$unset": {"tracks": ""}}
+    )
+    if result.modified_count:
+        return True
+
+    # Someone else finished the migration first; undo our inserts so tracks
+    # they have since deleted are not resurrected.
+    for collection, ids in inserted.items():
+        if ids:
+            await collection.delete_many({"_id": {"$in": ids}})
+    return False
+
+async def ensure_project_layout(project_id: str, layout: Optional[int], project: Optional[Dict[str, Any]] = None):
+    """Migrate a legacy project before writing to it; `project` may be passed if already loaded in full"""
+    if layout != PROJECT_LAYOUT:
+        if project is None or 'tracks' not in project:
+            project = await db.projects.find_one({"id": project_id})
+        if project:
+            await normalize_project_layout(project)
+
+# Cursor pagination
+# Cursors are opaque to clients: base64url-encoded JSON holding the sort key
+# and id of the last item on the previous page.
+def encode_cursor(sort_value: Any, item_id: str) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"$date": sort_value.isoformat()}
+    raw = json.dumps({"k": sort_value, "id": item_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        sort_value = data['k']
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value['$date'])
+        return sort_value, str(data['id'])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(field: str, cursor: Optional[str], descending: bool = True) -> Dict[str, Any]:
+    """Query matching the items that sort after `cursor` on (field, id)"""
+    if not cursor:
+        return {}
+    sort_value, item_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: sort_value}},
+        {field: sort_value, "id": {op: item_id}}
+    ]}
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort_field: str,
+    limit: int,
+    after: Optional[str] = None,
+    descending: bool = True,
+    projection: Optional[Dict[str, Any]] = None
+):
+    """
+    Fetch one page sorted on (sort_field, id). Both keys are part of the
+    collection's index, so every page costs the same as the first one.
+    Returns the documents and the cursor for the next page (None on the last page).
+    """
+    page_filter = keyset_filter(sort_field, after, descending)
+    if page_filter:
+        query = {"$and": [query, page_filter]} if query else page_filter
+    direction = DESCENDING if descending else ASCENDING
+    docs = await collection.find(query, projection) \
+        .sort([(sort_field, direction), ("id", direction)]) \
+        .limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1][sort_field], docs[-1]['id'])
+    return docs, next_cursor
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+# Fast serialization for trusted reads
+# Documents read back from our own collections were validated when they were
+# written, so read routes shape them to the documented model and hand them
+# straight to orjson instead of rebuilding Pydantic models and having FastAPI
+# validate them a second time against response_model.
+_MODEL_DEFAULTS: Dict[type, Dict[str, Any]] = {}
+
+def model_defaults(model) -> Dict[str, Any]:
+    """Static defaults of a model's fields (fields with a default_factory are always stored)"""
+    defaults = _MODEL_DEFAULTS.get(model)
+    if defaults is None:
+        defaults = {
+            name: field.default
+            for name, field in model.model_fields.items()
+            if not field.is_required() and field.default_factory is None
+        }
+        _MODEL_DEFAULTS[model] = defaults
+    return defaults
+
+def trusted_dump(doc: Dict[str, Any], model) -> Dict[str, Any]:
+    """Shape a stored document like `model` (known fields only, defaults filled) without validating it"""
+    shaped = {name: doc[name] for name in model.model_fields if name in doc}
+    for name, default in model_defaults(model).items():
+        if name not in shaped:
+            shaped[name] = default
+    return shaped
+
+def trusted_project(doc: Dict[str, Any]) -> Dict[str, Any]:
+    project = trusted_dump(doc, Project)
+    tracks = []
+    for track_doc in project.get('tracks') or []:
+        track = trusted_dump(track_doc, Track)
+        track['clips'] = [trusted_dump(clip, AudioClip) for clip in track.get('clips') or []]
+        tracks.append(track)
+    project['tracks'] = tracks
+    return project
+
+def trusted_json(content: Any, headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    return ORJSONResponse(content, headers=headers)
+
+# Project versions and ETags
+# Every mutation bumps `version`, which If-Match is checked against. Projects
+# created before versioning have no `version` field and count as version 0.
+# Mixer values written behind (see MixerWriteBuffer) bump `mixer_version`
+# instead, and values still pending on this worker add their tag, so the ETag
+# changes with everything GET returns while If-Match only compares `version`:
+# "7", "7.3", or "7.3.<worker>-<n>".
+def project_etag(version: Optional[int], mixer_version: Optional[int] = 0, pending: Optional[str] = None) -> str:
+    tag = str(version or 0)
+    if mixer_version or pending:
+        tag += f".{mixer_version or 0}"
+    if pending:
+        tag += f".{pending}"
+    return f'"{tag}"'
+
+def parse_etags(header: Optional[str]) -> List[str]:
+    if not header:
+        return []
+    tags = []
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    tags = parse_etags(header)
+    return '*' in tags or etag in tags
+
+def expected_version(if_match: Optional[str]) -> Optional[int]:
+    """Project version an If-Match header refers to, or None when no precondition applies"""
+    tags = parse_etags(if_match)
+    if not tags or '*' in tags:
+        return None
+    if len(tags) == 1:
+        try:
+            return int(tags[0].strip('"').split('.')[0])
+        except ValueError:
+            pass
+    raise HTTPException(status_code=412, detail="Project has been modified")
+
+def version_filter(version: int) -> Dict[str, Any]:
+    return {"version": version} if version else {"version": {"$in": [0, None]}}
+
+SUMMARY_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "genre": 1, "tags": 1, "updated_at": 1,
+    # Only present on legacy projects that still embed their tracks
+    "tracks.id": 1, "tracks.clips.start_time": 1, "tracks.clips.duration": 1
+}
+
+def clip_end(clip: Dict[str, Any]) -> float:
+    return (clip.get('start_time') or 0.0) + (clip.get('duration') or 0.0)
+
+async def summarize_projects(projects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill in track_count and duration without loading tracks or clips"""
+    project_ids = [p['id'] for p in projects if 'tracks' not in p]
+    track_counts, durations = {}, {}
+    if project_ids:
+        track_groups, clip_groups = await asyncio.gather(
+            db.tracks.aggregate([
+                {"$match": {"project_id": {"$in": project_ids}}},
+                {"$group": {"_id": "$project_id", "count": {"$sum": 1}}}
+            ]).to_list(None),
+            db.clips.aggregate([
+                {"$match": {"project_id": {"$in": project_ids}}},
+                {"$group": {"_id": "$project_id", "end": {"$max": {"$add": ["$start_time", "$duration"]}}}}
+            ]).to_list(None)
+        )
+        track_counts = {group['_id']: group['count'] for group in track_groups}
+        durations = {group['_id']: group['end'] for group in clip_groups}
+
+    for project in projects:
+        tracks = project.pop('tracks', None)
+        if tracks is not None:
+            project['track_count'] = len(tracks)
+            project['duration'] = max((clip_end(c) for t in tracks for c in t.get('clips') or []), default=0.0)
+        else:
+            project['track_count'] = track_counts.get(project['id'], 0)
+            project['duration'] = durations.get(project['id']) or 0.0
+    return projects
+
+async def touch_project(project_id: str, if_match: Optional[str] = None):
+    """Bump updated_at and version; with If-Match, fail with 412 if the client's copy is stale"""
+    query = {"id": project_id}
+    version = expected_version(if_match)
+    if version is not None:
+        query.update(version_filter(version))
+    result = await db.projects.update_one(query, {"$set": {"updated_at": datetime.utcnow()}, "$inc": {"version": 1}})
+    if not result.matched_count and version is not None:
+        raise HTTPException(status_code=412, detail="Project has been modified")
+
+# Project patches
+# PATCH /projects/{id} applies RFC 6902 operations to the project as GET returns
+# it, with tracks and clips addressed by their index. Only the track/clip ids
+# and the documents the operations touch are read, and each edited document
+# gets one update of just the paths that changed.
+PATCH_PROJECT_FIELDS = frozenset(ProjectUpdate.model_fields)
+PATCH_TRACK_FIELDS = frozenset(Track.model_fields) - {'id', 'clips'}
+PATCH_CLIP_FIELDS = frozenset(AudioClip.model_fields) - {'id', 'track_id'}
+
+def patch_error(detail: str, status_code: int = 422) -> HTTPException:
+    return HTTPException(status_code=status_code, detail=detail)
+
+def parse_pointer(pointer: Any) -> List[str]:
+    if pointer == "":
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise patch_error(f"Invalid JSON pointer: {pointer!r}")
+    return [segment.replace('~1', '/').replace('~0', '~') for segment in pointer[1:].split('/')]
+
+def pointer_index(segment: str, length: int, append: bool = False) -> int:
+    """Array index of a pointer segment; with `append`, "-" and the index one past the end are allowed"""
+    if segment == '-' and append:
+        return length
+    if not segment.isdigit() or (segment != '0' and segment.startswith('0')):
+        raise patch_error(f"Invalid array index: {segment}")
+    index = int(segment)
+    if index > length or (index == length and not append):
+        raise patch_error(f"Array index out of range: {segment}", 409)
+    return index
+
+def pointer_get(value: Any, segments: List[str]) -> Any:
+    for segment in segments:
+        if isinstance(value, list):
+            value = value[pointer_index(segment, len(value))]
+        elif isinstance(value, dict) and segment in value:
+            value = value[segment]
+        else:
+            raise patch_error(f"Path not found: /{'/'.join(segments)}", 409)
+    return value
+
+def pointer_apply(document: Dict[str, Any], segments: List[str], op: str, value: Any = None) -> Tuple[str, ...]:
+    """Apply add/remove/replace inside a document; returns the path whose stored value changed"""
+    parent, key = pointer_get(document, segments[:-1]), segments[-1]
+    if isinstance(parent, list):
+        index = pointer_index(key, len(parent), append=op == 'add')
+        if op == 'add':
+            parent.insert(index, value)
+            # Appending only writes the new element; inserting shifts the rest
+            return tuple(segments[:-1] + [str(index)]) if index == len(parent) - 1 else tuple(segments[:-1])
+        if op == 'remove':
+            del parent[index]
+            return tuple(segments[:-1])
+        parent[index] = value
+        return tuple(segments[:-1] + [str(index)])
+    if isinstance(parent, dict):
+        if op != 'add' and key not in parent:
+            raise patch_error(f"Path not found: /{'/'.join(segments)}", 409)
+        if not key or '.' in key or key.startswith('$'):
+            raise patch_error(f"Invalid field name: {key!r}")
+        if op == 'remove':
+            del parent[key]
+        else:
+            parent[key] = value
+        return tuple(segments)
+    raise patch_error(f"Path not found: /{'/'.join(segments)}", 409)
+
+def path_update(document: Dict[str, Any], paths) -> Dict[str, Any]:
+    """$set (or $unset, once removed) each changed path that is not inside another one"""
+    update: Dict[str, Dict[str, Any]] = {}
+    covered: List[Tuple[str, ...]] = []
+    for path in sorted(paths, key=len):
+        if any(path[:len(prefix)] == prefix for prefix in covered):
+            continue
+        covered.append(path)
+        try:
+            value = pointer_get(document, list(path))
+        except HTTPException:
+            update.setdefault("$unset", {})[".".join(path)] = ""
+        else:
+            update.setdefault("$set", {})[".".join(path)] = value
+    return update
+
+def validate_document(model, value: Any) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        raise patch_error(f"Invalid {model.__name__}: expected an object")
+    try:
+        return model(**value).dict()
+    except ValidationError as e:
+        error = e.errors()[0]
+        location = '.'.join(str(part) for part in error['loc'])
+        raise patch_error(f"Invalid {model.__name__}: {location}: {error['msg']}")
+
+class ProjectPatch:
+    """
+    Edits to a stored project (JSON Patch or batch operations), applied in
+    memory and written by commit(). Track and clip ids are read up front to
+    resolve indexes; track and clip documents are read only when an operation
+    needs their contents.
+    """
+
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+        self.project: Dict[str, Any] = {}
+        self.mixer_version = 0  # of the project as loaded, then as written (for the ETag)
+        self.track_seq = 0
+        self.track_ids: List[str] = []
+        self.positions: Dict[str, float] = {}
+        self.clip_ids: Dict[str, List[str]] = {}  # track id -> clip ids, in order
+        self.clip_tracks: Dict[str, str] = {}  # clip id -> track id
+        self.tracks: Dict[str, Dict[str, Any]] = {}  # loaded or new track documents, without clips
+        self.clips: Dict[str, Dict[str, Any]] = {}
+        self.stored_tracks: set = set()
+        self.stored_clips: set = set()
+        self.created_tracks: set = set()
+        self.created_clips: set = set()
+        self.deleted_tracks: set = set()
+        self.deleted_clips: set = set()
+        self.replaced_clips: Dict[str, str] = {}  # new clip id -> id of the stored clip it replaced in place
+        self.moved_tracks: set = set()
+        self.changed: Dict[Tuple[str, str], set] = {}  # (kind, id) -> changed paths of stored documents
+
+    async def load(self):
+        project, tracks, clips = await asyncio.gather(
+            db.projects.find_one({"id": self.project_id}, {"_id": 0, "tracks": 0}),
+            db.tracks.find({"project_id": self.project_id}, {"_id": 0, "id": 1, "position": 1})
+                .sort([("position", ASCENDING), ("_id", ASCENDING)]).to_list(None),
+            db.clips.find({"project_id": self.project_id}, {"_id": 0, "id": 1, "track_id": 1})
+                .sort([("track_id", ASCENDING), ("_id", ASCENDING)]).to_list(None)
+        )
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        self.project = {**copy.deepcopy(model_defaults(Project)), **project}
+        self.mixer_version = project.get('mixer_version') or 0
+        self.track_seq = project.get('track_seq') or 0
+        for track in tracks:
+            self.track_ids.append(track['id'])
+            self.positions[track['id']] = track.get('position') or 0
+            self.clip_ids[track['id']] = []
+        for clip in clips:
+            if clip['track_id'] in self.clip_ids:
+                self.clip_ids[clip['track_id']].append(clip['id'])
+                self.clip_tracks[clip['id']] = clip['track_id']
+        self.stored_tracks = set(self.track_ids)
+        self.stored_clips = {clip['id'] for clip in clips}
+
+    async def apply(self, operation: Dict[str, Any]):
+        op = operation.get('op')
+        if op not in ('add', 'remove', 'replace', 'move', 'copy', 'test'):
+            raise patch_error(f"Unsupported operation: {op!r}")
+        if op in ('add', 'replace', 'test') and 'value' not in operation:
+            raise patch_error(f"'{op}' operation requires a value")
+        path = parse_pointer(operation.get('path'))
+
+        if op == 'add':
+            await self.add(path, operation['value'])
+        elif op == 'remove':
+            await self.remove(path)
+        elif op == 'replace':
+            await self.replace(path, operation['value'])
+        elif op == 'test':
+            if await self.get(path) != operation['value']:
+                raise patch_error(f"Test failed: {operation['path']}", 409)
+        else:
+            source = parse_pointer(operation.get('from'))
+            if op == 'move' and path[:len(source)] == source and path != source:
+                raise patch_error("Cannot move a value into itself")
+            if op == 'move' and self.resolve(source)[0] == 'tracks' and len(path) == 2 and path[0] == 'tracks':
+                self.move_track(self.track_ids[pointer_index(source[1], len(self.track_ids))], path[1])
+                return
+            value = copy.deepcopy(await self.get(source))
+            if op == 'move':
+                await self.remove(source)
+            await self.add(path, value)
+
+    def resolve(self, segments: List[str], append: bool = False):
+        """Map a pointer to (kind, key, path inside the document)"""
+        if not segments:
+            raise patch_error("Replacing the whole project is not supported")
+        if segments[0] != 'tracks':
+            if segments[0] not in PATCH_PROJECT_FIELDS:
+                raise patch_error(f"Field cannot be patched: {segments[0]}")
+            return 'project', self.project_id, segments
+        if len(segments) == 1:
+            raise patch_error("Patch tracks individually instead of replacing the track list")
+
+        index = pointer_index(segments[1], len(self.track_ids), append=append and len(segments) == 2)
+        if len(segments) == 2:
+            return 'tracks', index, []
+        track_id = self.track_ids[index]
+        if segments[2] != 'clips':
+            if segments[2] not in PATCH_TRACK_FIELDS:
+                raise patch_error(f"Field cannot be patched: {segments[2]}")
+            return 'track', track_id, segments[2:]
+        if len(segments) == 3:
+            return 'clip_list', track_id, []
+
+        clip_ids = self.clip_ids[track_id]
+        clip_index = pointer_index(segments[3], len(clip_ids), append=append and len(segments) == 4)
+        if len(segments) == 4:
+            return 'clips', (track_id, clip_index), []
+        if segments[4] not in PATCH_CLIP_FIELDS:
+            raise patch_error(f"Field cannot be patched: {segments[4]}")
+        return 'clip', clip_ids[clip_index], segments[4:]
+
+    async def document(self, kind: str, doc_id: str) -> Dict[str, Any]:
+        if kind == 'project':
+            return self.project
+        if kind == 'track':
+            if doc_id not in self.tracks:
+                track = await db.tracks.find_one({"project_id": self.project_id, "id": doc_id}, TRACK_PROJECTION)
+                self.tracks[doc_id] = {**copy.deepcopy(model_defaults(Track)), **(track or {})}
+                self.tracks[doc_id].pop('clips', None)
+            return self.tracks[doc_id]
+        await self.load_clips([doc_id])
+        return self.clips[doc_id]
+
+    async def load_clips(self, clip_ids: List[str]):
+        missing = [clip_id for clip_id in clip_ids if clip_id not in self.clips]
+        if missing:
+            clips = await db.clips.find({"project_id": self.project_id, "id": {"$in": missing}}, CLIP_PROJECTION).to_list(None)
+            for clip in clips:
+                self.clips[clip['id']] = {**copy.deepcopy(model_defaults(AudioClip)), **clip}
+
+    async def get(self, segments: List[str]) -> Any:
+        kind, key, path = self.resolve(segments)
+        if kind == 'tracks':
+            track_id = self.track_ids[key]
+            track = trusted_dump(await self.document('track', track_id), Track)
+            track['clips'] = await self.get(segments + ['clips'])
+            return track
+        if kind == 'clip_list':
+            await self.load_clips(self.clip_ids[key])
+            return [trusted_dump(self.clips[clip_id], AudioClip) for clip_id in self.clip_ids[key]]
+        if kind == 'clips':
+            track_id, index = key
+            return trusted_dump(await self.document('clip', self.clip_ids[track_id][index]), AudioClip)
+        return pointer_get(await self.document(kind, key), path)
+
+    async def add(self, segments: List[str], value: Any):
+        kind, key, path = self.resolve(segments, append=True)
+        if kind == 'tracks':
+            self.insert_track(value, key, self.place_track(key))
+        elif kind == 'clips':
+            track_id, index = key
+            if index != len(self.clip_ids[track_id]):
+                raise patch_error("Clips can only be appended to a track")
+            self.insert_clip(track_id, value)
+        elif kind == 'clip_list':
+            await self.replace(segments, value)
+        else:
+            await self.edit(kind, key, path, 'add', value)
+
+    async def remove(self, segments: List[str]):
+        kind, key, path = self.resolve(segments)
+        if kind == 'tracks':
+            self.delete_track(self.track_ids[key])
+        elif kind == 'clips':
+            track_id, index = key
+            self.delete_clip(self.clip_ids[track_id][index])
+        elif kind == 'clip_list':
+            for clip_id in list(self.clip_ids[key]):
+                self.delete_clip(clip_id)
+        else:
+            await self.edit(kind, key, path, 'remove')
+
+    async def replace(self, segments: List[str], value: Any):
+        kind, key, path = self.resolve(segments)
+        if kind == 'tracks':
+            track_id = self.track_ids[key]
+            position = self.positions[track_id]
+            self.delete_track(track_id)
+            self.insert_track(value, key, position)
+        elif kind == 'clips':
+            # Written over the stored document (see compile), which keeps its place in the track
+            track_id, index = key
+            old_id = self.clip_ids[track_id][index]
+            stored_id = self.replaced_clips.get(old_id, old_id)
+            self.delete_clip(old_id)
+            new_id = self.insert_clip(track_id, value, index)
+            if stored_id in self.stored_clips:
+                self.replaced_clips[new_id] = stored_id
+        elif kind == 'clip_list':
+            self.replace_clips(key, value)
+        else:
+            await self.edit(kind, key, path, 'replace', value)
+
+    async def edit(self, kind: str, doc_id: str, path: List[str], op: str, value: Any = None):
+        changed = pointer_apply(await self.document(kind, doc_id), path, op, copy.deepcopy(value))
+        if doc_id not in (self.created_tracks if kind == 'track' else self.created_clips):
+            self.changed.setdefault((kind, doc_id), set()).add(changed)
+
+    def place_track(self, index: int) -> float:
+        """Position that sorts a track inserted at `index` between its neighbours"""
+        if index == len(self.track_ids):
+            last = self.positions[self.track_ids[-1]] if self.track_ids else 0
+            self.track_seq = max(self.track_seq, int(last)) + 1
+            return self.track_seq
+        after = self.positions[self.track_ids[index]]
+        if index == 0:
+            return after - 1
+        return (self.positions[self.track_ids[index - 1]] + after) / 2
+
+    def require_track(self, track_id: Optional[str]) -> str:
+        if track_id not in self.positions:
+            raise patch_error(f"Track not found: {track_id}", 404)
+        return track_id
+
+    def require_clip(self, clip_id: Optional[str]) -> str:
+        if clip_id not in self.clip_tracks:
+            raise patch_error(f"Clip not found: {clip_id}", 404)
+        return clip_id
+
+    def move_track(self, track_id: str, index_segment: str):
+        self.track_ids.remove(track_id)
+        index = pointer_index(index_segment, len(self.track_ids), append=True)
+        self.positions[track_id] = self.place_track(index)
+        self.track_ids.insert(index, track_id)
+        if track_id in self.created_tracks:
+            self.tracks[track_id]['position'] = self.positions[track_id]
+        else:
+            self.moved_tracks.add(track_id)
+
+    def insert_track(self, value: Any, index: int, position: float) -> str:
+        track = validate_document(Track, value)
+        if track['id'] in self.positions:
+            raise patch_error(f"Track already exists: {track['id']}", 409)
+        clips = track.pop('clips')
+        track['position'] = position
+        self.track_ids.insert(index, track['id'])
+        self.positions[track['id']] = position
+        self.clip_ids[track['id']] = []
+        self.tracks[track['id']] = track
+        self.created_tracks.add(track['id'])
+        for clip in clips:
+            self.insert_clip(track['id'], clip)
+        return track['id']
+
+    def delete_track(self, track_id: str):
+        for clip_id in list(self.clip_ids[track_id]):
+            self.delete_clip(clip_id)
+        self.track_ids.remove(track_id)
+        del self.positions[track_id], self.clip_ids[track_id]
+        self.tracks.pop(track_id, None)
+        self.changed.pop(('track', track_id), None)
+        self.moved_tracks.discard(track_id)
+        self.created_tracks.discard(track_id)
+        if track_id in self.stored_tracks:
+            self.deleted_tracks.add(track_id)
+
+    def insert_clip(self, track_id: str, value: Any, index: Optional[int] = None) -> str:
+        clip = validate_document(AudioClip, {**value, "track_id": track_id} if isinstance(value, dict) else value)
+        if clip['id'] in self.clip_tracks:
+            raise patch_error(f"Clip already exists: {clip['id']}", 409)
+        clip_ids = self.clip_ids[track_id]
+        clip_ids.insert(len(clip_ids) if index is None else index, clip['id'])
+        self.clip_tracks[clip['id']] = track_id
+        self.clips[clip['id']] = clip
+        self.created_clips.add(clip['id'])
+        return clip['id']
+
+    def replace_clips(self, track_id: str, clips: Any):
+        if not isinstance(clips, list):
+            raise patch_error("Invalid clips: expected an array")
+        for clip_id in list(self.clip_ids[track_id]):
+            self.delete_clip(clip_id)
+        for clip in clips:
+            self.insert_clip(track_id, clip)
+
+    def delete_clip(self, clip_id: str):
+        self.clip_ids[self.clip_tracks.pop(clip_id)].remove(clip_id)
+        self.clips.pop(clip_id, None)
+        self.changed.pop(('clip', clip_id), None)
+        self.created_clips.discard(clip_id)
+        self.replaced_clips.pop(clip_id, None)
+        if clip_id in self.stored_clips:
+            self.deleted_clips.add(clip_id)
+
+    def document_update(self, kind: str, doc_id: str, model, document: Dict[str, Any]) -> Dict[str, Any]:
+        paths = self.changed.get((kind, doc_id))
+        return path_update(validate_document(model, document), paths) if paths else {}
+
+    def compile(self):
+        """Validate the patched documents and build the writes: (project update, track writes, clip writes)"""
+        project_id = self.project_id
+        track_writes, clip_writes = [], []
+        self.inserted = {"tracks": [], "clips": []}  # _ids of the documents the writes create
+        # Clips are ordered by _id, so a replaced clip is written over the stored
+        # one (unless that id is re-created elsewhere) instead of being re-inserted
+        in_place = {
+            clip_id: stored_id for clip_id, stored_id in self.replaced_clips.items() if stored_id not in self.created_clips
+        }
+        deleted_clips = self.deleted_clips - set(in_place.values())
+        # Deletes go first so that a track or clip can be re-created under the same id
+        if self.deleted_tracks:
+            track_writes.append(DeleteMany({"project_id": project_id, "id": {"$in": sorted(self.deleted_tracks)}}))
+        if deleted_clips:
+            clip_writes.append(DeleteMany({"project_id": project_id, "id": {"$in": sorted(deleted_clips)}}))
+
+        for track_id in self.track_ids:
+            if track_id in self.created_tracks:
+                track = self.tracks[track_id]
+                doc = validate_document(Track, track)
+                doc.pop('clips')
+                self.inserted["tracks"].append(ObjectId())
+                track_writes.append(InsertOne({
+                    **doc, "_id": self.inserted["tracks"][-1], "project_id": project_id, "position": track['position']
+                }))
+            else:
+                update = self.document_update('track', track_id, Track, self.tracks.get(track_id, {}))
+                if track_id in self.moved_tracks:
+                    update.setdefault("$set", {})["position"] = self.positions[track_id]
+                if update:
+                    track_writes.append(UpdateOne({"project_id": project_id, "id": track_id}, update))
+
+            for clip_id in self.clip_ids[track_id]:
+                if clip_id in in_place:
+                    doc = validate_document(AudioClip, self.clips[clip_id])
+                    clip_writes.append(ReplaceOne({"project_id": project_id, "id": in_place[clip_id]}, {**doc, "project_id": project_id}))
+                elif clip_id in self.created_clips:
+                    doc = validate_document(AudioClip, self.clips[clip_id])
+                    self.inserted["clips"].append(ObjectId())
+                    clip_writes.append(InsertOne({**doc, "_id": self.inserted["clips"][-1], "project_id": project_id}))
+                else:
+                    update = self.document_update('clip', clip_id, AudioClip, self.clips.get(clip_id, {}))
+                    if update:
+                        clip_writes.append(UpdateOne({"project_id": project_id, "id": clip_id}, update))
+
+        project_update = self.document_update('project', project_id, Project, self.project)
+        if self.track_seq > (self.project.get('track_seq') or 0):
+            project_update["$max"] = {"track_seq": self.track_seq}
+        return project_update, track_writes, clip_writes
+
+    async def commit(self, if_match: Optional[str] = None) -> int:
+        """
+        Write the edits if the project is still at the If-Match version and
+        return the new version. The patched documents are validated and the
+        ids of new tracks and clips checked before the first write.
+
+        Where the deployment supports transactions (a replica set or sharded
+        cluster) the writes are one transaction. A standalone server has none,
+        so the writes are not atomic there: the stored tracks and clips they
+        touch are read first, and if a write fails part-way the edits already
+        made are undone from those pre-images and the project's fields and
+        version put back. Other requests can see the edits while they are
+        being written, and an undo overwrites unconditional edits made to the
+        same documents in that window (a mixer write-behind flush, say).
+        """
+        project_update, track_writes, clip_writes = self.compile()
+        version = expected_version(if_match)
+        if not (project_update or track_writes or clip_writes):
+            current = self.project.get('version') or 0
+            if version is not None and version != current:
+                raise HTTPException(status_code=412, detail="Project has been modified")
+            return current
+        await self.check_new_ids()
+
+        removed_files = await clip_file_urls({"project_id": self.project_id, "id": {"$in": sorted(self.deleted_clips)}}) \
+            if self.deleted_clips else []
+        if await transactions_supported():
+            async with await client.start_session() as session:
+                async with session.start_transaction():
+                    version = await self.write(version, project_update, track_writes, clip_writes, session)
+        else:
+            version = await self.write(version, project_update, track_writes, clip_writes)
+        await update_file_references(removed_files, [self.clips[clip_id].get('file_url') for clip_id in self.created_clips])
+        return version
+
+    async def check_new_ids(self):
+        """409 if a track or clip about to be created has been created concurrently"""
+        for collection, created, deleted, kind in (
+            (db.tracks, self.created_tracks, self.deleted_tracks, "Track"),
+            (db.clips, self.created_clips, self.deleted_clips, "Clip")
+        ):
+            ids = created - deleted  # a deleted id can be re-created (a clip moved to another track, say)
+            if ids:
+                existing = await collection.find_one({"project_id": self.project_id, "id": {"$in": sorted(ids)}}, {"_id": 0, "id": 1})
+                if existing:
+                    raise HTTPException(status_code=409, detail=f"{kind} already exists: {existing['id']}")
+
+    async def pre_images(self) -> Dict[str, List[Dict[str, Any]]]:
+        """The stored tracks and clips the writes change or delete, as they are now (with their _id)"""
+        changed = lambda kind: {doc_id for changed_kind, doc_id in self.changed if changed_kind == kind}
+        track_ids = (changed('track') | self.moved_tracks | self.deleted_tracks) & self.stored_tracks
+        clip_ids = (changed('clip') | self.deleted_clips) & self.stored_clips
+        async def read(collection, ids):
+            return await collection.find({"project_id": self.project_id, "id": {"$in": sorted(ids)}}).to_list(None) if ids else []
+        tracks, clips = await asyncio.gather(read(db.tracks, track_ids), read(db.clips, clip_ids))
+        return {"tracks": tracks, "clips": clips}
+
+    async def write(self, version: Optional[int], project_update, track_writes, clip_writes, session=None) -> int:
+        query = {"id": self.project_id}
+        if version is not None:
+            query.update(version_filter(version))
+        undo = await self.pre_images() if session is None and (track_writes or clip_writes) else None
+        project_update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+        project_update["$inc"] = {"version": 1}
+        # The project as it was: its version, and the fields the update changes for an undo
+        fields = {path.split('.')[0] for operator in ("$set", "$unset", "$max") for path in project_update.get(operator, {})}
+        before = await db.projects.find_one_and_update(
+            query, project_update, projection={"_id": 0, "version": 1, "mixer_version": 1, **{field: 1 for field in fields}},
+            return_document=ReturnDocument.BEFORE, session=session
+        )
+        if not before:
+            raise HTTPException(status_code=412, detail="Project has been modified")
+        written = (before.get('version') or 0) + 1
+        self.mixer_version = before.get('mixer_version') or 0
+
+        try:
+            if track_writes:
+                await db.tracks.bulk_write(track_writes, session=session)
+            if clip_writes:
+                await db.clips.bulk_write(clip_writes, session=session)
+        except PyMongoError as e:
+            if undo is not None:
+                await self.undo(undo, before, fields, written)
+            if isinstance(e, BulkWriteError):
+                raise HTTPException(status_code=409, detail="Patch conflicts with a concurrent change")
+            raise
+        return written
+
+    async def undo(self, pre_images: Dict[str, List[Dict[str, Any]]], before: Dict[str, Any], fields, written: int):
+        """Put back what a failed write() without a transaction had already changed"""
+        try:
+            for name, collection in (("tracks", db.tracks), ("clips", db.clips)):
+                restore = [ReplaceOne({"_id": doc['_id']}, doc, upsert=True) for doc in pre_images[name]]
+                if self.inserted[name]:
+                    restore.insert(0, DeleteMany({"_id": {"$in": self.inserted[name]}}))
+                if restore:
+                    await collection.bulk_write(restore, ordered=False)
+            # Only while no later write has moved the project on
+            restore = {"$set": {"version": before.get('version') or 0}}
+            for field in fields:
+                if field in before:
+                    restore["$set"][field] = before[field]
+                else:
+                    restore.setdefault("$unset", {})[field] = ""
+            await db.projects.update_one({"id": self.project_id, "version": written}, restore)
+        except PyMongoError as e:
+            logger.error(f"Could not undo a failed patch of project {self.project_id}: {e}")
+            raise HTTPException(status_code=500, detail="Patch failed part-way and could not be undone")
+
+_TRANSACTIONS_SUPPORTED: Optional[bool] = None
+
+async def transactions_supported() -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster"""
+    global _TRANSACTIONS_SUPPORTED
+    if _TRANSACTIONS_SUPPORTED is None:
+        try:
+            hello = await client.admin.command("hello")
+            _TRANSACTIONS_SUPPORTED = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _TRANSACTIONS_SUPPORTED = False
+    return _TRANSACTIONS_SUPPORTED
+
+# Batch operations
+# POST /projects/{id}/batch takes an ordered list of track, clip and effect
+# operations addressed by id. They are applied with the same machinery as
+# PATCH, so the whole batch is validated before anything is written, and a
+# write that fails part-way is rolled back (see ProjectPatch.commit).
+BATCH_MAX_OPERATIONS = 500
+
+async def apply_batch_operation(patch: ProjectPatch, operation: BatchOperation) -> Dict[str, Any]:
+    op, data = operation.op, operation.data
+    if op == 'add_track':
+        index = len(patch.track_ids) if operation.index is None else pointer_index(str(operation.index), len(patch.track_ids), append=True)
+        return {"op": op, "id": patch.insert_track(data, index, patch.place_track(index))}
+
+    if op == 'add_clip':
+        return {"op": op, "id": patch.insert_clip(patch.require_track(operation.track_id), data)}
+
+    if op == 'update_clip':
+        clip_id = patch.require_clip(operation.clip_id)
+        target = data.get('track_id')
+        if target is not None and target != patch.clip_tracks[clip_id]:
+            # Moving a clip to another track
+            clip = {**trusted_dump(await patch.document('clip', clip_id), AudioClip), **data}
+            patch.require_track(target)
+            patch.delete_clip(clip_id)
+            return {"op": op, "id": patch.insert_clip(target, clip)}
+        for field, value in data.items():
+            if field in ('id', 'track_id'):
+                continue
+            if field not in PATCH_CLIP_FIELDS:
+                raise patch_error(f"Field cannot be patched: {field}")
+            await patch.edit('clip', clip_id, [field], 'add', value)
+        validate_document(AudioClip, await patch.document('clip', clip_id))
+        return {"op": op, "id": clip_id}
+
+    if op == 'delete_clip':
+        patch.delete_clip(patch.require_clip(operation.clip_id))
+        return {"op": op, "id": operation.clip_id}
+
+    if op == 'reorder_tracks':
+        track_ids = operation.track_ids or []
+        if sorted(track_ids) != sorted(patch.track_ids):
+            raise patch_error("track_ids must list every track of the project exactly once")
+        for index, track_id in enumerate(track_ids):
+            if patch.track_ids[index] != track_id:
+                patch.move_track(track_id, str(index))
+        return {"op": op}
+
+    track_id = patch.require_track(operation.track_id)
+    if op == 'update_track':
+        for field, value in data.items():
+            if field == 'clips':
+                patch.replace_clips(track_id, value)
+            elif field in PATCH_TRACK_FIELDS:
+                await patch.edit('track', track_id, [field], 'add', value)
+            elif field != 'id':
+                raise patch_error(f"Field cannot be patched: {field}")
+    elif op == 'delete_track':
+        patch.delete_track(track_id)
+    elif op == 'add_effect':
+        await patch.edit('track', track_id, ['effects', '-' if operation.index is None else str(operation.index)], 'add', data)
+    elif op in ('update_effect', 'remove_effect'):
+        if operation.index is None:
+            raise patch_error(f"'{op}' requires an index")
+        if op == 'update_effect':
+            await patch.edit('track', track_id, ['effects', str(operation.index)], 'replace', data)
+        else:
+            await patch.edit('track', track_id, ['effects', str(operation.index)], 'remove')
+    else:
+        raise patch_error(f"Unsupported operation: {op!r}")
+    if op != 'delete_track':
+        validate_document(Track, await patch.document('track', track_id))
+    return {"op": op, "id": track_id}
+
+# Mixer write-behind buffer
+class MixerWriteBuffer:
+    """
+    Write-behind buffer for mixer parameters (volume, pan, muted, solo).
+
+    A fader drag sends a burst of tiny track updates. They are acknowledged at
+    once and merged per track (last value wins); each project's pending
+    changes are written as one bulk update, plus one `mixer_version` bump, no
+    later than `window` seconds after the first of them arrived. Reads served
+    by this worker see pending values immediately; other workers see them
+    once flushed. Any other write to the project flushes its buffer first, so
+    buffered values can never overwrite a later edit. Once `max_pending`
+    tracks are waiting, an update flushes its own project before it is
+    acknowledged, so writers wait for the database instead of piling up.
+
+    Mixer values never move tracks or clips, so they leave `version` (what
+    If-Match is checked against) alone: they only change the ETag, through
+    `mixer_version` and the tag of this worker's pending values.
+    """
+
+    FIELDS = frozenset({'volume', 'pan', 'muted', 'solo'})
+
+    def __init__(self, window: float, max_pending: int):
+        self.window = window
+        self.max_pending = max_pending
+        self._pending: Dict[str, Dict[str, Dict[str, Any]]] = {}  # project id -> track id -> fields
+        self._tracks: Dict[str, Dict[str, Dict[str, Any]]] = {}  # project id -> track id -> track as last returned
+        self._generations: Dict[str, int] = {}  # project id -> updates received since its last flush
+        self._worker = uuid.uuid4().hex[:8]
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.pending_tracks = 0
+        self.received = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.backpressure_flushes = 0
+
+    def accepts(self, fields: Dict[str, Any]) -> bool:
+        return self.window > 0 and bool(fields) and fields.keys() <= self.FIELDS
+
+    async def put(self, project_id: str, track_id: str, fields: Dict[str, Any], track: Optional[Dict[str, Any]] = None):
+        """Buffer `fields` for a track; `track` (with the fields applied) is kept for buffered_track()"""
+        tracks = self._pending.setdefault(project_id, {})
+        if track_id not in tracks:
+            tracks[track_id] = {}
+            self.pending_tracks += 1
+        tracks[track_id].update(fields)
+        if track is not None:
+            self._tracks.setdefault(project_id, {})[track_id] = track
+        elif track_id in self._tracks.get(project_id, {}):
+            self._tracks[project_id][track_id].update(fields)
+        self._generations[project_id] = self._generations.get(project_id, 0) + 1
+        self.received += 1
+        if self.pending_tracks >= self.max_pending:
+            self.backpressure_flushes += 1
+            await self.flush_project(project_id)
+        elif project_id not in self._timers:
+            self._timers[project_id] = asyncio.create_task(self._flush_later(project_id))
+
+    def overlay(self, project_id: str, track: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply pending values to a track read from the database"""
+        fields = self._pending.get(project_id, {}).get(track['id'])
+        if fields:
+            track.update(fields)
+        return track
+
+    def buffered_track(self, project_id: str, track_id: str) -> Optional[Dict[str, Any]]:
+        """The track (with its clips) as last returned for an update that is still pending"""
+        track = self._tracks.get(project_id, {}).get(track_id)
+        return copy.deepcopy(track) if track is not None else None
+
+    def pending_tag(self, project_id: str) -> Optional[str]:
+        """Identifies this worker's pending values for a project in its ETag (None when there are none)"""
+        if project_id not in self._pending:
+            return None
+        return f"{self._worker}-{self._generations[project_id]}"
+
+    async def _flush_later(self, project_id: str):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._timers.pop(project_id, None)
+        await self.flush_project(project_id)
+
+    async def flush_project(self, project_id: str):
+        if project_id not in self._pending:
+            return
+        lock = self._locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            tracks = self._pending.pop(project_id, None)
+            self._tracks.pop(project_id, None)
+            if tracks:
+                self.pending_tracks -= len(tracks)
+                try:
+                    await db.tracks.bulk_write([
+                        UpdateOne({"project_id": project_id, "id": track_id}, {"$set": fields})
+                        for track_id, fields in tracks.items()
+                    ], ordered=False)
+                    await db.projects.update_one(
+                        {"id": project_id}, {"$set": {"updated_at": datetime.utcnow()}, "$inc": {"mixer_version": 1}}
+                    )
+                    self.flushes += 1
+                    self.written += len(tracks)
+                    if project_id not in self._pending:
+                        self._generations.pop(project_id, None)
+                except Exception as e:
+                    # Keep the values for the next flush, behind anything newer
+                    self.failures += 1
+                    logger.error(f"Mixer flush failed for project {project_id}: {e}")
+                    pending = self._pending.setdefault(project_id, {})
+                    self.pending_tracks += len(tracks.keys() - pending.keys())
+                    for track_id, fields in tracks.items():
+                        pending[track_id] = {**fields, **pending.get(track_id, {})}
+                    if project_id not in self._timers:
+                        self._timers[project_id] = asyncio.create_task(self._flush_later(project_id))
+        if project_id not in self._pending and not lock.locked():
+            self._locks.pop(project_id, None)
+
+    def discard_project(self, project_id: str):
+        self.pending_tracks -= len(self._pending.pop(project_id, None) or {})
+        self._tracks.pop(project_id, None)
+        self._generations.pop(project_id, None)
+
+    async def flush_all(self):
+        for task in list(self._timers.values()):
+            task.cancel()
+        self._timers.clear()
+        for project_id in list(self._pending):
+            await self.flush_project(project_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "pending_projects": len(self._pending),
+            "pending_tracks": self.pending_tracks,
+            "received": self.received,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "backpressure_flushes": self.backpressure_flushes,
+            "coalescing_ratio": round(self.received / self.written, 2) if self.written else None
+        }
+
+mixer_buffer = MixerWriteBuffer(MIXER_WRITE_BEHIND_MS / 1000, MIXER_MAX_PENDING_TRACKS)
+register_metrics("mixer_write_behind", mixer_buffer.metrics)
+
+async def buffer_mixer_patch(project_id: str, operations: List[Any]) -> bool:
+    """
+    Hand a JSON Patch that only replaces mixer fields of tracks (what the
+    Studio autosaves during a fader drag) to mixer_buffer instead of writing
+    it. Returns False, with nothing buffered, for any other patch.
+    """
+    if mixer_buffer.window <= 0 or not operations:
+        return False
+    edits = []
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('op') != 'replace' or 'value' not in operation:
+            return False
+        path = operation.get('path')
+        segments = path.split('/') if isinstance(path, str) else []
+        if len(segments) != 4 or segments[:2] != ['', 'tracks'] or segments[3] not in MixerWriteBuffer.FIELDS:
+            return False
+        if not segments[2].isdigit() or segments[2] != str(int(segments[2])):
+            return False
+        edits.append((int(segments[2]), segments[3], operation['value']))
+
+    tracks = await db.tracks.find(
+        {"project_id": project_id}, {"_id": 0, "id": 1, "name": 1, "instrument": 1, **{f: 1 for f in MixerWriteBuffer.FIELDS}}
+    ).sort([("position", ASCENDING), ("_id", ASCENDING)]).to_list(None)
+    changes: Dict[str, Dict[str, Any]] = {}
+    for index, field, value in edits:
+        if index >= len(tracks):
+            return False  # let the patch fail the usual way
+        changes.setdefault(tracks[index]['id'], {})[field] = value
+    # Validate everything before buffering anything
+    by_id = {track['id']: track for track in tracks}
+    validated = {
+        track_id: validate_document(Track, {**mixer_buffer.overlay(project_id, by_id[track_id]), **fields})
+        for track_id, fields in changes.items()
+    }
+    for track_id, fields in changes.items():
+        await mixer_buffer.put(project_id, track_id, {k: validated[track_id][k] for k in fields})
+    return True
+
+# Database indexes
+# Every query on a request path must be served by one of these. Missing indexes
+# are built on startup; with INDEX_SELF_CHECK=1 the canonical query of each hot
+# route is also explained and startup fails if any of them scans a collection.
+INDEX_SELF_CHECK = os.environ.get('INDEX_SELF_CHECK', '').lower() in ('1', 'true', 'yes')
+
+REQUIRED_INDEXES = [
+    {"collection": "users", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "users", "keys": [("username", ASCENDING)], "unique": True},
+    {"collection": "users", "keys": [("email", ASCENDING)], "unique": True},
+    {"collection": "projects", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "projects", "keys": [("owner_id", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "projects", "keys": [("collaborators", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "projects", "keys": [("is_public", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "projects", "keys": [("layout", ASCENDING)]},
+    {"collection": "tracks", "keys": [("project_id", ASCENDING), ("id", ASCENDING)], "unique": True},
+    {"collection": "tracks", "keys": [("project_id", ASCENDING), ("position", ASCENDING), ("_id", ASCENDING)]},
+    {"collection": "clips", "keys": [("project_id", ASCENDING), ("id", ASCENDING)], "unique": True},
+    {"collection": "clips", "keys": [("project_id", ASCENDING), ("track_id", ASCENDING), ("_id", ASCENDING)]},
+    {"collection": "clips", "keys": [("file_url", ASCENDING)]},
+    {"collection": "comments", "keys": [("project_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)]},
+    {"collection": "likes", "keys": [("user_id", ASCENDING), ("project_id", ASCENDING)], "unique": True},
+    {"collection": "likes", "keys": [("project_id", ASCENDING)]},
+    {"collection": "status_checks", "keys": [("timestamp", ASCENDING), ("id", ASCENDING)]},
+    {"collection": "upload_sessions", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "upload_sessions", "keys": [("expires_at", ASCENDING)]},
+    {"collection": "blobs", "keys": [("digest", ASCENDING)], "unique": True},
+    {"collection": "blobs", "keys": [("file_id", ASCENDING)], "unique": True},
+    {"collection": "jobs", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "jobs", "keys": [("type", ASCENDING), ("status", ASCENDING), ("run_at", ASCENDING)]},
+    {"collection": "jobs", "keys": [("status", ASCENDING), ("lease_expires_at", ASCENDING)]},
+    {"collection": "jobs", "keys": [("expires_at", ASCENDING)], "expire_after_seconds": 0},
+]
+
+# (route, collection, filter, sort) for the hot query behind each route
+CANONICAL_QUERIES = [
+    ("POST /auth/register", "users", {"$or": [{"username": "~"}, {"email": "~"}]}, None),
+    ("POST /auth/login", "users", {"username": "~"}, None),
+    ("get_current_user", "users", {"id": "~"}, None),
+    ("GET /projects", "projects", {"$or": [{"owner_id": "~"}, {"collaborators": "~"}]}, [("updated_at", DESCENDING), ("id", DESCENDING)]),
+    ("GET /projects/public", "projects", {"is_public": True}, [("updated_at", DESCENDING), ("id", DESCENDING)]),
+    ("GET /projects/{id}", "projects", {"id": "~"}, None),
+    ("project tracks", "tracks", {"project_id": "~"}, [("position", ASCENDING), ("_id", ASCENDING)]),
+    ("PUT /projects/{id}/tracks/{id}", "tracks", {"project_id": "~", "id": "~"}, None),
+    ("track clips", "clips", {"project_id": "~", "track_id": "~"}, [("_id", ASCENDING)]),
+    ("DELETE /audio/file/{id}", "clips", {"file_url": "~"}, None),
+    ("GET /projects/{id}/comments", "comments", {"project_id": "~"}, [("created_at", ASCENDING), ("id", ASCENDING)]),
+    ("POST /projects/{id}/like", "likes", {"user_id": "~", "project_id": "~"}, None),
+    ("GET /projects/{id}/likes", "likes", {"project_id": "~"}, None),
+    ("GET /status", "status_checks", {}, [("timestamp", ASCENDING), ("id", ASCENDING)]),
+    ("PUT /audio/uploads/{id}", "upload_sessions", {"id": "~"}, None),
+    ("upload session sweeper", "upload_sessions", {"expires_at": {"$lt": "~"}}, None),
+    ("POST /audio/upload", "blobs", {"digest": "~"}, None),
+    ("DELETE /audio/file/{id}", "blobs", {"file_id": "~"}, None),
+    ("GET /jobs/{id}", "jobs", {"id": "~"}, None),
+    ("job claim", "jobs", {"type": "~", "status": "queued", "run_at": {"$lte": "~"}}, [("run_at", ASCENDING)]),
+    ("job lease recovery", "jobs", {"status": "running", "lease_expires_at": {"$lt": "~"}}, None),
+]
 
-# Authentication Helper Functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def ensure_indexes():
+    """Build any declared index that does not exist yet"""
+    failures = []
+    existing_by_collection = {}
+    for spec in REQUIRED_INDEXES:
+        collection = db[spec['collection']]
+        if spec['collection'] not in existing_by_collection:
+            info = await collection.index_information()
+            existing_by_collection[spec['collection']] = [
+                [(field, int(direction)) for field, direction in index['key']] for index in info.values()
+            ]
+        keys = [(field, int(direction)) for field, direction in spec['keys']]
+        if keys in existing_by_collection[spec['collection']]:
+            continue
+        try:
+            options = {"expireAfterSeconds": spec['expire_after_seconds']} if 'expire_after_seconds' in spec else {}
+            name = await collection.create_index(spec['keys'], unique=spec.get('unique', False), **options)
+            existing_by_collection[spec['collection']].append(keys)
+            logger.info(f"Created index {spec['collection']}.{name}")
+        except Exception as e:
+            failures.append(f"{spec['collection']} {keys}: {e}")
+            logger.error(f"Failed to create index on {spec['collection']} {keys}: {e}")
+    return failures
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+def plan_stages(plan: Any) -> List[str]:
+    """All stage names in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if isinstance(plan.get('stage'), str):
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
 
-def create_jwt_token(user_id: str) -> str:
-    payload = {
-        'user_id': user_id,
-        'exp': datetime.utcnow() + timedelta(days=30)
-    }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+async def verify_query_plans() -> List[str]:
+    """Explain every canonical query and report the ones that scan a whole collection"""
+    problems = []
+    for route, collection_name, query, sort in CANONICAL_QUERIES:
+        cursor = db[collection_name].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = plan_stages(explanation.get('queryPlanner', {}).get('winningPlan', {}))
+        if 'COLLSCAN' in stages:
+            problems.append(f"{route}: {collection_name}.find({query}) is a collection scan")
+        elif 'SORT' in stages:
+            logger.warning(f"{route}: {collection_name}.find({query}) sorts in memory")
+    return problems
 
-def verify_jwt_token(token: str) -> str:
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload['user_id']
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+async def bootstrap_indexes():
+    failures = await ensure_indexes()
+    if not INDEX_SELF_CHECK:
+        return
+    problems = failures + await verify_query_plans()
+    if problems:
+        raise RuntimeError("Index self-check failed:\n  " + "\n  ".join(problems))
+    logger.info(f"Index self-check passed for {len(CANONICAL_QUERIES)} queries")
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
-    try:
-        user_id = verify_jwt_token(credentials.credentials)
-        user = await db.users.find_one({"id": user_id})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user_id
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Invalid authentication")
+# Project access
+# Routes authorize through these dependencies instead of loading the project:
+# one projected read of the ownership fields, memoized on the request so that
+# several dependencies (or a handler) asking again cost nothing.
+PROJECT_ROLES = {"viewer": 0, "collaborator": 1, "owner": 2}
 
-# Audio Processing Utilities
-def encode_audio_to_base64(audio_data: bytes) -> str:
-    return base64.b64encode(audio_data).decode('utf-8')
+class ProjectAccess(BaseModel):
+    project_id: str
+    user_id: str
+    role: Optional[str] = None  # owner, collaborator, viewer (public projects) or None
+    owner_id: str
+    collaborators: List[str] = []
+    is_public: bool = False
+    version: int = 0
+    mixer_version: int = 0
+    layout: Optional[int] = None
 
-def decode_audio_from_base64(base64_data: str) -> bytes:
-    return base64.b64decode(base64_data)
+    def allows(self, role: str) -> bool:
+        return self.role is not None and PROJECT_ROLES[self.role] >= PROJECT_ROLES[role]
 
-# File handling utilities
-async def save_uploaded_file(file: UploadFile) -> str:
-    file_id = str(uuid.uuid4())
-    file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'wav'
-    file_path = UPLOAD_DIR / f"{file_id}.{file_extension}"
+async def load_project_access(request: Request, project_id: str, user_id: str) -> ProjectAccess:
+    memo = getattr(request.state, 'project_access', None)
+    if memo is None:
+        memo = request.state.project_access = {}
+    key = (project_id, user_id)
+    if key in memo:
+        return memo[key]
+    
+    project = await db.projects.find_one({"id": project_id}, PROJECT_ACCESS_PROJECTION)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    collaborators = project.get('collaborators') or []
+    if project['owner_id'] == user_id:
+        role = "owner"
+    elif user_id in collaborators:
+        role = "collaborator"
+    elif project.get('is_public', False):
+        role = "viewer"
+    else:
+        role = None
     
-    return str(file_path)
+    access = ProjectAccess(
+        project_id=project_id,
+        user_id=user_id,
+        role=role,
+        owner_id=project['owner_id'],
+        collaborators=collaborators,
+        is_public=project.get('is_public', False),
+        version=project.get('version') or 0,
+        mixer_version=project.get('mixer_version') or 0,
+        layout=project.get('layout')
+    )
+    memo[key] = access
+    return access
+
+async def authorize_project(request: Request, project_id: str, user_id: str, role: str, detail: str = "Access denied") -> ProjectAccess:
+    access = await load_project_access(request, project_id, user_id)
+    if not access.allows(role):
+        raise HTTPException(status_code=403, detail=detail)
+    return access
+
+def require_project_role(role: str, detail: str = "Access denied"):
+    async def dependency(request: Request, project_id: str, current_user_id: str = Depends(get_current_user)) -> ProjectAccess:
+        return await authorize_project(request, project_id, current_user_id, role, detail)
+    return dependency
+
+project_viewer = require_project_role("viewer")
+project_editor = require_project_role("collaborator")
 
 # Initialize default effects and instruments
 DEFAULT_EFFECTS = [
@@ -415,7 +3132,7 @@ async def register_user(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Username or email already exists")
     
     # Create new user
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     user = User(
         username=user_data.username,
         email=user_data.email,
@@ -425,7 +3142,10 @@ async def register_user(user_data: UserCreate):
     # Save to database
     user_dict = user.dict()
     user_dict['password'] = hashed_password
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Username or email already exists")
     
     # Create JWT token
     token = create_jwt_token(user.id)
@@ -436,7 +3156,7 @@ async def register_user(user_data: UserCreate):
 async def login_user(login_data: UserLogin):
     # Find user
     user = await db.users.find_one({"username": login_data.username})
-    if not user or not verify_password(login_data.password, user['password']):
+    if not user or not await verify_password_async(login_data.password, user['password']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Create JWT token
@@ -466,6 +3186,7 @@ async def update_current_user(user_update: UserUpdate, current_user_id: str = De
     
     if update_data:
         await db.users.update_one({"id": current_user_id}, {"$set": update_data})
+        principal_cache.invalidate_user(current_user_id)
     
     user = await db.users.find_one({"id": current_user_id})
     del user['password']
@@ -475,7 +3196,7 @@ async def update_current_user(user_update: UserUpdate, current_user_id: str = De
 
 # Project Routes
 @api_router.post("/projects", response_model=Project)
-async def create_project(project_data: ProjectCreate, current_user_id: str = Depends(get_current_user)):
+async def create_project(project_data: ProjectCreate, response: Response, current_user_id: str = Depends(get_current_user)):
     project = Project(
         name=project_data.name,
         description=project_data.description,
@@ -483,133 +3204,290 @@ async def create_project(project_data: ProjectCreate, current_user_id: str = Dep
         is_public=project_data.is_public
     )
     
-    await db.projects.insert_one(project.dict())
+    project_doc = project.dict(exclude={'tracks'})
+    project_doc.update(layout=PROJECT_LAYOUT, track_seq=0)
+    await db.projects.insert_one(project_doc)
+    response.headers["ETag"] = project_etag(project.version)
     return project
 
 @api_router.get("/projects", response_model=List[Project])
-async def get_user_projects(current_user_id: str = Depends(get_current_user)):
-    projects = await db.projects.find({
-        "$or": [
-            {"owner_id": current_user_id},
-            {"collaborators": current_user_id}
-        ]
-    }).to_list(100)
+async def get_user_projects(
+    limit: int = 100,
+    after: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user)
+):
+    projects, next_cursor = await fetch_page(
+        db.projects,
+        {"$or": [{"owner_id": current_user_id}, {"collaborators": current_user_id}]},
+        "updated_at", max(1, min(limit, 100)), after
+    )
+    
+    await attach_tracks(projects)
+    result = trusted_json([trusted_project(project) for project in projects])
+    set_next_cursor(result, next_cursor)
+    return result
+
+@api_router.get("/projects/summary", response_model=ProjectSummaryPage)
+async def get_user_project_summaries(
+    response: Response,
+    limit: int = 20,
+    after: Optional[str] = None,
+    current_user_id: str = Depends(get_current_user)
+):
+    """
+    Lightweight project listing for dashboards: listing fields only, newest
+    first, paged with an opaque cursor (pass `next_cursor` back as `after`).
+    """
+    projects, next_cursor = await fetch_page(
+        db.projects,
+        {"$or": [{"owner_id": current_user_id}, {"collaborators": current_user_id}]},
+        "updated_at", max(1, min(limit, 100)), after,
+        projection=SUMMARY_PROJECTION
+    )
     
-    return [Project(**project) for project in projects]
+    await summarize_projects(projects)
+    set_next_cursor(response, next_cursor)
+    return ProjectSummaryPage(items=[ProjectSummary(**p) for p in projects], next_cursor=next_cursor)
 
 @api_router.get("/projects/public", response_model=List[Project])
-async def get_public_projects(limit: int = 20):
-    projects = await db.projects.find({"is_public": True}).limit(limit).to_list(limit)
-    return [Project(**project) for project in projects]
+async def get_public_projects(limit: int = 20, after: Optional[str] = None):
+    projects, next_cursor = await fetch_page(
+        db.projects, {"is_public": True}, "updated_at", max(1, min(limit, 100)), after
+    )
+    await attach_tracks(projects)
+    result = trusted_json([trusted_project(project) for project in projects])
+    set_next_cursor(result, next_cursor)
+    return result
 
 @api_router.get("/projects/{project_id}", response_model=Project)
-async def get_project(project_id: str, current_user_id: str = Depends(get_current_user)):
+async def get_project(
+    project_id: str,
+    if_none_match: Optional[str] = Header(None),
+    access: ProjectAccess = Depends(project_viewer)
+):
+    # Unchanged since the client's copy: skip loading tracks and clips entirely
+    etag = project_etag(access.version, access.mixer_version, mixer_buffer.pending_tag(project_id))
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    
     project = await db.projects.find_one({"id": project_id})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
+    if project.get('layout') != PROJECT_LAYOUT:
+        await normalize_project_layout(project)
+    else:
+        await attach_tracks([project])
     
-    # Check if user has access
-    if project['owner_id'] != current_user_id and current_user_id not in project.get('collaborators', []) and not project.get('is_public', False):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    return Project(**project)
+    return trusted_json(trusted_project(project), headers={
+        "ETag": project_etag(project.get('version'), project.get('mixer_version'), mixer_buffer.pending_tag(project_id)),
+        "Cache-Control": "private, no-cache"
+    })
 
 @api_router.put("/projects/{project_id}", response_model=Project)
-async def update_project(project_id: str, project_update: ProjectUpdate, current_user_id: str = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Check if user is owner or collaborator
-    if project['owner_id'] != current_user_id and current_user_id not in project.get('collaborators', []):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
+async def update_project(
+    project_id: str,
+    project_update: ProjectUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    access: ProjectAccess = Depends(project_editor)
+):
     update_data = {k: v for k, v in project_update.dict().items() if v is not None}
     update_data['updated_at'] = datetime.utcnow()
     
-    await db.projects.update_one({"id": project_id}, {"$set": update_data})
+    # Compare-and-set on the version the client last saw
+    query = {"id": project_id}
+    version = expected_version(if_match)
+    if version is not None:
+        query.update(version_filter(version))
+    updated_project = await db.projects.find_one_and_update(
+        query,
+        {"$set": update_data, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_project:
+        raise HTTPException(status_code=412, detail="Project has been modified")
     
-    updated_project = await db.projects.find_one({"id": project_id})
+    await ensure_project_layout(project_id, updated_project.get('layout'), updated_project)
+    await attach_tracks([updated_project])
+    response.headers["ETag"] = project_etag(updated_project['version'], updated_project.get('mixer_version'))
     return Project(**updated_project)
 
-@api_router.delete("/projects/{project_id}")
-async def delete_project(project_id: str, current_user_id: str = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+@api_router.patch("/projects/{project_id}")
+async def patch_project(
+    project_id: str,
+    operations: List[Dict[str, Any]],
+    if_match: Optional[str] = Header(None),
+    access: ProjectAccess = Depends(project_editor)
+):
+    """
+    Apply an RFC 6902 JSON Patch to the project as GET returns it (tracks and
+    clips addressed by index). Send the ETag of the copy the patch was made
+    against as If-Match: indexes are only meaningful for that version.
+    """
+    if expected_version(if_match) not in (None, access.version):
+        raise HTTPException(status_code=412, detail="Project has been modified")
+    await ensure_project_layout(project_id, access.layout)
+    # Fader and knob moves are acknowledged now and written behind, like mixer PUTs
+    if await buffer_mixer_patch(project_id, operations):
+        etag = project_etag(access.version, access.mixer_version, mixer_buffer.pending_tag(project_id))
+        return trusted_json({"version": access.version}, headers={"ETag": etag})
+    await mixer_buffer.flush_project(project_id)
+    
+    patch = ProjectPatch(project_id)
+    await patch.load()
+    for operation in operations:
+        await patch.apply(operation)
+    version = await patch.commit(if_match)
+    
+    return trusted_json({"version": version}, headers={"ETag": project_etag(version, patch.mixer_version)})
+
+@api_router.post("/projects/{project_id}/batch")
+async def batch_update_project(
+    project_id: str,
+    operations: List[BatchOperation],
+    if_match: Optional[str] = Header(None),
+    access: ProjectAccess = Depends(project_editor)
+):
+    """
+    Apply an ordered list of track, clip and effect operations. If any
+    operation is invalid nothing is written; a write that fails part-way is
+    rolled back, in a transaction where the database supports them and by
+    undoing it otherwise (not atomic: see ProjectPatch.commit). Returns one
+    result per operation (with the id of the track or clip it created or
+    changed).
+    """
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_OPERATIONS} operations per batch")
+    if expected_version(if_match) not in (None, access.version):
+        raise HTTPException(status_code=412, detail="Project has been modified")
+    await ensure_project_layout(project_id, access.layout)
+    await mixer_buffer.flush_project(project_id)
+    
+    patch = ProjectPatch(project_id)
+    await patch.load()
+    results = []
+    for index, operation in enumerate(operations):
+        try:
+            results.append(await apply_batch_operation(patch, operation))
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"Operation {index} ({operation.op}): {e.detail}")
+    version = await patch.commit(if_match)
     
-    # Only owner can delete
-    if project['owner_id'] != current_user_id:
-        raise HTTPException(status_code=403, detail="Only owner can delete project")
+    return trusted_json({"version": version, "results": results}, headers={"ETag": project_etag(version, patch.mixer_version)})
+
+@api_router.delete("/projects/{project_id}")
+async def delete_project(
+    project_id: str,
+    if_match: Optional[str] = Header(None),
+    access: ProjectAccess = Depends(require_project_role("owner", "Only owner can delete project"))
+):
+    query = {"id": project_id}
+    version = expected_version(if_match)
+    if version is not None:
+        query.update(version_filter(version))
+    result = await db.projects.delete_one(query)
+    if not result.deleted_count:
+        raise HTTPException(status_code=412, detail="Project has been modified")
+    mixer_buffer.discard_project(project_id)
     
-    await db.projects.delete_one({"id": project_id})
+    file_urls = await clip_file_urls({"project_id": project_id})
+    await asyncio.gather(
+        db.tracks.delete_many({"project_id": project_id}),
+        db.clips.delete_many({"project_id": project_id})
+    )
+    await update_file_references(file_urls)
     return {"message": "Project deleted successfully"}
 
 # Track Routes
 @api_router.post("/projects/{project_id}/tracks", response_model=Track)
-async def add_track_to_project(project_id: str, track_data: Dict[str, Any], current_user_id: str = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Check access
-    if project['owner_id'] != current_user_id and current_user_id not in project.get('collaborators', []):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
+async def add_track_to_project(project_id: str, track_data: Dict[str, Any], access: ProjectAccess = Depends(project_editor)):
+    await ensure_project_layout(project_id, access.layout)
     track = Track(**track_data)
     
-    # Add track to project
-    await db.projects.update_one(
+    # Reserve the next track position and add the track
+    counter = await db.projects.find_one_and_update(
         {"id": project_id},
-        {"$push": {"tracks": track.dict()}, "$set": {"updated_at": datetime.utcnow()}}
+        {"$inc": {"track_seq": 1, "version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"_id": 0, "track_seq": 1},
+        return_document=ReturnDocument.AFTER
     )
+    await insert_track(project_id, track.dict(), counter['track_seq'])
     
     return track
 
 @api_router.put("/projects/{project_id}/tracks/{track_id}", response_model=Track)
-async def update_track(project_id: str, track_id: str, track_data: Dict[str, Any], current_user_id: str = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+async def update_track(
+    project_id: str,
+    track_id: str,
+    track_data: Dict[str, Any],
+    if_match: Optional[str] = Header(None),
+    access: ProjectAccess = Depends(project_editor)
+):
+    await ensure_project_layout(project_id, access.layout)
     
-    # Check access
-    if project['owner_id'] != current_user_id and current_user_id not in project.get('collaborators', []):
-        raise HTTPException(status_code=403, detail="Access denied")
+    # Update only the fields that were sent; concurrent edits to other fields survive
+    fields = {k: v for k, v in track_data.items() if k not in ('id', 'clips', 'project_id', 'position')}
+    track_filter = {"project_id": project_id, "id": track_id}
     
-    # Update specific track
-    tracks = project.get('tracks', [])
-    for i, track in enumerate(tracks):
-        if track['id'] == track_id:
-            tracks[i].update(track_data)
-            break
-    else:
+    # Mixer moves (fader drags) are acknowledged now and written behind; the
+    # track is only read for the first move of a drag
+    if not if_match and 'clips' not in track_data and mixer_buffer.accepts(fields):
+        track = mixer_buffer.buffered_track(project_id, track_id) or await load_track(project_id, track_id)
+        if not track:
+            raise HTTPException(status_code=404, detail="Track not found")
+        stored = {k: v for k, v in track.items() if k != 'clips'}
+        validated = validate_document(Track, {**stored, **fields})
+        track.update({k: validated[k] for k in fields})
+        await mixer_buffer.put(project_id, track_id, {k: validated[k] for k in fields}, track)
+        return Track(**track)
+    
+    await mixer_buffer.flush_project(project_id)
+    # The version only moves once the track is known to exist: with If-Match it
+    # is compared-and-set before anything is written, otherwise bumped after
+    if (if_match or 'clips' in track_data) and not await db.tracks.count_documents(track_filter, limit=1):
         raise HTTPException(status_code=404, detail="Track not found")
+    if if_match:
+        await touch_project(project_id, if_match)
+    if 'clips' in track_data:
+        await replace_track_clips(project_id, track_id, track_data['clips'] or [])
     
-    await db.projects.update_one(
-        {"id": project_id},
-        {"$set": {"tracks": tracks, "updated_at": datetime.utcnow()}}
+    track, clips = await asyncio.gather(
+        db.tracks.find_one_and_update(
+            track_filter,
+            {"$set": fields},
+            projection=TRACK_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        ) if fields else db.tracks.find_one(track_filter, TRACK_PROJECTION),
+        db.clips.find({"project_id": project_id, "track_id": track_id}, CLIP_PROJECTION)
+            .sort("_id", ASCENDING).to_list(None)
     )
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
+    
+    if not if_match:
+        await touch_project(project_id)
     
-    updated_track = next(track for track in tracks if track['id'] == track_id)
-    return Track(**updated_track)
+    track['clips'] = clips
+    return Track(**track)
 
 @api_router.delete("/projects/{project_id}/tracks/{track_id}")
-async def delete_track(project_id: str, track_id: str, current_user_id: str = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Check access
-    if project['owner_id'] != current_user_id and current_user_id not in project.get('collaborators', []):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Remove track
-    tracks = [track for track in project.get('tracks', []) if track['id'] != track_id]
+async def delete_track(
+    project_id: str,
+    track_id: str,
+    if_match: Optional[str] = Header(None),
+    access: ProjectAccess = Depends(project_editor)
+):
+    await ensure_project_layout(project_id, access.layout)
+    await mixer_buffer.flush_project(project_id)
+    await touch_project(project_id, if_match)
     
-    await db.projects.update_one(
-        {"id": project_id},
-        {"$set": {"tracks": tracks, "updated_at": datetime.utcnow()}}
+    # Remove track and its clips
+    file_urls = await clip_file_urls({"project_id": project_id, "track_id": track_id})
+    await asyncio.gather(
+        db.tracks.delete_one({"project_id": project_id, "id": track_id}),
+        db.clips.delete_many({"project_id": project_id, "track_id": track_id})
     )
+    await update_file_references(file_urls)
     
     return {"message": "Track deleted successfully"}
 
@@ -625,31 +3503,19 @@ async def add_effect_to_track(
     project_id: str,
     track_id: str,
     effect_data: Dict[str, Any],
-    current_user_id: str = Depends(get_current_user)
+    access: ProjectAccess = Depends(project_editor)
 ):
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Check access
-    if project['owner_id'] != current_user_id and current_user_id not in project.get('collaborators', []):
-        raise HTTPException(status_code=403, detail="Access denied")
+    await ensure_project_layout(project_id, access.layout)
     
-    # Find and update track
-    tracks = project.get('tracks', [])
-    for track in tracks:
-        if track['id'] == track_id:
-            if 'effects' not in track:
-                track['effects'] = []
-            track['effects'].append(effect_data)
-            break
-    else:
+    # Append on the server so concurrent additions are never lost
+    result = await db.tracks.update_one(
+        {"project_id": project_id, "id": track_id},
+        {"$push": {"effects": effect_data}}
+    )
+    if not result.matched_count:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    await db.projects.update_one(
-        {"id": project_id},
-        {"$set": {"tracks": tracks, "updated_at": datetime.utcnow()}}
-    )
+    await touch_project(project_id)
     
     return {"message": "Effect added successfully"}
 
@@ -668,18 +3534,10 @@ async def get_sample_packs():
 async def add_comment(
     project_id: str,
     comment_data: Dict[str, Any],
-    current_user_id: str = Depends(get_current_user)
+    access: ProjectAccess = Depends(project_viewer)
 ):
-    # Check if project exists and is accessible
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    if not project.get('is_public', False) and project['owner_id'] != current_user_id and current_user_id not in project.get('collaborators', []):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
     comment = Comment(
-        user_id=current_user_id,
+        user_id=access.user_id,
         project_id=project_id,
         content=comment_data['content'],
         timestamp=comment_data.get('timestamp', 0.0)
@@ -689,31 +3547,34 @@ async def add_comment(
     return comment
 
 @api_router.get("/projects/{project_id}/comments", response_model=List[Comment])
-async def get_project_comments(project_id: str, current_user_id: str = Depends(get_current_user)):
-    # Check project access
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    if not project.get('is_public', False) and project['owner_id'] != current_user_id and current_user_id not in project.get('collaborators', []):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    comments = await db.comments.find({"project_id": project_id}).to_list(100)
-    return [Comment(**comment) for comment in comments]
+async def get_project_comments(
+    project_id: str,
+    limit: int = 100,
+    after: Optional[str] = None,
+    access: ProjectAccess = Depends(project_viewer)
+):
+    comments, next_cursor = await fetch_page(
+        db.comments, {"project_id": project_id}, "created_at", max(1, min(limit, 100)), after,
+        descending=False
+    )
+    result = trusted_json([trusted_dump(comment, Comment) for comment in comments])
+    set_next_cursor(result, next_cursor)
+    return result
 
 @api_router.post("/projects/{project_id}/like")
 async def like_project(project_id: str, current_user_id: str = Depends(get_current_user)):
-    # Check if already liked
-    existing_like = await db.likes.find_one({"user_id": current_user_id, "project_id": project_id})
-    if existing_like:
-        # Unlike
-        await db.likes.delete_one({"user_id": current_user_id, "project_id": project_id})
+    # Unlike if already liked
+    result = await db.likes.delete_one({"user_id": current_user_id, "project_id": project_id})
+    if result.deleted_count:
         return {"message": "Project unliked"}
-    else:
-        # Like
-        like = Like(user_id=current_user_id, project_id=project_id)
+    
+    # Like; the unique (user_id, project_id) index absorbs double clicks
+    like = Like(user_id=current_user_id, project_id=project_id)
+    try:
         await db.likes.insert_one(like.dict())
-        return {"message": "Project liked"}
+    except DuplicateKeyError:
+        pass
+    return {"message": "Project liked"}
 
 @api_router.get("/projects/{project_id}/likes")
 async def get_project_likes(project_id: str):
@@ -725,27 +3586,19 @@ async def get_project_likes(project_id: str):
 async def add_collaborator(
     project_id: str,
     collaborator_data: Dict[str, str],
-    current_user_id: str = Depends(get_current_user)
+    access: ProjectAccess = Depends(require_project_role("owner", "Only owner can add collaborators"))
 ):
-    project = await db.projects.find_one({"id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Only owner can add collaborators
-    if project['owner_id'] != current_user_id:
-        raise HTTPException(status_code=403, detail="Only owner can add collaborators")
-    
     # Find user by username
     username = collaborator_data['username']
-    user = await db.users.find_one({"username": username})
+    user = await db.users.find_one({"username": username}, {"_id": 0, "id": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Add to collaborators
-    if user['id'] not in project.get('collaborators', []):
+    if user['id'] not in access.collaborators:
         await db.projects.update_one(
-            {"id": project_id},
-            {"$push": {"collaborators": user['id']}}
+            {"id": project_id, "collaborators": {"$ne": user['id']}},
+            {"$push": {"collaborators": user['id']}, "$inc": {"version": 1}}
         )
     
     return {"message": f"User {username} added as collaborator"}
@@ -753,133 +3606,449 @@ async def add_collaborator(
 # Audio Upload Routes
 @api_router.post("/audio/upload")
 async def upload_audio_file(
-    file: UploadFile = File(...),
-    project_id: str = Form(...),
-    track_id: str = Form(...),
+    request: Request,
     current_user_id: str = Depends(get_current_user)
 ):
     """
     Upload audio file and add it to a project track
+
+    Multipart form: `file` (audio/*, max 50MB), `project_id`, `track_id`.
+    The file is streamed to disk as it arrives rather than held in memory.
     """
+    with upload_admission.admit(current_user_id, declared_body_size(request, MAX_UPLOAD_BYTES + 64 * 1024)):
+        return await receive_audio_upload(request, current_user_id)
+
+async def receive_audio_upload(request: Request, current_user_id: str):
+    upload = StreamingUpload(request)
     try:
-        # Validate file type
-        if not file.content_type or not file.content_type.startswith('audio/'):
-            raise HTTPException(status_code=400, detail=f"Invalid file type: {file.content_type}")
+        await upload.parse()
+        file = upload.file('file')
+        project_id = upload.field('project_id')
+        track_id = upload.field('track_id')
         
-        # Check file size (50MB limit)
-        file_size = 0
-        file_content = io.BytesIO()
+        # Verify project exists and user is owner or collaborator
+        access = await authorize_project(request, project_id, current_user_id, "collaborator")
         
-        # Read file in chunks to handle large files
-        chunk_size = 1024 * 1024  # 1MB chunks
-        while True:
-            chunk = await file.read(chunk_size)
-            if not chunk:
-                break
-            file_size += len(chunk)
-            file_content.write(chunk)
-            
-            # Check size limit (50MB)
-            if file_size > 50 * 1024 * 1024:
-                raise HTTPException(status_code=413, detail="File too large (max 50MB)")
+        # Check if track exists in project
+        await ensure_project_layout(project_id, access.layout)
+        await require_track(project_id, track_id)
         
-        file_content.seek(0)
+        # Store the content once, however many clips use it
+        blob = await upload.store_blob(file)
+        file_size = file.size
         
-        # Verify project exists and user has access
-        project = await db.projects.find_one({"id": project_id})
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+        # Add clip to project track in database
+        try:
+            clip_data = await attach_uploaded_clip(
+                project_id, track_id, file.filename, blob['file_id'], file_size, blob.get('audio')
+            )
+        except Exception:
+            await change_blob_refcount(blob['file_id'], -1)
+            raise
         
-        # Check if user is owner or collaborator
-        if (project['owner_id'] != current_user_id and 
-            current_user_id not in project.get('collaborators', [])):
-            raise HTTPException(status_code=403, detail="Access denied")
+        # Probing and peaks run in the background; the clip is updated when they finish
+        queued = await enqueue_audio_processing(blob, current_user_id)
+        logger.info(f"Audio file uploaded: {file.filename} -> {blob['file_id']} (Size: {file_size} bytes)")
         
-        # Check if track exists in project
-        track_exists = any(track['id'] == track_id for track in project.get('tracks', []))
-        if not track_exists:
-            raise HTTPException(status_code=404, detail="Track not found in project")
+        return {
+            "message": "File uploaded successfully",
+            "clip": clip_data,
+            "file_id": blob['file_id'],
+            "jobs": queued
+        }
         
-        # Generate unique filename
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'mp3'
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = UPLOAD_DIR / unique_filename
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Audio upload error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        await upload.discard()
+
+@api_router.post("/audio/upload/stems")
+async def upload_stems(
+    request: Request,
+    current_user_id: str = Depends(get_current_user)
+):
+    """
+    Upload several audio files at once, each to its own track
+
+    Multipart form: `project_id`, `track_ids` (a JSON array with the target
+    track of each file, in the order of the files) and up to MAX_STEM_FILES
+    `files`. All clips are added in one write and the project version moves
+    once; nothing is added if any file or track is rejected. Returns a
+    manifest with the clip, file_id and queued jobs of each file, in order.
+    """
+    limit = MAX_STEM_FILES * MAX_UPLOAD_BYTES + 64 * 1024
+    with upload_admission.admit(current_user_id, declared_body_size(request, limit)):
+        return await receive_stems(request, current_user_id)
+
+async def receive_stems(request: Request, current_user_id: str):
+    upload = StreamingUpload(request, max_files=MAX_STEM_FILES)
+    blobs: List[Dict[str, Any]] = []
+    try:
+        await upload.parse()
+        project_id = upload.field('project_id')
+        try:
+            track_ids = json.loads(upload.field('track_ids'))
+        except ValueError:
+            raise HTTPException(status_code=422, detail="track_ids must be a JSON array")
+        if not upload.files:
+            raise HTTPException(status_code=422, detail="Missing file: files")
+        if not isinstance(track_ids, list) or len(track_ids) != len(upload.files) or \
+                not all(isinstance(track_id, str) for track_id in track_ids):
+            raise HTTPException(status_code=422, detail="track_ids must name one track per file")
         
-        # Save file to disk
-        with open(file_path, 'wb') as f:
-            f.write(file_content.getvalue())
+        access = await authorize_project(request, project_id, current_user_id, "collaborator")
+        await ensure_project_layout(project_id, access.layout)
+        targets = set(track_ids)
+        if await db.tracks.count_documents({"project_id": project_id, "id": {"$in": list(targets)}}) != len(targets):
+            raise HTTPException(status_code=404, detail="Track not found in project")
         
-        # Create audio clip data
-        clip_data = {
-            "id": str(uuid.uuid4()),
-            "name": file.filename,
-            "file_path": str(file_path),
-            "file_size": file_size,
-            "duration": 0.0,  # Will be calculated on frontend
-            "start_time": 0.0,  # Will be set on frontend
-            "track_id": track_id,
-            "type": "uploaded",  # Mark as uploaded clip
-            "created_at": datetime.utcnow().isoformat(),
-            "file_url": f"/api/audio/file/{unique_filename}"
-        }
+        # Files are hashed as they stream in; moving them into the blob store runs concurrently
+        stored = await asyncio.gather(*(upload.store_blob(file) for file in upload.files), return_exceptions=True)
+        blobs = [blob for blob in stored if not isinstance(blob, BaseException)]
+        failure = next((blob for blob in stored if isinstance(blob, BaseException)), None)
+        if failure is not None:
+            raise failure
         
-        # Add clip to project track in database
-        await db.projects.update_one(
-            {"id": project_id, "tracks.id": track_id},
-            {"$push": {"tracks.$.clips": clip_data}}
-        )
+        clips = [
+            uploaded_clip(track_id, file.filename, blob['file_id'], file.size, blob.get('audio'))
+            for file, track_id, blob in zip(upload.files, track_ids, blobs)
+        ]
+        await db.clips.insert_many([{**clip, "project_id": project_id} for clip in clips])
+        await touch_project(project_id)
+        attached, blobs = blobs, []
         
-        logger.info(f"Audio file uploaded: {file.filename} -> {unique_filename} (Size: {file_size} bytes)")
+        queued: Dict[str, List[Dict[str, Any]]] = {}
+        for blob in attached:
+            if blob['file_id'] not in queued:  # the same content twice in one request is processed once
+                queued[blob['file_id']] = await enqueue_audio_processing(blob, current_user_id)
+        logger.info(f"Stems uploaded to project {project_id}: {len(clips)} files, {sum(f.size for f in upload.files)} bytes")
         
         return {
-            "message": "File uploaded successfully",
-            "clip": clip_data,
-            "file_id": unique_filename
+            "message": f"{len(clips)} files uploaded successfully",
+            "files": [
+                {"filename": file.filename, "track_id": clip['track_id'], "file_id": blob['file_id'], "clip": clip, "jobs": queued[blob['file_id']]}
+                for file, clip, blob in zip(upload.files, clips, attached)
+            ]
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Audio upload error: {str(e)}")
+        logger.error(f"Stem upload error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        for blob in blobs:  # stored but never attached
+            await change_blob_refcount(blob['file_id'], -1)
+        await upload.discard()
+
+@api_router.post("/audio/uploads")
+async def create_upload_session(
+    request: Request,
+    session_data: UploadSessionCreate,
+    current_user_id: str = Depends(get_current_user)
+):
+    """
+    Start a resumable upload. Send the file in chunks with
+    PUT /audio/uploads/{id}?offset=N (in any order, also in parallel), check
+    progress with GET /audio/uploads/{id}, then POST /audio/uploads/{id}/complete.
+    """
+    if not is_audio_content_type(session_data.content_type):
+        raise HTTPException(status_code=400, detail=f"Invalid file type: {session_data.content_type}")
+    if not 0 < session_data.size <= MAX_UPLOAD_SESSION_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large (max {MAX_UPLOAD_SESSION_BYTES // (1024 * 1024)}MB)")
+    
+    access = await authorize_project(request, session_data.project_id, current_user_id, "collaborator")
+    await ensure_project_layout(session_data.project_id, access.layout)
+    await require_track(session_data.project_id, session_data.track_id)
+    
+    session = {
+        **session_data.dict(),
+        "id": str(uuid.uuid4()),
+        "user_id": current_user_id,
+        "status": "open",
+        "received": [],
+        "created_at": datetime.utcnow(),
+        "expires_at": datetime.utcnow() + timedelta(seconds=UPLOAD_SESSION_TTL)
+    }
+    
+    def reserve(path: Path, size: int):
+        with open(path, 'wb') as f:
+            f.truncate(size)
+    
+    await asyncio.to_thread(reserve, upload_session_path(session['id']), session['size'])
+    await db.upload_sessions.insert_one(session)
+    return upload_session_status(session)
+
+@api_router.get("/audio/uploads/{session_id}")
+async def get_upload_session(session_id: str, current_user_id: str = Depends(get_current_user)):
+    return upload_session_status(await load_upload_session(session_id, current_user_id))
+
+@api_router.put("/audio/uploads/{session_id}")
+async def upload_session_chunk(
+    session_id: str,
+    offset: int,
+    request: Request,
+    current_user_id: str = Depends(get_current_user)
+):
+    """Write the raw request body at `offset`"""
+    session = await load_upload_session(session_id, current_user_id)
+    if session['status'] != 'open':
+        raise HTTPException(status_code=409, detail="Upload session is no longer open")
+    if not 0 <= offset < session['size']:
+        raise HTTPException(status_code=400, detail="Offset outside the declared upload size")
+    
+    with upload_admission.admit(current_user_id, declared_body_size(request, session['size'] - offset)):
+        written, disconnected = await write_upload_chunk(request, upload_session_path(session_id), offset, session['size'] - offset)
+    update: Dict[str, Any] = {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=UPLOAD_SESSION_TTL)}}
+    if written:
+        update["$push"] = {"received": [offset, offset + written]}
+    session = await db.upload_sessions.find_one_and_update(
+        {"id": session_id, "status": "open"}, update,
+        projection={"_id": 0}, return_document=ReturnDocument.AFTER
+    )
+    if disconnected:
+        return Response(status_code=400)
+    if not session:
+        raise HTTPException(status_code=409, detail="Upload session is no longer open")
+    return upload_session_status(session)
+
+@api_router.post("/audio/uploads/{session_id}/complete")
+async def complete_upload_session(session_id: str, request: Request, current_user_id: str = Depends(get_current_user)):
+    """Turn a fully received upload into a clip; safe to retry"""
+    session = await load_upload_session(session_id, current_user_id)
+    if session['status'] == 'complete':
+        return upload_session_status(session)
+    status = upload_session_status(session)
+    if status['missing']:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete, missing byte ranges: {status['missing']}")
+    
+    # Claim the session so concurrent completions cannot create two clips. The
+    # claim is a lease: a completion whose worker died can be retried once it lapses
+    now = datetime.utcnow()
+    claimed = await db.upload_sessions.find_one_and_update(
+        {"id": session_id, "$or": [{"status": "open"}, {"status": "finalizing", "finalize_expires_at": {"$lt": now}}]},
+        {"$set": {"status": "finalizing", "finalize_expires_at": now + timedelta(seconds=UPLOAD_FINALIZE_LEASE_SECONDS)}}
+    )
+    if not claimed:
+        raise HTTPException(status_code=409, detail="Upload session is already being completed")
+    path = upload_session_path(session_id)
+    if claimed['status'] == 'finalizing' and not await asyncio.to_thread(path.exists):
+        # The lapsed completion had already handed the data to the blob store
+        await db.upload_sessions.delete_one({"id": session_id})
+        raise HTTPException(status_code=410, detail="Upload data is no longer available, start a new upload")
+    
+    blob = None
+    try:
+        access = await authorize_project(request, session['project_id'], current_user_id, "collaborator")
+        await ensure_project_layout(session['project_id'], access.layout)
+        await require_track(session['project_id'], session['track_id'])
+        
+        extension = session['filename'].split('.')[-1] if '.' in session['filename'] else 'mp3'
+        digest = await asyncio.to_thread(file_sha256, path)
+        blob = await store_blob(path, digest, session['size'], extension)
+        clip_data = await attach_uploaded_clip(
+            session['project_id'], session['track_id'], session['filename'], blob['file_id'], session['size'],
+            blob.get('audio')
+        )
+    except Exception:
+        if blob is None:
+            await db.upload_sessions.update_one({"id": session_id}, {"$set": {"status": "open"}})
+        else:
+            # The data has moved into the blob store; the client has to upload again
+            await change_blob_refcount(blob['file_id'], -1)
+            await db.upload_sessions.delete_one({"id": session_id})
+        raise
+    
+    queued = await enqueue_audio_processing(blob, current_user_id)
+    session = await db.upload_sessions.find_one_and_update(
+        {"id": session_id},
+        {"$set": {
+            "status": "complete", "clip": clip_data, "file_id": blob['file_id'], "jobs": queued,
+            "expires_at": datetime.utcnow() + timedelta(seconds=UPLOAD_SESSION_TTL)
+        }},
+        projection={"_id": 0}, return_document=ReturnDocument.AFTER
+    )
+    logger.info(f"Resumable upload completed: {session['filename']} -> {blob['file_id']} (Size: {session['size']} bytes)")
+    return upload_session_status(session)
+
+@api_router.delete("/audio/uploads/{session_id}")
+async def abort_upload_session(session_id: str, current_user_id: str = Depends(get_current_user)):
+    session = await load_upload_session(session_id, current_user_id)
+    if session['status'] == 'finalizing' and session.get('finalize_expires_at', datetime.min) >= datetime.utcnow():
+        raise HTTPException(status_code=409, detail="Upload session is being completed")
+    await db.upload_sessions.delete_one({"id": session_id})
+    if session['status'] != 'complete':
+        await asyncio.to_thread(upload_session_path(session_id).unlink, True)
+    return {"message": "Upload session aborted"}
 
-@api_router.get("/audio/file/{file_id}")
-async def get_audio_file(file_id: str):
+@api_router.api_route("/audio/file/{file_id}", methods=["GET", "HEAD"])
+async def get_audio_file(request: Request, file_id: str, rendition: str = "original"):
     """
     Serve uploaded audio files
+
+    With local storage: supports Range (including several ranges and
+    If-Range), and conditional requests against the file's strong ETag;
+    files are immutable and cached as such, and hot ones are served from
+    memory. With object storage: a redirect to a presigned URL, where the
+    store handles ranges itself.
+
+    `rendition=preview` serves a small, low sample rate WAV for scrubbing and
+    browsing instead of the upload. Until it has been rendered, and for
+    compressed formats (which get no preview), the original is served, marked
+    for revalidation so the preview replaces it once it exists; the
+    X-Audio-Rendition header says which one a response is.
     """
-    from fastapi.responses import FileResponse
+    import mimetypes
     
-    file_path = UPLOAD_DIR / file_id
-    if not file_path.exists():
+    if rendition not in ("original", "preview"):
+        raise HTTPException(status_code=400, detail="rendition must be original or preview")
+    if file_id.startswith('.'):
         raise HTTPException(status_code=404, detail="File not found")
+    if not isinstance(audio_storage, LocalStorage):
+        return await redirect_to_stored_file(file_id, rendition)
+    
+    if rendition == "preview":
+        path = audio_storage.path(preview_key(file_id))
+        try:
+            preview = await audio_cache.get(path)
+        except FileNotFoundError:
+            pass
+        else:
+            return serve_audio_file(
+                request, path, preview, "audio/wav", f'"{file_id}-preview-{preview.stat.st_mtime_ns:x}"',
+                headers={"X-Audio-Rendition": "preview"}
+            )
+    
+    file_path = audio_storage.path(file_id)
+    try:
+        cached = await audio_cache.get(file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    cache_control = IMMUTABLE_CACHE_CONTROL
+    if rendition == "preview":
+        cache_control = "no-cache"
+        if file_path.suffix.lower() in PCM_SUFFIXES:
+            start_preview_build(file_id)  # uploaded before previews existed, or its job has not run yet
     
-    import mimetypes
     media_type, _ = mimetypes.guess_type(str(file_path))
-    media_type = media_type or "application/octet-stream"
+    return serve_audio_file(
+        request, file_path, cached, media_type or "application/octet-stream", f'"{file_id}"',
+        cache_control, headers={"X-Audio-Rendition": "original"}
+    )
+
+async def redirect_to_stored_file(file_id: str, rendition: str) -> Response:
+    """Send the client to the object store for a file, instead of proxying its bytes"""
+    from fastapi.responses import RedirectResponse
     
-    return FileResponse(
-        path=str(file_path),
-        media_type=media_type
+    if rendition == "preview" and await audio_storage.exists(preview_key(file_id)):
+        key, served, cache_control = preview_key(file_id), "preview", f"private, max-age={S3_PRESIGN_TTL // 2}"
+    elif await audio_storage.exists(file_id):
+        key, served, cache_control = file_id, "original", f"private, max-age={S3_PRESIGN_TTL // 2}"
+        if rendition == "preview":
+            cache_control = "no-cache"
+            if Path(file_id).suffix.lower() in PCM_SUFFIXES:
+                start_preview_build(file_id)
+    else:
+        raise HTTPException(status_code=404, detail="File not found")
+    return RedirectResponse(
+        audio_storage.download_url(key), status_code=307,
+        headers={"Cache-Control": cache_control, "X-Audio-Rendition": served}
     )
 
+@api_router.get("/audio/peaks/{file_id}")
+async def get_audio_peaks(file_id: str, level: Optional[int] = None, if_none_match: Optional[str] = Header(None)):
+    """
+    Waveform peaks of an uploaded file
+
+    Without `level`: the zoom levels available, as JSON (sample_rate, bits and
+    per level its samples_per_peak and length). With `level`: that level as an
+    audiowaveform v2 .dat document (24-byte header, then int8 or int16 min/max
+    pairs). Level 0 is the most detailed; each level halves the one before.
+    Only uncompressed WAV and AIFF files have server-side peaks (415 otherwise).
+    """
+    if file_id.startswith('.') or not await audio_storage.exists(file_id):
+        raise HTTPException(status_code=404, detail="File not found")
+    if not await ensure_peaks(file_id):
+        raise HTTPException(status_code=415, detail="Waveform peaks are only computed for uncompressed WAV and AIFF audio")
+    
+    peaks = await read_stored(peaks_key(file_id))
+    index = peak_index(peaks)
+    if level is not None and not 0 <= level < len(index['levels']):
+        raise HTTPException(status_code=404, detail=f"No such level (0-{len(index['levels']) - 1})")
+    etag = f'"{file_id}-peaks-{index["bits"]}-{"index" if level is None else level}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    if level is None:
+        return trusted_json({
+            "sample_rate": index['sample_rate'],
+            "bits": index['bits'],
+            "levels": [
+                {"level": entry['level'], "samples_per_peak": entry['samples_per_peak'], "length": entry['length']}
+                for entry in index['levels']
+            ]
+        }, headers=headers)
+    document = peak_level(peaks, level)
+    return Response(content=document, media_type="application/octet-stream", headers=headers)
+
 @api_router.delete("/audio/file/{file_id}")
 async def delete_audio_file(file_id: str, current_user_id: str = Depends(get_current_user)):
     """
     Delete uploaded audio file
+
+    Removes the clips using the file from the projects the caller can edit
+    (403 if only projects the caller cannot edit use it). Identical uploads
+    share one stored file, so the file itself is deleted only once no clip
+    refers to it any more.
     """
-    file_path = UPLOAD_DIR / file_id
-    if file_path.exists():
-        file_path.unlink()
+    file_url = f"{AUDIO_FILE_URL_PREFIX}{file_id}"
+    editable = {"$or": [{"owner_id": current_user_id}, {"collaborators": current_user_id}]}
+    affected = await db.clips.distinct("project_id", {"file_url": file_url})
+    if affected:
+        projects = await db.projects.find({"id": {"$in": affected}, **editable}, {"_id": 0, "id": 1}).to_list(None)
+        affected = [project['id'] for project in projects]
+    legacy = {"layout": {"$ne": PROJECT_LAYOUT}, "tracks.clips.file_url": file_url, **editable}
+    if not affected and not await db.projects.count_documents(legacy, limit=1):
+        # Nothing the caller can edit uses the file: only a file no project uses at all may go
+        if await db.blobs.count_documents({"file_id": file_id}, limit=1) or await file_referenced(file_url):
+            raise HTTPException(status_code=403, detail="File is used by projects you cannot edit")
+        if not await audio_storage.exists(file_id):
+            raise HTTPException(status_code=404, detail="File not found")
     
-    # Also remove from any projects (this is a simplified version)
+    removed = 0
+    if affected:
+        removed = (await db.clips.delete_many({"project_id": {"$in": affected}, "file_url": file_url})).deleted_count
+        await db.projects.update_many({"id": {"$in": affected}}, {"$inc": {"version": 1}})
     await db.projects.update_many(
-        {},
-        {"$pull": {"tracks.$[].clips": {"file_url": f"/api/audio/file/{file_id}"}}}
+        legacy, {"$pull": {"tracks.$[].clips": {"file_url": file_url}}, "$inc": {"version": 1}}
     )
     
+    if await change_blob_refcount(file_id, -removed) is None and not await file_referenced(file_url):
+        # Stored before the blob store: delete the file once nothing uses it
+        await remove_audio_file(file_id)
+    
     return {"message": "File deleted successfully"}
 
+# Job Routes
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user_id: str = Depends(get_current_user)):
+    """Status of a background job started by one of the caller's requests"""
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job or job.get('user_id') != current_user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return trusted_json(job_status(job))
+
+# Metrics Routes
+@api_router.get("/metrics", response_model=Dict[str, Any])
+async def get_metrics(current_user_id: str = Depends(get_current_user)):
+    """Counters of the process's pools, caches and queues (no host or infrastructure identifiers)"""
+    return {name: source() for name, source in METRICS_SOURCES.items()}
+
 # Legacy Routes (for backwards compatibility)
 @api_router.get("/")
 async def root():
@@ -893,9 +4062,13 @@ async def create_status_check(input: StatusCheckCreate):
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(limit: int = 1000, after: Optional[str] = None):
+    status_checks, next_cursor = await fetch_page(
+        db.status_checks, {}, "timestamp", max(1, min(limit, 1000)), after, descending=False
+    )
+    result = trusted_json([trusted_dump(status_check, StatusCheck) for status_check in status_checks])
+    set_next_cursor(result, next_cursor)
+    return result
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -906,6 +4079,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Content-Range", "Accept-Ranges", "X-Audio-Rendition"],
 )
 
 # Configure logging
@@ -915,6 +4089,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    await bootstrap_indexes()
+
+@app.on_event("startup")
+async def start_upload_session_sweeper():
+    app.state.upload_session_sweeper = asyncio.create_task(run_upload_session_sweeper())
+
+@app.on_event("startup")
+async def start_job_workers():
+    if JOB_WORKERS_ENABLED:
+        jobs.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await jobs.stop()
+
+@app.on_event("shutdown")
+async def stop_upload_session_sweeper():
+    app.state.upload_session_sweeper.cancel()
+
+@app.on_event("shutdown")
+async def flush_mixer_buffer():
+    await mixer_buffer.flush_all()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+
+@app.on_event("shutdown")
+async def shutdown_password_pool():
+    password_pool.shutdown()
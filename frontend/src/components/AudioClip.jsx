@@ -1,6 +1,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { Button } from './ui/button';
 import { Trash2, Volume2, MoreHorizontal } from 'lucide-react';
+import { fetchWaveform } from '../lib/peaks';
 
 const AudioClip = ({ 
   clip, 
@@ -24,15 +25,25 @@ const AudioClip = ({
 
   // Generate waveform data
   useEffect(() => {
+    // Generate fake waveform for demo
+    const fakeWaveform = () => Array.from({ length: 50 }, () => Math.random() * 0.8 + 0.1);
+
     if (generateWaveform && clip.audio_data) {
       const waveform = generateWaveform(clip.audio_data);
       setWaveformData(waveform);
+    } else if (clip.file_url && clip.duration) {
+      // Uploaded audio: draw from the peaks computed by the server, without downloading the file
+      let cancelled = false;
+      const bars = Math.max(1, Math.floor(clipWidth / 4));
+      fetchWaveform(process.env.REACT_APP_BACKEND_URL, clip.file_url, bars, clip.duration / bars)
+        .then(waveform => {
+          if (!cancelled) setWaveformData(waveform || fakeWaveform());
+        });
+      return () => { cancelled = true; };
     } else {
-      // Generate fake waveform for demo
-      const fakeWaveform = Array.from({ length: 50 }, () => Math.random() * 0.8 + 0.1);
-      setWaveformData(fakeWaveform);
+      setWaveformData(fakeWaveform());
     }
-  }, [clip, generateWaveform]);
+  }, [clip, generateWaveform, clipWidth]);
 
   const handleMouseDown = (e) => {
     if (isMobile) return; // Use touch events on mobile
@@ -1,6 +1,8 @@
 import { useState, useCallback } from 'react';
 import { useToast } from './use-toast';
 
+const MAX_BUSY_RETRIES = 3;
+
 export const useAudioUpload = () => {
   const [isUploading, setIsUploading] = useState(false);
   const [uploadProgress, setUploadProgress] = useState(0);
@@ -23,13 +25,20 @@ export const useAudioUpload = () => {
     formData.append('project_id', projectId);
     formData.append('track_id', trackId);
 
-    const response = await fetch(`${backendUrl}/api/audio/upload`, {
-      method: 'POST',
-      headers: {
-        'Authorization': `Bearer ${token}`
-      },
-      body: formData
-    });
+    // The server turns uploads away with 503 + Retry-After while it is at capacity
+    let response;
+    for (let attempt = 0; ; attempt++) {
+      response = await fetch(`${backendUrl}/api/audio/upload`, {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${token}`
+        },
+        body: formData
+      });
+      if (response.status !== 503 || attempt >= MAX_BUSY_RETRIES) break;
+      const retryAfter = Number(response.headers.get('Retry-After')) || 1;
+      await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    }
 
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
@@ -79,8 +88,8 @@ export const useAudioUpload = () => {
           // Upload file
           const uploadResult = await uploadAudioFile(file, projectId, trackId);
           
-          // Get audio duration
-          const duration = await getAudioDuration(file);
+          // The server fills in the duration once its probe job has run; measure it here until then
+          const duration = uploadResult.clip.duration || await getAudioDuration(file);
           
           // Create clip data with proper structure
           const clipData = {
@@ -90,6 +99,9 @@ export const useAudioUpload = () => {
             duration: duration,
             track_id: trackId,
             file_url: uploadResult.clip.file_url,
+            sample_rate: uploadResult.clip.sample_rate,
+            channels: uploadResult.clip.channels,
+            bit_depth: uploadResult.clip.bit_depth,
             type: 'uploaded'
           };
 
@@ -1,7 +1,9 @@
-import { useState, useCallback } from 'react';
+import { useState, useCallback, useRef } from 'react';
 import axios from 'axios';
 import { useAuth } from './useAuth';
 
+const MAX_PATCH_RETRIES = 3;
+
 export const useProjects = () => {
   const { isAuthenticated } = useAuth();
   const [projects, setProjects] = useState([]);
@@ -9,8 +11,18 @@ export const useProjects = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
+  // The last copy of each project the server confirmed, with its ETag: patches
+  // are built against it (tracks and clips are addressed by index) and sent
+  // one at a time with its ETag as If-Match
+  const savedRef = useRef({});
+  const patchQueueRef = useRef(Promise.resolve());
+
   const baseURL = process.env.REACT_APP_BACKEND_URL;
 
+  const rememberSaved = (project, etag) => {
+    if (project?.id && etag) savedRef.current[project.id] = { project, etag };
+  };
+
   // Create new project
   const createProject = useCallback(async (projectData) => {
     if (!isAuthenticated) return { success: false, error: 'Not authenticated' };
@@ -21,6 +33,7 @@ export const useProjects = () => {
       
       const response = await axios.post(`${baseURL}/api/projects`, projectData);
       const newProject = response.data;
+      rememberSaved(newProject, response.headers.etag);
       
       setProjects(prev => [newProject, ...prev]);
       setCurrentProject(newProject);
@@ -87,6 +100,7 @@ export const useProjects = () => {
       
       const response = await axios.get(`${baseURL}/api/projects/${projectId}`);
       const project = response.data;
+      rememberSaved(project, response.headers.etag);
       
       setCurrentProject(project);
       return project;
@@ -110,6 +124,7 @@ export const useProjects = () => {
       
       const response = await axios.put(`${baseURL}/api/projects/${projectId}`, updateData);
       const updatedProject = response.data;
+      rememberSaved(updatedProject, response.headers.etag);
       
       // Update in projects list
       setProjects(prev => prev.map(p => 
@@ -131,6 +146,46 @@ export const useProjects = () => {
     }
   }, [isAuthenticated, baseURL, currentProject]);
 
+  // Patch project (auto-save of small edits). `buildOperations(project)` returns
+  // the JSON Patch operations for the edit against a saved copy of the project,
+  // `applyEdit(project)` that project with the edit made. The edit shows at
+  // once; if someone else saved in the meantime (412) the project is fetched
+  // again and the operations rebuilt against it.
+  const patchProject = useCallback((projectId, buildOperations, applyEdit = project => project) => {
+    if (!isAuthenticated) return Promise.resolve({ success: false, error: 'Not authenticated' });
+    setCurrentProject(prev => (prev?.id === projectId ? applyEdit(prev) : prev));
+
+    const send = async () => {
+      for (let attempt = 0; ; attempt++) {
+        try {
+          let saved = savedRef.current[projectId];
+          if (!saved) {
+            const response = await axios.get(`${baseURL}/api/projects/${projectId}`);
+            saved = { project: response.data, etag: response.headers.etag };
+          }
+          const operations = buildOperations(saved.project);
+          if (!operations.length) return { success: true, etag: saved.etag };
+
+          const response = await axios.patch(`${baseURL}/api/projects/${projectId}`, operations, {
+            headers: { 'Content-Type': 'application/json-patch+json', 'If-Match': saved.etag }
+          });
+          savedRef.current[projectId] = { project: applyEdit(saved.project), etag: response.headers.etag };
+          return { success: true, version: response.data.version, etag: response.headers.etag };
+        } catch (err) {
+          const conflict = err.response?.status === 412;
+          delete savedRef.current[projectId];
+          if (conflict && attempt < MAX_PATCH_RETRIES) continue;
+          const message = err.response?.data?.detail || 'Failed to patch project';
+          return { success: false, conflict, error: message };
+        }
+      }
+    };
+
+    const result = patchQueueRef.current.then(send);
+    patchQueueRef.current = result;
+    return result;
+  }, [isAuthenticated, baseURL]);
+
   // Delete project
   const deleteProject = useCallback(async (projectId) => {
     if (!isAuthenticated) return { success: false, error: 'Not authenticated' };
@@ -169,6 +224,7 @@ export const useProjects = () => {
       
       const response = await axios.post(`${baseURL}/api/projects/${projectId}/tracks`, trackData);
       const newTrack = response.data;
+      delete savedRef.current[projectId];
       
       // Update current project
       if (currentProject?.id === projectId) {
@@ -198,6 +254,7 @@ export const useProjects = () => {
       
       const response = await axios.put(`${baseURL}/api/projects/${projectId}/tracks/${trackId}`, trackData);
       const updatedTrack = response.data;
+      delete savedRef.current[projectId];
       
       // Update current project
       if (currentProject?.id === projectId) {
@@ -228,6 +285,7 @@ export const useProjects = () => {
       setError(null);
       
       await axios.delete(`${baseURL}/api/projects/${projectId}/tracks/${trackId}`);
+      delete savedRef.current[projectId];
       
       // Update current project
       if (currentProject?.id === projectId) {
@@ -449,6 +507,7 @@ export const useProjects = () => {
     loadPublicProjects,
     loadProject,
     updateProject,
+    patchProject,
     deleteProject,
     
     // Track actions
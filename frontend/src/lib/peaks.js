@@ -0,0 +1,67 @@
+// Waveform peaks computed by the backend (GET /api/audio/peaks/{file_id}).
+// Responses are immutable, so each index and level is fetched once per page.
+const indexRequests = new Map();
+const levelRequests = new Map();
+
+const peaksUrl = (baseURL, fileUrl) => `${baseURL}${fileUrl.replace('/api/audio/file/', '/api/audio/peaks/')}`;
+
+const loadIndex = (baseURL, fileUrl) => {
+  const url = peaksUrl(baseURL, fileUrl);
+  if (!indexRequests.has(url)) {
+    indexRequests.set(url, fetch(url)
+      .then(response => (response.ok ? response.json() : null))
+      .catch(() => null));
+  }
+  return indexRequests.get(url);
+};
+
+// audiowaveform v2 .dat: 24-byte header, then interleaved min/max pairs
+const parseDat = (buffer) => {
+  const header = new DataView(buffer, 0, 24);
+  const eightBit = header.getUint32(4, true) & 1;
+  return {
+    samplesPerPeak: header.getInt32(12, true),
+    length: header.getUint32(16, true),
+    data: eightBit ? new Int8Array(buffer, 24) : new Int16Array(buffer, 24),
+    fullScale: eightBit ? 128 : 32768
+  };
+};
+
+const loadLevel = (baseURL, fileUrl, level) => {
+  const url = `${peaksUrl(baseURL, fileUrl)}?level=${level}`;
+  if (!levelRequests.has(url)) {
+    levelRequests.set(url, fetch(url)
+      .then(response => (response.ok ? response.arrayBuffer() : null))
+      .then(buffer => (buffer ? parseDat(buffer) : null))
+      .catch(() => null));
+  }
+  return levelRequests.get(url);
+};
+
+// Amplitudes (0..1) for `bars` bars of `secondsPerBar` each, or null when the
+// server has no peaks for the file (compressed formats are not analysed there)
+export const fetchWaveform = async (baseURL, fileUrl, bars, secondsPerBar) => {
+  const index = await loadIndex(baseURL, fileUrl);
+  if (!index || !index.levels.length) return null;
+
+  // The coarsest level that still has at least one peak per bar
+  const samplesPerBar = secondsPerBar * index.sample_rate;
+  const level = index.levels.reduce(
+    (best, candidate) => (candidate.samples_per_peak <= samplesPerBar ? candidate.level : best), 0
+  );
+  const peaks = await loadLevel(baseURL, fileUrl, level);
+  if (!peaks) return null;
+
+  const peaksPerBar = samplesPerBar / peaks.samplesPerPeak;
+  const waveform = [];
+  for (let bar = 0; bar < bars; bar++) {
+    const start = Math.floor(bar * peaksPerBar);
+    const end = Math.min(peaks.length, Math.max(start + 1, Math.floor((bar + 1) * peaksPerBar)));
+    let amplitude = 0;
+    for (let i = start; i < end; i++) {
+      amplitude = Math.max(amplitude, Math.abs(peaks.data[2 * i]), Math.abs(peaks.data[2 * i + 1]));
+    }
+    waveform.push(amplitude / peaks.fullScale);
+  }
+  return waveform;
+};
@@ -34,6 +34,32 @@ import {
   Menu, X, ChevronLeft, ChevronRight, ChevronUp, ChevronDown, ToggleLeft, ToggleRight
 } from 'lucide-react';
 
+// Fader and knob moves are saved once they have settled for this long
+const MIXER_SAVE_DELAY_MS = 300;
+
+// Project edits for patchProject: JSON Patch operations against a copy of the
+// project (tracks and clips addressed by index), and the same edit made locally
+const trackIndex = (project, trackId) => (project.tracks || []).findIndex(t => t.id === trackId);
+
+const clipPointer = (project, clipId) => {
+  const tracks = project.tracks || [];
+  for (let i = 0; i < tracks.length; i++) {
+    const j = (tracks[i].clips || []).findIndex(c => c.id === clipId);
+    if (j >= 0) return `/tracks/${i}/clips/${j}`;
+  }
+  return null;
+};
+
+const editTrack = (project, trackId, edit) => ({
+  ...project,
+  tracks: (project.tracks || []).map(t => (t.id === trackId ? edit(t) : t))
+});
+
+const editClip = (project, clipId, edit) => ({
+  ...project,
+  tracks: (project.tracks || []).map(t => ({ ...t, clips: (t.clips || []).map(c => (c.id === clipId ? edit(c) : c)) }))
+});
+
 const Studio = () => {
   const { toast } = useToast();
   const { user, isAuthenticated, loading: authLoading } = useAuth();
@@ -114,6 +140,8 @@ const Studio = () => {
     updateProject,
     addTrack: projectAddTrack,
     updateTrack: projectUpdateTrack,
+    patchProject,
+    setCurrentProject,
     deleteTrack: projectDeleteTrack,
     loading: projectsLoading,
     error: projectsError
@@ -337,12 +365,42 @@ const Studio = () => {
     }
   };
 
+  // Auto-save: edits are sent as JSON Patches of just the fields that changed
+  const saveEdit = async (buildOperations, applyEdit) => {
+    if (!currentProject) return;
+    const result = await patchProject(currentProject.id, buildOperations, applyEdit);
+    if (!result.success) toast({ title: 'Falha ao Salvar', description: result.error, variant: 'destructive' });
+  };
+
+  const patchTrack = (trackId, changes) => saveEdit(
+    project => {
+      const index = trackIndex(project, trackId);
+      if (index < 0) return [];
+      return Object.entries(changes).map(([field, value]) => ({ op: 'replace', path: `/tracks/${index}/${field}`, value }));
+    },
+    project => editTrack(project, trackId, track => ({ ...track, ...changes }))
+  );
+
+  // Fader and knob moves show at once and are saved, merged, once they settle
+  const pendingMixerEdits = React.useRef({});
+  const patchTrackSoon = (trackId, changes) => {
+    setCurrentProject(prev => (prev ? editTrack(prev, trackId, track => ({ ...track, ...changes })) : prev));
+    const pending = pendingMixerEdits.current[trackId] || { changes: {} };
+    clearTimeout(pending.timer);
+    pending.changes = { ...pending.changes, ...changes };
+    pending.timer = setTimeout(() => {
+      delete pendingMixerEdits.current[trackId];
+      patchTrack(trackId, pending.changes);
+    }, MIXER_SAVE_DELAY_MS);
+    pendingMixerEdits.current[trackId] = pending;
+  };
+
   // Track Controls
   const toggleTrackMute = (trackId) => {
     const track = (currentProject?.tracks || []).find(t => t.id === trackId);
     if (track && currentProject) {
       pushHistory(snapshotProject());
-      projectUpdateTrack(currentProject.id, trackId, { muted: !track.muted });
+      patchTrack(trackId, { muted: !track.muted });
       toast({ title: track.muted ? 'Track Unmuted' : 'Track Muted', description: track.name });
     }
   };
@@ -351,12 +409,12 @@ const Studio = () => {
     const track = (currentProject?.tracks || []).find(t => t.id === trackId);
     if (track && currentProject) {
       pushHistory(snapshotProject());
-      projectUpdateTrack(currentProject.id, trackId, { solo: !track.solo });
+      patchTrack(trackId, { solo: !track.solo });
     }
   };
 
-  const updateTrackVolume = (trackId, volume) => { if (currentProject) projectUpdateTrack(currentProject.id, trackId, { volume: (Array.isArray(volume) ? volume[0] : volume) }); };
-  const updateTrackPan = (trackId, panVal) => { if (currentProject) projectUpdateTrack(currentProject.id, trackId, { pan: (Array.isArray(panVal) ? panVal[0] : panVal) }); };
+  const updateTrackVolume = (trackId, volume) => { if (currentProject) patchTrackSoon(trackId, { volume: (Array.isArray(volume) ? volume[0] : volume) }); };
+  const updateTrackPan = (trackId, panVal) => { if (currentProject) patchTrackSoon(trackId, { pan: (Array.isArray(panVal) ? panVal[0] : panVal) }); };
 
 
   const addNewTrack = async () => {
@@ -420,18 +478,32 @@ const Studio = () => {
   const handleClipDelete = async (clipId) => {
     pushHistory(snapshotProject());
     deleteClip(clipId);
-    if (currentProject) {
-      const track = (currentProject.tracks || []).find(t => t.id === selectedTrack);
-      if (track) {
-        const updatedClips = (track.clips || []).filter(c => c.id !== clipId);
-        await projectUpdateTrack(currentProject.id, selectedTrack, { clips: updatedClips });
-      }
-    }
+    await saveEdit(
+      project => {
+        const pointer = clipPointer(project, clipId);
+        return pointer ? [{ op: 'remove', path: pointer }] : [];
+      },
+      project => ({ ...project, tracks: (project.tracks || []).map(t => ({ ...t, clips: (t.clips || []).filter(c => c.id !== clipId) })) })
+    );
     toast({ title: 'Clip Deleted', description: 'Audio clip removed from timeline' });
   };
 
-  const handleClipMove = (clipId, newStartTime) => { moveClip(clipId, newStartTime); };
-  const handleClipMoveEnd = () => { pushHistory(snapshotProject()); };
+  // A drag moves the clip in the engine as it goes; where it ends up is saved once it is dropped
+  const lastClipMove = React.useRef(null);
+  const handleClipMove = (clipId, newStartTime) => { moveClip(clipId, newStartTime); lastClipMove.current = { clipId, startTime: newStartTime }; };
+  const handleClipMoveEnd = () => {
+    pushHistory(snapshotProject());
+    const move = lastClipMove.current;
+    lastClipMove.current = null;
+    if (!move) return;
+    saveEdit(
+      project => {
+        const pointer = clipPointer(project, move.clipId);
+        return pointer ? [{ op: 'replace', path: `${pointer}/start_time`, value: move.startTime }] : [];
+      },
+      project => editClip(project, move.clipId, clip => ({ ...clip, start_time: move.startTime }))
+    );
+  };
 
   const handleImportFiles = () => {
     if (!isAuthenticated) { setShowAuthModal(true); return; }
@@ -449,11 +521,27 @@ const Studio = () => {
         currentTime,
         async (clipData) => {
           addUploadedClip(clipData);
-          if (currentProject) {
-            const track = (currentProject.tracks || []).find(t => t.id === selectedTrack);
-            const updatedClips = [...(track?.clips || []), clipData];
-            await projectUpdateTrack(currentProject.id, selectedTrack, { clips: updatedClips });
-          }
+          // The upload already added the clip; save where it was placed and its measured duration
+          await saveEdit(
+            project => {
+              const pointer = clipPointer(project, clipData.id);
+              if (pointer) {
+                return [
+                  { op: 'replace', path: `${pointer}/start_time`, value: clipData.start_time },
+                  { op: 'replace', path: `${pointer}/duration`, value: clipData.duration }
+                ];
+              }
+              const index = trackIndex(project, selectedTrack);
+              return index < 0 ? [] : [{ op: 'add', path: `/tracks/${index}/clips/-`, value: clipData }];
+            },
+            project => {
+              const track = (project.tracks || []).find(t => t.id === selectedTrack);
+              if ((track?.clips || []).some(c => c.id === clipData.id)) {
+                return editClip(project, clipData.id, clip => ({ ...clip, ...clipData }));
+              }
+              return editTrack(project, selectedTrack, t => ({ ...t, clips: [...(t.clips || []), clipData] }));
+            }
+          );
         }
       );
       setShowImportModal(false);
@@ -734,23 +822,32 @@ const Studio = () => {
                 selectedTrack={selectedTrack}
                 tracks={currentProject?.tracks || []}
                 onEffectAdd={(effectData) => {
-                  if (!currentProject) return;
-                  const track = (currentProject.tracks || []).find(t => t.id === selectedTrack);
-                  const effects = [...(track?.effects || []), effectData];
-                  projectUpdateTrack(currentProject.id, selectedTrack, { effects });
+                  const trackId = selectedTrack;
+                  saveEdit(
+                    project => {
+                      const i = trackIndex(project, trackId);
+                      return i < 0 ? [] : [{ op: 'add', path: `/tracks/${i}/effects/-`, value: effectData }];
+                    },
+                    project => editTrack(project, trackId, t => ({ ...t, effects: [...(t.effects || []), effectData] }))
+                  );
                 }}
                 onEffectUpdate={(index, paramName, value) => {
-                  if (!currentProject) return;
-                  const track = (currentProject.tracks || []).find(t => t.id === selectedTrack);
-                  const effects = [...(track?.effects || [])];
-                  const effect = effects[index];
-                  if (!effect) return;
-                  if (paramName === 'enabled') {
-                    effect.parameters = effect.parameters.map(p => p.name === 'enabled' ? { ...p, value } : p);
-                  } else {
-                    effect.parameters = effect.parameters.map(p => p.name === paramName ? { ...p, value } : p);
-                  }
-                  projectUpdateTrack(currentProject.id, selectedTrack, { effects });
+                  const trackId = selectedTrack;
+                  saveEdit(
+                    project => {
+                      const i = trackIndex(project, trackId);
+                      const parameters = (i < 0 ? null : project.tracks[i].effects?.[index]?.parameters) || [];
+                      const p = parameters.findIndex(param => param.name === paramName);
+                      return p < 0 ? [] : [{ op: 'replace', path: `/tracks/${i}/effects/${index}/parameters/${p}/value`, value }];
+                    },
+                    project => editTrack(project, trackId, t => ({
+                      ...t,
+                      effects: (t.effects || []).map((effect, k) => (k !== index ? effect : {
+                        ...effect,
+                        parameters: (effect.parameters || []).map(param => (param.name === paramName ? { ...param, value } : param))
+                      }))
+                    }))
+                  );
                 }}
               />
             )}
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+BandLab DAW Login Throughput Benchmark
+Measures p99 latency of a cheap authenticated route while a login storm runs,
+to verify that bcrypt work no longer blocks the event loop.
+"""
+
+import requests
+import time
+import threading
+import statistics
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('/app/frontend/.env')
+
+# Get backend URL from environment
+BACKEND_URL = os.getenv('REACT_APP_BACKEND_URL', 'http://localhost:8001')
+API_BASE = f"{BACKEND_URL}/api"
+
+PROBE_SAMPLES = int(os.getenv('BENCH_PROBE_SAMPLES', '200'))
+PROBE_INTERVAL = float(os.getenv('BENCH_PROBE_INTERVAL', '0.02'))
+STORM_CLIENTS = int(os.getenv('BENCH_STORM_CLIENTS', '32'))
+# p99 under load may grow by at most this factor (or 50ms, whichever is larger)
+MAX_P99_GROWTH = float(os.getenv('BENCH_MAX_P99_GROWTH', '3.0'))
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+    return ordered[index]
+
+def register_user(session):
+    timestamp = str(int(datetime.now().timestamp() * 1000))
+    user = {
+        "username": f"benchuser_{timestamp}",
+        "email": f"benchuser_{timestamp}@bandlab.com",
+        "password": "BenchPassword123!",
+        "display_name": f"Bench User {timestamp}"
+    }
+    response = session.post(f"{API_BASE}/auth/register", json=user)
+    response.raise_for_status()
+    return user, response.json()['token']
+
+def probe_latencies(token, samples):
+    """Time GET /api/auth/me at a fixed rate and return latencies in ms"""
+    session = requests.Session()
+    session.headers.update({'Authorization': f'Bearer {token}'})
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        response = session.get(f"{API_BASE}/auth/me")
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            print(f"⚠️  Probe got HTTP {response.status_code}")
+        time.sleep(PROBE_INTERVAL)
+    return latencies
+
+def login_storm(user, stop_event, results):
+    session = requests.Session()
+    credentials = {"username": user['username'], "password": user['password']}
+    while not stop_event.is_set():
+        response = session.post(f"{API_BASE}/auth/login", json=credentials)
+        results.append(response.status_code)
+
+def summarize(name, latencies):
+    p50 = percentile(latencies, 0.50)
+    p99 = percentile(latencies, 0.99)
+    print(f"   {name}: p50={p50:.1f}ms p99={p99:.1f}ms mean={statistics.mean(latencies):.1f}ms")
+    return p99
+
+def main():
+    print("🚀 Login throughput benchmark")
+    print(f"Backend URL: {API_BASE}")
+    print("=" * 60)
+
+    session = requests.Session()
+    user, token = register_user(session)
+    print(f"✅ Registered benchmark user: {user['username']}")
+
+    # Warm up connections and the hashing pool
+    probe_latencies(token, 10)
+
+    print("\n📊 Baseline (no login traffic)")
+    baseline_p99 = summarize("GET /api/auth/me", probe_latencies(token, PROBE_SAMPLES))
+
+    print(f"\n📊 Under login storm ({STORM_CLIENTS} concurrent clients)")
+    stop_event = threading.Event()
+    login_results = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=STORM_CLIENTS) as executor:
+        for _ in range(STORM_CLIENTS):
+            executor.submit(login_storm, user, stop_event, login_results)
+        storm_p99 = summarize("GET /api/auth/me", probe_latencies(token, PROBE_SAMPLES))
+        stop_event.set()
+    elapsed = time.perf_counter() - started
+
+    accepted = sum(1 for status in login_results if status == 200)
+    rejected = sum(1 for status in login_results if status == 503)
+    print(f"   Logins: {accepted} ok, {rejected} rejected with 503, "
+          f"{len(login_results) - accepted - rejected} other ({accepted / elapsed:.1f} logins/s)")
+
+    metrics = session.get(f"{API_BASE}/metrics", headers={'Authorization': f'Bearer {token}'}).json().get('password_hashing', {})
+    print(f"   Hash pool: {metrics}")
+
+    print("\n" + "=" * 60)
+    allowed_p99 = max(baseline_p99 * MAX_P99_GROWTH, baseline_p99 + 50)
+    if storm_p99 <= allowed_p99:
+        print(f"✅ p99 stayed flat under login storm ({storm_p99:.1f}ms <= {allowed_p99:.1f}ms)")
+        return True
+    print(f"❌ p99 degraded under login storm ({storm_p99:.1f}ms > {allowed_p99:.1f}ms)")
+    return False
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+BandLab DAW Project Listing Benchmark
+Compares payload size and latency of the full project listing (GET /api/projects)
+against the summary listing (GET /api/projects/summary) for a user with
+hundreds of projects.
+"""
+
+import requests
+import time
+import statistics
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('/app/frontend/.env')
+
+# Get backend URL from environment
+BACKEND_URL = os.getenv('REACT_APP_BACKEND_URL', 'http://localhost:8001')
+API_BASE = f"{BACKEND_URL}/api"
+
+PROJECT_COUNT = int(os.getenv('BENCH_PROJECTS', '300'))
+TRACKS_PER_PROJECT = int(os.getenv('BENCH_TRACKS', '4'))
+CLIPS_PER_TRACK = int(os.getenv('BENCH_CLIPS', '4'))
+WAVEFORM_POINTS = int(os.getenv('BENCH_WAVEFORM_POINTS', '500'))
+RUNS = int(os.getenv('BENCH_RUNS', '10'))
+
+def create_session():
+    session = requests.Session()
+    timestamp = str(int(datetime.now().timestamp() * 1000))
+    response = session.post(f"{API_BASE}/auth/register", json={
+        "username": f"listing_{timestamp}",
+        "email": f"listing_{timestamp}@bandlab.com",
+        "password": "ListingBench123!",
+        "display_name": f"Listing Bench {timestamp}"
+    })
+    response.raise_for_status()
+    session.headers.update({'Authorization': f"Bearer {response.json()['token']}"})
+    return session
+
+def seed_project(session, index):
+    project = session.post(f"{API_BASE}/projects", json={"name": f"Bench Project {index}"}).json()
+    waveform = [((i * 37) % 200 - 100) / 100.0 for i in range(WAVEFORM_POINTS)]
+    for t in range(TRACKS_PER_PROJECT):
+        session.post(f"{API_BASE}/projects/{project['id']}/tracks", json={
+            "name": f"Track {t}",
+            "instrument": "Audio",
+            "clips": [
+                {"name": f"Clip {c}", "start_time": c * 4.0, "duration": 4.0, "waveform_data": waveform}
+                for c in range(CLIPS_PER_TRACK)
+            ]
+        })
+    return project['id']
+
+def time_full_listing(session):
+    started = time.perf_counter()
+    response = session.get(f"{API_BASE}/projects")
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return elapsed, len(response.content), len(response.json())
+
+def time_summary_listing_first_page(session):
+    started = time.perf_counter()
+    response = session.get(f"{API_BASE}/projects/summary", params={"limit": 20})
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return elapsed, len(response.content), len(response.json()['items'])
+
+def time_summary_listing(session, page_size):
+    """Page through every summary; returns (total seconds, total bytes, items)"""
+    total_time = total_bytes = items = 0
+    cursor = None
+    while True:
+        params = {"limit": page_size}
+        if cursor:
+            params["after"] = cursor
+        started = time.perf_counter()
+        response = session.get(f"{API_BASE}/projects/summary", params=params)
+        total_time += time.perf_counter() - started
+        response.raise_for_status()
+        total_bytes += len(response.content)
+        page = response.json()
+        items += len(page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            return total_time, total_bytes, items
+
+def report(name, samples, sizes, items):
+    print(f"   {name}: median {statistics.median(samples) * 1000:.1f}ms, "
+          f"{statistics.median(sizes) / 1024:.1f} KiB, {items} projects")
+
+def main():
+    print("🚀 Project listing benchmark")
+    print(f"Backend URL: {API_BASE}")
+    print("=" * 60)
+
+    session = create_session()
+    print(f"Seeding {PROJECT_COUNT} projects ({TRACKS_PER_PROJECT} tracks x {CLIPS_PER_TRACK} clips each)...")
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        project_ids = list(executor.map(lambda i: seed_project(session, i), range(PROJECT_COUNT)))
+
+    full = [time_full_listing(session) for _ in range(RUNS)]
+    first_page = [time_summary_listing_first_page(session) for _ in range(RUNS)]
+    all_pages = [time_summary_listing(session, 100) for _ in range(RUNS)]
+
+    print("\n📊 Results")
+    report("GET /api/projects (first 100, full documents)", [r[0] for r in full], [r[1] for r in full], full[0][2])
+    report("GET /api/projects/summary (first page of 20)", [r[0] for r in first_page], [r[1] for r in first_page], first_page[0][2])
+    report("GET /api/projects/summary (all pages of 100)", [r[0] for r in all_pages], [r[1] for r in all_pages], all_pages[0][2])
+
+    full_bytes_per_project = statistics.median(r[1] for r in full) / max(1, full[0][2])
+    summary_bytes_per_project = statistics.median(r[1] for r in all_pages) / max(1, all_pages[0][2])
+    print(f"\n   Bytes per project: {full_bytes_per_project:.0f} (full) vs {summary_bytes_per_project:.0f} (summary), "
+          f"{full_bytes_per_project / max(1, summary_bytes_per_project):.0f}x smaller")
+
+    print("\nCleaning up...")
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda pid: session.delete(f"{API_BASE}/projects/{pid}"), project_ids))
+
+    return all_pages[0][2] == PROJECT_COUNT
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+BandLab DAW Serialization Benchmark
+Measures requests/sec per core for read routes served through the trusted
+orjson path versus the Pydantic revalidation path (Model(**doc) followed by
+FastAPI's response_model validation), for a 100-track x 100-clip project,
+a 100-project listing and a 100-comment page.
+
+Runs in-process against the ASGI apps, so it needs no database or server.
+"""
+
+import sys
+import time
+import json
+import uuid
+import asyncio
+from datetime import datetime
+from pathlib import Path
+import os
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+from fastapi import FastAPI
+from typing import List
+from server import (
+    Project, Comment, trusted_json, trusted_project, trusted_dump
+)
+
+ITERATIONS = int(os.getenv('BENCH_ITERATIONS', '20'))
+
+def make_project(tracks, clips_per_track, waveform_points=64):
+    waveform = [((i * 37) % 200 - 100) / 100.0 for i in range(waveform_points)]
+    return {
+        "id": str(uuid.uuid4()),
+        "name": "Benchmark Session",
+        "description": "Serialization benchmark",
+        "owner_id": str(uuid.uuid4()),
+        "collaborators": [str(uuid.uuid4())],
+        "bpm": 120,
+        "time_signature": "4/4",
+        "key": "C Major",
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+        "is_public": False,
+        "tags": ["bench"],
+        "genre": "Electronic",
+        "version": 42,
+        "tracks": [
+            {
+                "id": str(uuid.uuid4()),
+                "name": f"Track {t}",
+                "instrument": "Audio",
+                "volume": 75.0,
+                "pan": 0.0,
+                "muted": False,
+                "solo": False,
+                "effects": [{"type": "reverb", "name": "Reverb", "parameters": [{"name": "wet_dry", "value": 30.0}]}],
+                "color": "#ef4444",
+                "is_recording": False,
+                "clips": [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "name": f"Clip {c}",
+                        "start_time": c * 2.0,
+                        "duration": 2.0,
+                        "file_url": f"/api/audio/file/{uuid.uuid4()}.wav",
+                        "track_id": None,
+                        "type": "uploaded",
+                        "waveform_data": waveform,
+                        "effects": []
+                    }
+                    for c in range(clips_per_track)
+                ]
+            }
+            for t in range(tracks)
+        ]
+    }
+
+def make_comments(count):
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": str(uuid.uuid4()),
+            "project_id": "bench",
+            "content": f"Comment {i}",
+            "timestamp": float(i),
+            "created_at": datetime.utcnow(),
+            "likes": i
+        }
+        for i in range(count)
+    ]
+
+def build_apps(project, projects, comments):
+    legacy = FastAPI()
+    fast = FastAPI()
+
+    @legacy.get("/project", response_model=Project)
+    async def legacy_project():
+        return Project(**project)
+
+    @legacy.get("/projects", response_model=List[Project])
+    async def legacy_projects():
+        return [Project(**p) for p in projects]
+
+    @legacy.get("/comments", response_model=List[Comment])
+    async def legacy_comments():
+        return [Comment(**c) for c in comments]
+
+    @fast.get("/project", response_model=Project)
+    async def fast_project():
+        return trusted_json(trusted_project(project))
+
+    @fast.get("/projects", response_model=List[Project])
+    async def fast_projects():
+        return trusted_json([trusted_project(p) for p in projects])
+
+    @fast.get("/comments", response_model=List[Comment])
+    async def fast_comments():
+        return trusted_json([trusted_dump(c, Comment) for c in comments])
+
+    return legacy, fast
+
+async def request(app, path):
+    """Drive one GET through the ASGI app and return the response body"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "headers": [],
+        "client": ("bench", 0), "server": ("bench", 80)
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+async def measure(app, path, iterations):
+    await request(app, path)  # warm up
+    started = time.process_time()
+    for _ in range(iterations):
+        body = await request(app, path)
+    cpu_seconds = time.process_time() - started
+    return iterations / cpu_seconds, len(body)
+
+async def main():
+    print("🚀 Serialization benchmark (requests/sec per core)")
+    print("=" * 60)
+
+    project = make_project(100, 100)
+    projects = [make_project(4, 4) for _ in range(100)]
+    comments = make_comments(100)
+    legacy, fast = build_apps(project, projects, comments)
+
+    cases = [
+        ("GET /projects/{id} (100 tracks x 100 clips)", "/project", ITERATIONS),
+        ("GET /projects (100 projects)", "/projects", ITERATIONS * 5),
+        ("GET /projects/{id}/comments (100 comments)", "/comments", ITERATIONS * 50),
+    ]
+
+    success = True
+    for name, path, iterations in cases:
+        legacy_body, fast_body = await request(legacy, path), await request(fast, path)
+        if json.loads(legacy_body) != json.loads(fast_body):
+            print(f"❌ {name}: trusted path output differs from the documented schema")
+            success = False
+            continue
+
+        legacy_rps, size = await measure(legacy, path, iterations)
+        fast_rps, _ = await measure(fast, path, iterations)
+        print(f"{name}  [{size / 1024:.0f} KiB]")
+        print(f"   before: {legacy_rps:8.1f} req/s   after: {fast_rps:8.1f} req/s   ({fast_rps / legacy_rps:.1f}x)")
+
+    print("=" * 60)
+    print("✅ Identical payloads" if success else "❌ Payload mismatch")
+    return success
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    exit(0 if success else 1)
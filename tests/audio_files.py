@@ -0,0 +1,32 @@
+"""Synthetic audio for the tests"""
+
+import wave
+from pathlib import Path
+
+import numpy as np
+
+def sine(seconds: float, sample_rate: int, channels: int = 1, frequency: float = 440.0, amplitude: float = 0.5) -> np.ndarray:
+    """A tone as float samples in -1..1, shaped (frames, channels)"""
+    t = np.arange(int(round(seconds * sample_rate))) / sample_rate
+    return np.repeat((amplitude * np.sin(2 * np.pi * frequency * t))[:, None], channels, axis=1)
+
+def write_wav(path: Path, samples: np.ndarray, sample_rate: int, sample_width: int = 2) -> Path:
+    """Write float samples shaped (frames, channels) as an integer PCM WAV file"""
+    if sample_width == 1:
+        data = np.clip(np.round(samples * 127) + 128, 0, 255).astype('u1')
+    else:
+        full_scale = float(1 << (8 * sample_width - 1)) - 1
+        data = np.clip(np.round(samples * full_scale), -full_scale - 1, full_scale).astype(f'<i{sample_width}')
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(samples.shape[1])
+        w.setsampwidth(sample_width)
+        w.setframerate(sample_rate)
+        w.writeframes(data.tobytes())
+    return path
+
+def read_wav(path: Path):
+    """(samples as integers shaped (frames, channels), sample rate, sample width in bytes) of a PCM WAV file"""
+    with wave.open(str(path), 'rb') as w:
+        width, channels, rate = w.getsampwidth(), w.getnchannels(), w.getframerate()
+        data = np.frombuffer(w.readframes(w.getnframes()), dtype='u1' if width == 1 else f'<i{width}')
+    return data.reshape(-1, channels), rate, width
@@ -0,0 +1,65 @@
+"""
+Shared fixtures for the backend tests.
+
+The backend modules are imported from backend/ the way server.py imports its
+siblings. Tests that need the database run the app against an in-memory
+mongomock-motor client (see requirements.txt); background job
+workers are not started, so tests drive the queue themselves.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "2")
+os.environ["JOB_WORKERS_ENABLED"] = "false"
+
+@pytest.fixture(scope="session")
+def server():
+    import server as server_module
+    return server_module
+
+@pytest.fixture
+def db(server, tmp_path, monkeypatch):
+    """A fresh in-memory database, with uploads stored under tmp_path"""
+    from mongomock_motor import AsyncMongoMockClient
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(server, "client", client)
+    monkeypatch.setattr(server, "db", client["test_database"])
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(server, "audio_storage", server.LocalStorage(tmp_path))
+    return server.db
+
+@pytest.fixture
+def api(server, db):
+    from fastapi.testclient import TestClient
+    with TestClient(server.app) as client:
+        yield client
+
+@pytest.fixture
+def register(api):
+    """Create a user; returns the Authorization headers to act as them"""
+    def register_user(username: str = "alice"):
+        response = api.post("/api/auth/register", json={
+            "username": username, "email": f"{username}@example.com", "password": "secret", "display_name": username
+        })
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+    return register_user
+
+@pytest.fixture
+def project(api, register):
+    """A project with two tracks, owned by the user whose headers come with it"""
+    headers = register("owner")
+    created = api.post("/api/projects", json={"name": "Demo"}, headers=headers).json()
+    for name in ("Vocals", "Drums"):
+        response = api.post(f"/api/projects/{created['id']}/tracks", json={"name": name, "instrument": name.lower()}, headers=headers)
+        assert response.status_code == 200, response.text
+    return created['id'], headers
@@ -0,0 +1,171 @@
+import asyncio
+import mmap
+import os
+
+import pytest
+
+from audio_cache import FrequencySketch, HotFileCache, LFUPolicy, LRUPolicy, TinyLFUPolicy, make_policy
+
+def test_lru_evicts_the_least_recently_used():
+    policy = LRUPolicy(100)
+    assert policy.admit("a", 40) == [] and policy.admit("b", 40) == []
+    policy.access("a")
+    assert policy.admit("c", 40) == ["b"]
+    assert policy.admit("d", 90) == ["a", "c"]
+    assert policy.size == 90
+    assert policy.admit("huge", 101) == ["huge"]
+    policy.remove("d")
+    assert policy.size == 0
+
+def test_lfu_evicts_the_least_frequently_used():
+    policy = LFUPolicy(100)
+    for key in "abc":
+        policy.admit(key, 30)
+    policy.access("a")
+    policy.access("a")
+    policy.access("c")
+    assert policy.admit("d", 30) == ["b"]
+    assert policy.admit("e", 30) == ["d"]  # a new entry starts at one use
+    policy.access("e")
+    # Ties go to the least recently used: c and e have two uses, c's is older
+    assert policy.admit("f", 60) == ["c", "e"]
+    assert policy.admit("huge", 101) == ["huge"]
+    assert policy.size == 90
+
+def test_sketch_rows_are_independent():
+    sketch = FrequencySketch(1024)
+    keys = [f"/uploads/{n}.wav" for n in range(500)]
+    for key in keys:
+        sketch.increment(key)
+    # An estimate is only inflated when a key shares its slot with another in every row
+    assert sum(sketch.estimate(key) > 1 for key in keys) < 25
+    slots = [[slot for _, slot in sketch._slots(key)] for key in ("hot0", "hot1")]
+    assert len({b - a for a, b in zip(*slots)}) > 1  # not one index shifted by a constant per row
+
+def tiny_lfu():
+    # Wide sketch, so estimates for the few keys used are exact (the hashing is deterministic)
+    policy = TinyLFUPolicy(1000, expected_entries=4096)
+    assert (policy.window_capacity, policy.main_capacity, policy.protected_capacity) == (10, 990, 792)
+    return policy
+
+def test_tinylfu_rejects_a_newcomer_used_less_than_its_victim():
+    policy = tiny_lfu()
+    for n in range(9):
+        assert policy.admit(f"hot{n}", 100) == []  # larger than the window: straight into the main area
+        policy.access(f"hot{n}")
+    assert policy.admit("once", 100) == ["once"]
+    assert policy.rejections == 1
+    assert policy.size == 900
+
+def test_tinylfu_admits_a_newcomer_used_more_than_its_victim():
+    policy = tiny_lfu()
+    for n in range(9):
+        policy.admit(f"cold{n}", 100)
+    for _ in range(3):
+        policy.sketch.increment("popular")
+    assert policy.admit("popular", 100) == ["cold0"]
+    assert policy.size == 900
+
+def test_tinylfu_resists_scans():
+    policy = tiny_lfu()
+    for n in range(9):
+        policy.admit(f"hot{n}", 100)
+        for _ in range(3):
+            policy.access(f"hot{n}")
+    evicted = []
+    for n in range(200):
+        evicted += policy.admit(f"scan{n}", 100)
+    assert not any(key.startswith("hot") for key in evicted)
+    assert policy.rejections == 200
+
+def test_tinylfu_promotes_and_demotes_between_segments():
+    policy = tiny_lfu()
+    for n in range(9):
+        policy.admit(f"k{n}", 100)
+    assert policy.probation_size == 900
+    for n in range(8):
+        policy.access(f"k{n}")  # promoted; the protected segment holds at most 792 bytes
+    assert (policy.protected_size, policy.probation_size) == (700, 200)
+    assert list(policy._probation) == ["k8", "k0"]  # promoting k7 demoted the oldest protected entry
+    policy.remove("k8")
+    assert policy.size == 800
+
+def test_tinylfu_window_holds_small_files():
+    policy = tiny_lfu()
+    assert policy.admit("s1", 6) == [] and policy.window_size == 6
+    assert policy.admit("s2", 6) == []  # s1 leaves the window for the (empty) main area
+    assert (policy.window_size, policy.probation_size) == (6, 6)
+    assert policy.admit("huge", 991) == ["huge"]
+
+def test_unknown_policy():
+    assert isinstance(make_policy("lfu", 10, 1), LFUPolicy)
+    with pytest.raises(ValueError):
+        make_policy("fifo", 10, 1)
+    with pytest.raises(ValueError):
+        HotFileCache(10, 10, storage="disk")
+
+def write(path, size):
+    path.write_bytes(os.urandom(size))
+    return path
+
+def test_hits_misses_and_negative_entries(tmp_path):
+    cache = HotFileCache(10000, 5000, policy='lru')
+    path = write(tmp_path / "a.wav", 1000)
+    async def scenario():
+        first = await cache.get(path)
+        second = await cache.get(path)
+        assert first is second and first.data == path.read_bytes()
+        for _ in range(2):
+            with pytest.raises(FileNotFoundError):
+                await cache.get(tmp_path / "missing.wav")
+        write(tmp_path / "missing.wav", 10)
+        with pytest.raises(FileNotFoundError):
+            await cache.get(tmp_path / "missing.wav")  # still remembered as missing
+        cache.invalidate(tmp_path / "missing.wav")
+        return await cache.get(tmp_path / "missing.wav")
+    assert asyncio.run(scenario()).stat.st_size == 10
+    metrics = cache.metrics()
+    assert (metrics['hits'], metrics['misses'], metrics['negative_hits'], metrics['entries']) == (1, 3, 2, 2)
+
+def test_stale_entries_are_revalidated(tmp_path):
+    cache = HotFileCache(10000, 5000, policy='lru', ttl=0)
+    path = write(tmp_path / "a.wav", 1000)
+    async def scenario():
+        first = await cache.get(path)
+        assert await cache.get(path) is first  # re-stat'ed, unchanged: data kept
+        write(path, 2000)
+        return await cache.get(path)
+    assert len(asyncio.run(scenario()).data) == 2000
+    assert cache.revalidations == 1
+
+def test_large_and_empty_files_are_not_kept(tmp_path):
+    cache = HotFileCache(10000, 500, policy='tinylfu')
+    async def scenario():
+        return await cache.get(write(tmp_path / "big.wav", 600)), await cache.get(write(tmp_path / "empty.wav", 0))
+    big, empty = asyncio.run(scenario())
+    assert big.data is None and empty.data is None and big.stat.st_size == 600
+    assert (cache.uncacheable, cache.metrics()['entries']) == (2, 0)
+
+def test_eviction_drops_entries(tmp_path):
+    cache = HotFileCache(2500, 1000, policy='lru')
+    async def scenario():
+        for name in "abc":
+            await cache.get(write(tmp_path / f"{name}.wav", 1000))
+    asyncio.run(scenario())
+    metrics = cache.metrics()
+    assert (metrics['entries'], metrics['bytes'], metrics['evictions']) == (2, 2000, 1)
+
+def test_concurrent_misses_read_the_file_once(tmp_path):
+    cache = HotFileCache(10000, 5000, policy='lfu')
+    path = write(tmp_path / "a.wav", 1000)
+    async def scenario():
+        return await asyncio.gather(*(cache.get(path) for _ in range(5)))
+    entries = asyncio.run(scenario())
+    assert all(entry is entries[0] for entry in entries)
+    assert cache.misses == 1
+
+def test_mmap_storage(tmp_path):
+    cache = HotFileCache(10000, 5000, policy='lru', storage='mmap')
+    path = write(tmp_path / "a.wav", 1000)
+    entry = asyncio.run(cache.get(path))
+    assert isinstance(entry.data, mmap.mmap) and entry.data[:] == path.read_bytes()
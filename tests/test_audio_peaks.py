@@ -0,0 +1,110 @@
+import struct
+
+import numpy as np
+import pytest
+
+from audio_peaks import DAT_HEADER, build_peaks, halve, peak_index, peak_level
+from tests.audio_files import sine, write_wav
+
+def dat(document: bytes):
+    """(header fields, min/max pairs) of an audiowaveform v2 .dat document"""
+    version, flags, sample_rate, samples_per_peak, length, channels = DAT_HEADER.unpack_from(document)
+    dtype = '<i1' if flags & 1 else '<i2'
+    pairs = np.frombuffer(document, dtype=dtype, offset=DAT_HEADER.size).reshape(-1, 2)
+    return (version, flags, sample_rate, samples_per_peak, length, channels), pairs
+
+def ramp_wav(path, frames, sample_rate=8000):
+    """16-bit mono samples counting up from -frames/2, so every bin's min and max are known"""
+    samples = (np.arange(frames) - frames // 2).astype('<i2')
+    with open(path, 'wb') as f:
+        data = samples.tobytes()
+        f.write(b'RIFF' + struct.pack('<I', 36 + len(data)) + b'WAVEfmt ' + struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16))
+        f.write(b'data' + struct.pack('<I', len(data)) + data)
+    return samples
+
+def test_pyramid_layout(tmp_path):
+    ramp_wav(tmp_path / "a.wav", 1024)
+    assert build_peaks(tmp_path / "a.wav", tmp_path / "a.peaks", bits=16, base=4)
+    data = (tmp_path / "a.peaks").read_bytes()
+    index = peak_index(data)
+    assert (index['sample_rate'], index['bits']) == (8000, 16)
+    # Levels halve until one has fewer than 2 * MIN_PEAKS (64) peaks
+    assert [(e['samples_per_peak'], e['length']) for e in index['levels']] == [(4, 256), (8, 128), (16, 64)]
+    for entry in index['levels']:
+        document = peak_level(data, entry['level'])
+        assert len(document) == entry['size'] == DAT_HEADER.size + 4 * entry['length']
+        header, _ = dat(document)
+        assert header == (2, 0, 8000, entry['samples_per_peak'], entry['length'], 1)
+    assert index['levels'][-1]['offset'] + index['levels'][-1]['size'] == len(data)
+    with pytest.raises(IndexError):
+        peak_level(data, 3)
+
+def test_peak_values_and_halving(tmp_path):
+    samples = ramp_wav(tmp_path / "a.wav", 1024)
+    build_peaks(tmp_path / "a.wav", tmp_path / "a.peaks", bits=16, base=4)
+    data = (tmp_path / "a.peaks").read_bytes()
+    levels = [dat(peak_level(data, level))[1].astype(int) for level in range(3)]
+    bins = samples.reshape(-1, 4)
+    # Rounded outwards, by at most one step
+    assert (0 <= bins.min(axis=1) - levels[0][:, 0]).all() and (bins.min(axis=1) - levels[0][:, 0] <= 1).all()
+    assert (0 <= levels[0][:, 1] - bins.max(axis=1)).all() and (levels[0][:, 1] - bins.max(axis=1) <= 1).all()
+    # Each level merges pairs of peaks of the one before
+    for finer, coarser in zip(levels, levels[1:]):
+        assert np.array_equal(coarser[:, 0], finer[:, 0].reshape(-1, 2).min(axis=1))
+        assert np.array_equal(coarser[:, 1], finer[:, 1].reshape(-1, 2).max(axis=1))
+
+def test_eight_bit_peaks_round_outwards(tmp_path):
+    quiet = np.full((2048, 1), 0.001)
+    quiet[1::2] = -0.001
+    write_wav(tmp_path / "a.wav", quiet, 8000)
+    build_peaks(tmp_path / "a.wav", tmp_path / "a.peaks", bits=8, base=16)
+    data = (tmp_path / "a.peaks").read_bytes()
+    header, pairs = dat(peak_level(data, 0))
+    assert header[1] == 1  # 8-bit flag
+    assert len(peak_level(data, 0)) == DAT_HEADER.size + 2 * header[4]
+    assert (pairs[:, 0] == -1).all() and (pairs[:, 1] == 1).all()  # never flattened to zero
+
+def test_channels_are_merged_and_the_last_peak_is_partial(tmp_path):
+    stereo = np.zeros((1000, 2))
+    stereo[:, 0] = 0.5
+    stereo[-1, 1] = -1.0
+    write_wav(tmp_path / "a.wav", stereo, 8000)
+    build_peaks(tmp_path / "a.wav", tmp_path / "a.peaks", bits=16, base=8)
+    _, pairs = dat(peak_level((tmp_path / "a.peaks").read_bytes(), 0))
+    assert len(pairs) == 125
+    assert (pairs[:-1, 1] >= 16383).all() and (pairs[:-1, 0] == 0).all()
+    assert pairs[-1, 0] <= -32766
+
+def test_halve_keeps_an_odd_last_peak():
+    mins, maxs = halve(np.array([-1.0, -3.0, -2.0]), np.array([1.0, 3.0, 2.0]))
+    assert mins.tolist() == [-3.0, -2.0] and maxs.tolist() == [3.0, 2.0]
+
+def test_short_and_empty_files_have_one_level(tmp_path):
+    write_wav(tmp_path / "a.wav", sine(0.01, 8000), 8000)
+    build_peaks(tmp_path / "a.wav", tmp_path / "a.peaks", base=256)
+    assert [(e['samples_per_peak'], e['length']) for e in peak_index((tmp_path / "a.peaks").read_bytes())['levels']] == [(256, 1)]
+    write_wav(tmp_path / "b.wav", np.zeros((0, 1)), 8000)
+    build_peaks(tmp_path / "b.wav", tmp_path / "b.peaks", base=256)
+    assert peak_index((tmp_path / "b.peaks").read_bytes())['levels'][0]['length'] == 0
+
+def test_unreadable_formats(tmp_path):
+    (tmp_path / "a.mp3").write_bytes(b'\xff\xfb\x90\x00' + b'\0' * 413)
+    assert not build_peaks(tmp_path / "a.mp3", tmp_path / "a.peaks")
+    assert not (tmp_path / "a.peaks").exists()
+    with pytest.raises(ValueError):
+        peak_index(b'RIFF' + b'\0' * 20)
+
+def test_peaks_route(api, server, tmp_path):
+    file_id = "tone.wav"
+    write_wav(tmp_path / file_id, sine(5.0, 8000), 8000)  # tmp_path is the storage root
+
+    response = api.get(f"/api/audio/peaks/{file_id}")
+    assert response.status_code == 200
+    levels = response.json()['levels']
+    assert levels[0]['samples_per_peak'] == server.PEAK_BASE_SAMPLES
+    level = api.get(f"/api/audio/peaks/{file_id}", params={"level": 1})
+    assert level.status_code == 200
+    assert dat(level.content)[0][3] == 2 * server.PEAK_BASE_SAMPLES
+    assert api.get(f"/api/audio/peaks/{file_id}", params={"level": 1}, headers={"If-None-Match": level.headers['etag']}).status_code == 304
+    assert api.get(f"/api/audio/peaks/{file_id}", params={"level": len(levels)}).status_code == 404
+    assert api.get("/api/audio/peaks/missing.wav").status_code == 404
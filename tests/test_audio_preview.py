@@ -0,0 +1,70 @@
+import numpy as np
+
+from audio_preview import build_preview
+from tests.audio_files import read_wav, sine, write_wav
+
+def amplitude(samples: np.ndarray, sample_rate: int, frequency: float) -> float:
+    """Amplitude of one frequency in a mono signal (single-bin DFT, edges skipped)"""
+    x = samples[len(samples) // 8:-len(samples) // 8, 0].astype(float)
+    t = np.arange(len(x)) / sample_rate
+    return 2 * abs(np.dot(x, np.exp(-2j * np.pi * frequency * t))) / len(x)
+
+def test_preview_format_and_length(tmp_path):
+    write_wav(tmp_path / "a.wav", sine(1.5, 48000, channels=2), 48000, sample_width=4)
+    assert build_preview(tmp_path / "a.wav", tmp_path / "a.preview.wav", sample_rate=16000, channels=1, bits=16)
+    samples, rate, width = read_wav(tmp_path / "a.preview.wav")
+    assert (rate, samples.shape[1], width) == (16000, 1, 2)
+    assert len(samples) == 24000
+    assert (tmp_path / "a.preview.wav").stat().st_size < (tmp_path / "a.wav").stat().st_size / 10
+
+def test_non_integer_ratio_length(tmp_path):
+    write_wav(tmp_path / "a.wav", sine(2.0, 44100), 44100)
+    build_preview(tmp_path / "a.wav", tmp_path / "a.preview.wav", sample_rate=16000)
+    samples, rate, _ = read_wav(tmp_path / "a.preview.wav")
+    assert rate == 16000 and abs(len(samples) - 32000) <= 1
+
+def test_passband_is_kept_and_aliases_are_filtered(tmp_path):
+    rate = 48000
+    for frequency, low, high in ((1000, 0.48, 0.52), (5000, 0.45, 0.52), (12000, 0, 0.005), (20000, 0, 0.005)):
+        write_wav(tmp_path / "a.wav", sine(1.0, rate, frequency=frequency), rate)
+        build_preview(tmp_path / "a.wav", tmp_path / "a.preview.wav", sample_rate=16000)
+        samples, out_rate, _ = read_wav(tmp_path / "a.preview.wav")
+        # A tone above 8 kHz would fold back to |16000 - f| if it were not filtered out
+        probe = frequency if frequency < 8000 else abs(16000 - frequency) % 16000
+        assert low <= amplitude(samples / 32767, out_rate, probe) <= high, frequency
+
+def test_source_within_the_limits_is_not_upsampled_or_widened(tmp_path):
+    source = sine(0.5, 8000, frequency=300)
+    write_wav(tmp_path / "a.wav", source, 8000, sample_width=1)
+    build_preview(tmp_path / "a.wav", tmp_path / "a.preview.wav", sample_rate=16000, channels=2, bits=16)
+    samples, rate, width = read_wav(tmp_path / "a.preview.wav")
+    assert (rate, samples.shape[1], width, len(samples)) == (8000, 1, 1, len(source))
+    original, _, _ = read_wav(tmp_path / "a.wav")
+    assert np.abs(samples.astype(int) - original.astype(int)).max() <= 1
+    assert (tmp_path / "a.preview.wav").stat().st_size <= (tmp_path / "a.wav").stat().st_size
+
+def test_mixdown_averages_channels(tmp_path):
+    stereo = np.stack([np.full(1600, 0.5), np.full(1600, -0.25)], axis=1)
+    write_wav(tmp_path / "a.wav", stereo, 16000)
+    build_preview(tmp_path / "a.wav", tmp_path / "a.preview.wav", sample_rate=16000, channels=1)
+    samples, _, _ = read_wav(tmp_path / "a.preview.wav")
+    assert np.abs(samples[:, 0] / 32767 - 0.125).max() < 1e-3
+
+    build_preview(tmp_path / "a.wav", tmp_path / "b.preview.wav", sample_rate=16000, channels=2)
+    assert read_wav(tmp_path / "b.preview.wav")[0].shape == (1600, 2)
+
+def test_eight_bit_previews_are_unsigned(tmp_path):
+    write_wav(tmp_path / "a.wav", np.zeros((800, 1)), 8000)
+    build_preview(tmp_path / "a.wav", tmp_path / "a.preview.wav", sample_rate=8000, bits=8)
+    samples, _, width = read_wav(tmp_path / "a.preview.wav")
+    assert width == 1 and (samples == 128).all()
+
+def test_empty_and_unreadable_sources(tmp_path):
+    write_wav(tmp_path / "a.wav", np.zeros((0, 2)), 44100)
+    assert build_preview(tmp_path / "a.wav", tmp_path / "a.preview.wav")
+    assert len(read_wav(tmp_path / "a.preview.wav")[0]) == 0
+
+    (tmp_path / "b.mp3").write_bytes(b'\xff\xfb\x90\x00' + b'\0' * 413)
+    assert not build_preview(tmp_path / "b.mp3", tmp_path / "b.preview.wav")
+    assert not (tmp_path / "b.preview.wav").exists()
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith('.')] == []  # no temporary files left behind
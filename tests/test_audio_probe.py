@@ -0,0 +1,152 @@
+import math
+import struct
+
+import pytest
+
+from audio_probe import locate_pcm, probe_audio
+from tests.audio_files import sine, write_wav
+
+def riff(chunks, form=b'RIFF', size=None):
+    body = b'WAVE' + b''.join(chunk_id + struct.pack('<I', len(data)) + data + b'\0' * (len(data) & 1) for chunk_id, data in chunks)
+    return form + struct.pack('<I', len(body) if size is None else size) + body
+
+def fmt_chunk(format_tag, channels, sample_rate, bits, block_align=None, extra=b''):
+    block_align = block_align if block_align is not None else channels * bits // 8
+    return b'fmt ', struct.pack('<HHIIHH', format_tag, channels, sample_rate, sample_rate * block_align, block_align, bits) + extra
+
+def extended(value: float) -> bytes:
+    exponent = math.floor(math.log2(value))
+    return struct.pack('>HQ', 16383 + exponent, int(value * 2 ** (63 - exponent)))
+
+def aiff(channels, frames, bits, sample_rate, form=b'AIFF', compression=None):
+    comm = struct.pack('>HIH', channels, frames, bits) + extended(sample_rate)
+    if compression:
+        comm += compression + b'\x00\x00'  # empty Pascal string name, padded
+    ssnd = struct.pack('>II', 0, 0) + b'\0' * (frames * channels * ((bits + 7) // 8))
+    body = form + b'COMM' + struct.pack('>I', len(comm)) + comm + b'SSND' + struct.pack('>I', len(ssnd)) + ssnd
+    return b'FORM' + struct.pack('>I', len(body)) + body
+
+def streaminfo(sample_rate, channels, bits, total_samples):
+    packed = sample_rate << 44 | (channels - 1) << 41 | (bits - 1) << 36 | total_samples
+    return struct.pack('>HH3s3sQ', 4096, 4096, b'\0\0\0', b'\0\0\0', packed) + b'\0' * 16
+
+def flac(sample_rate, channels, bits, total_samples):
+    return b'fLaC' + b'\x80\x00\x00\x22' + streaminfo(sample_rate, channels, bits, total_samples) + b'\0' * 64
+
+def id3(size):
+    return b'ID3\x04\x00\x00' + bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]) + b'\0' * size
+
+MP3_FRAME = b'\xff\xfb\x90\x00'  # MPEG-1 layer III, 128 kbit/s, 44.1 kHz, stereo: 417-byte frames
+
+def mp3_frames(count, first=None):
+    frames = [MP3_FRAME + b'\0' * 413 for _ in range(count)]
+    if first is not None:
+        frames[0] = (MP3_FRAME + first + b'\0' * 413)[:417]
+    return b''.join(frames)
+
+def ogg_page(packet, granule, serial=7, sequence=0):
+    segments = [255] * (len(packet) // 255) + [len(packet) % 255]
+    return b'OggS' + struct.pack('<BBqIIIB', 0, 0, granule, serial, sequence, 0, len(segments)) + bytes(segments) + packet
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+def info(fmt, duration, sample_rate, channels, bit_depth):
+    return {"format": fmt, "duration": duration, "sample_rate": sample_rate, "channels": channels, "bit_depth": bit_depth}
+
+def test_wav(tmp_path):
+    path = write_wav(tmp_path / "a.wav", sine(1.5, 44100, channels=2), 44100)
+    assert probe_audio(path) == info("wav", 1.5, 44100, 2, 16)
+
+def test_wav_with_chunks_before_the_data(tmp_path):
+    data = riff([(b'LIST', b'INFOISFT' + b'\0' * 7), fmt_chunk(1, 1, 8000, 8), (b'data', b'\x80' * 4000)])
+    assert probe_audio(write(tmp_path, "a.wav", data)) == info("wav", 0.5, 8000, 1, 8)
+
+def test_float_wav(tmp_path):
+    data = riff([fmt_chunk(3, 2, 48000, 32), (b'data', b'\0' * 48000 * 8)])
+    assert probe_audio(write(tmp_path, "a.wav", data)) == info("wav", 1.0, 48000, 2, 32)
+
+def test_compressed_wav_uses_the_fact_chunk(tmp_path):
+    data = riff([fmt_chunk(0x11, 1, 22050, 4, block_align=256), (b'fact', struct.pack('<I', 44100)), (b'data', b'\0' * 22000)])
+    assert probe_audio(write(tmp_path, "a.wav", data)) == info("wav", 2.0, 22050, 1, 4)
+
+def test_rf64_takes_the_data_size_from_ds64(tmp_path):
+    ds64 = (b'ds64', struct.pack('<QQQI', 0, 16000, 0, 0))
+    body = riff([ds64, fmt_chunk(1, 1, 16000, 8)], form=b'RF64', size=0xFFFFFFFF)
+    data = body + b'data' + struct.pack('<I', 0xFFFFFFFF) + b'\x80' * 16000
+    assert probe_audio(write(tmp_path, "a.wav", data)) == info("wav", 1.0, 16000, 1, 8)
+
+def test_truncated_wav_reports_what_is_there(tmp_path):
+    data = riff([fmt_chunk(1, 1, 8000, 16)]) + b'data' + struct.pack('<I', 16000) + b'\0' * 8000
+    assert probe_audio(write(tmp_path, "a.wav", data))['duration'] == 0.5
+
+def test_aiff(tmp_path):
+    assert probe_audio(write(tmp_path, "a.aiff", aiff(2, 44100, 16, 44100))) == info("aiff", 1.0, 44100, 2, 16)
+
+def test_aifc(tmp_path):
+    data = aiff(1, 11025, 16, 22050, form=b'AIFC', compression=b'sowt')
+    assert probe_audio(write(tmp_path, "a.aifc", data)) == info("aiff", 0.5, 22050, 1, 16)
+    data = aiff(1, 11025, 16, 22050, form=b'AIFC', compression=b'ima4')
+    assert probe_audio(write(tmp_path, "b.aifc", data))['bit_depth'] is None
+
+def test_flac(tmp_path):
+    data = flac(96000, 2, 24, 96000 * 3)
+    assert probe_audio(write(tmp_path, "a.flac", data)) == info("flac", 3.0, 96000, 2, 24)
+    assert probe_audio(write(tmp_path, "b.flac", id3(100) + data)) == info("flac", 3.0, 96000, 2, 24)
+
+def test_flac_without_a_length(tmp_path):
+    assert probe_audio(write(tmp_path, "a.flac", flac(44100, 1, 16, 0)))['duration'] is None
+
+def test_cbr_mp3(tmp_path):
+    data = id3(200) + mp3_frames(100) + b'TAG' + b'\0' * 125
+    assert probe_audio(write(tmp_path, "a.mp3", data)) == info("mp3", round(100 * 417 * 8 / 128000, 6), 44100, 2, None)
+
+def test_mp3_after_a_large_id3_tag(tmp_path):
+    assert probe_audio(write(tmp_path, "a.mp3", id3(100000) + mp3_frames(10)))['sample_rate'] == 44100
+
+def test_vbr_mp3_counts_frames_from_the_xing_header(tmp_path):
+    xing = b'\0' * 32 + b'Xing' + struct.pack('>II', 1, 500)
+    data = mp3_frames(3, first=xing)
+    assert probe_audio(write(tmp_path, "a.mp3", data)) == info("mp3", round(500 * 1152 / 44100, 6), 44100, 2, None)
+
+def test_ogg_vorbis(tmp_path):
+    identification = b'\x01vorbis' + struct.pack('<IBIiiiBB', 0, 2, 44100, 0, 128000, 0, 0xB8, 1)
+    data = ogg_page(identification, 0) + ogg_page(b'\0' * 300, 44100, sequence=1) + ogg_page(b'\0' * 300, 88200, sequence=2)
+    assert probe_audio(write(tmp_path, "a.ogg", data)) == info("ogg", 2.0, 44100, 2, None)
+
+def test_opus_subtracts_the_pre_skip(tmp_path):
+    head = b'OpusHead' + struct.pack('<BBHIhB', 1, 1, 312, 44100, 0, 0)
+    data = ogg_page(head, 0) + ogg_page(b'\0' * 100, 48000 * 3 + 312, sequence=1)
+    assert probe_audio(write(tmp_path, "a.opus", data)) == info("opus", 3.0, 48000, 1, None)
+
+def test_ogg_ignores_other_streams(tmp_path):
+    identification = b'\x01vorbis' + struct.pack('<IBIiiiBB', 0, 1, 48000, 0, 0, 0, 0, 1)
+    data = ogg_page(identification, 0) + ogg_page(b'\0' * 10, 48000, sequence=1) + ogg_page(b'\0' * 10, 999999, serial=8)
+    assert probe_audio(write(tmp_path, "a.ogg", data))['duration'] == 1.0
+
+@pytest.mark.parametrize("data", [
+    b'', b'not audio at all', b'RIFF\x10\x00\x00\x00WAVEjunk', riff([(b'data', b'\0' * 10)]),
+    b'fLaC\x01\x00\x00\x22' + b'\0' * 40,  # first block is not STREAMINFO
+    ogg_page(b'\x80theora' + b'\0' * 40, 0),
+])
+def test_unknown_or_damaged_files(tmp_path, data):
+    assert probe_audio(write(tmp_path, "a.bin", data)) is None
+
+def test_locate_pcm(tmp_path):
+    wav16 = write_wav(tmp_path / "a.wav", sine(0.25, 8000, channels=2), 8000)
+    assert locate_pcm(wav16) == {
+        "offset": 44, "frames": 2000, "channels": 2, "sample_rate": 8000, "sample_width": 2, "encoding": "int", "byteorder": "<"
+    }
+    assert locate_pcm(write_wav(tmp_path / "b.wav", sine(0.25, 8000), 8000, sample_width=1))['encoding'] == "uint"
+    float_wav = riff([fmt_chunk(3, 1, 8000, 32), (b'data', b'\0' * 400)])
+    assert locate_pcm(write(tmp_path, "c.wav", float_wav))['encoding'] == "float"
+
+    big = locate_pcm(write(tmp_path, "d.aiff", aiff(1, 100, 24, 8000)))
+    assert (big['byteorder'], big['sample_width'], big['encoding'], big['frames']) == (">", 3, "int", 100)
+    little = locate_pcm(write(tmp_path, "e.aifc", aiff(2, 100, 16, 8000, form=b'AIFC', compression=b'sowt')))
+    assert (little['byteorder'], little['sample_width']) == ("<", 2)
+
+    assert locate_pcm(write(tmp_path, "f.aifc", aiff(1, 100, 16, 8000, form=b'AIFC', compression=b'ima4'))) is None
+    assert locate_pcm(write(tmp_path, "g.flac", flac(44100, 2, 16, 100))) is None
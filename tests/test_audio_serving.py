@@ -0,0 +1,96 @@
+import pytest
+from fastapi import HTTPException
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("items=0-10", None),
+    ("bytes=0-99", [(0, 99)]),
+    ("bytes=900-", [(900, 999)]),
+    ("bytes=990-5000", [(990, 999)]),
+    ("bytes=-100", [(900, 999)]),
+    ("bytes=-5000", [(0, 999)]),
+    ("bytes=0-10, 5-20,21-30,50-60", [(0, 30), (50, 60)]),  # overlapping and adjacent ranges merge
+    ("bytes=50-60,0-5", [(0, 5), (50, 60)]),
+    ("bytes=0-0,-1", [(0, 0), (999, 999)]),
+    ("bytes=2000-3000,0-1", [(0, 1)]),  # unsatisfiable ranges are dropped when others remain
+    ("bytes=-0,10-19", [(10, 19)]),
+    # Unparseable: ignored, the whole file is sent
+    ("bytes=abc", None),
+    ("bytes=5-1", None),
+    ("bytes=-", None),
+    ("bytes=1-2-3", None),
+    ("bytes=0-1,x", None),
+    ("bytes=" + ",".join(f"{n}-{n}" for n in range(17)), None),  # more than MAX_BYTE_RANGES
+])
+def test_parse_byte_ranges(server, header, expected):
+    assert server.parse_byte_ranges(header, 1000) == expected
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-1000,2000-", "bytes=-0"])
+def test_unsatisfiable_ranges_are_416(server, header):
+    with pytest.raises(HTTPException) as raised:
+        server.parse_byte_ranges(header, 1000)
+    assert raised.value.status_code == 416
+    assert raised.value.headers == {"Content-Range": "bytes */1000"}
+
+@pytest.fixture
+def stored_file(tmp_path):
+    data = bytes(range(256)) * 40
+    (tmp_path / "clip.mp3").write_bytes(data)
+    return "/api/audio/file/clip.mp3", data
+
+def test_whole_file_is_immutable(api, stored_file):
+    url, data = stored_file
+    response = api.get(url)
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers['etag'] == '"clip.mp3"'
+    assert response.headers['accept-ranges'] == "bytes"
+    assert "immutable" in response.headers['cache-control']
+    assert api.get(url, headers={"If-None-Match": '"clip.mp3"'}).status_code == 304
+    assert api.get("/api/audio/file/missing.mp3").status_code == 404
+
+def test_single_range(api, stored_file):
+    url, data = stored_file
+    response = api.get(url, headers={"Range": "bytes=-100"})
+    assert response.status_code == 206
+    assert response.headers['content-range'] == f"bytes {len(data) - 100}-{len(data) - 1}/{len(data)}"
+    assert response.headers['content-length'] == "100"
+    assert response.content == data[-100:]
+
+def test_several_ranges_are_multipart(api, stored_file):
+    url, data = stored_file
+    response = api.get(url, headers={"Range": "bytes=0-9,20-29,25-39"})
+    assert response.status_code == 206
+    media_type, boundary = response.headers['content-type'].split("; boundary=")
+    assert media_type == "multipart/byteranges"
+    assert int(response.headers['content-length']) == len(response.content)
+    parts = response.content.split(f"--{boundary}".encode())[1:-1]
+    assert len(parts) == 2
+    for part, (first, last) in zip(parts, [(0, 9), (20, 39)]):
+        head, body = part.split(b"\r\n\r\n", 1)
+        assert f"Content-Range: bytes {first}-{last}/{len(data)}".encode() in head
+        assert body == data[first:last + 1] + b"\r\n"
+
+def test_if_range(api, stored_file):
+    url, data = stored_file
+    last_modified = api.get(url).headers['last-modified']
+    for validator in ('"clip.mp3"', last_modified):
+        response = api.get(url, headers={"Range": "bytes=0-9", "If-Range": validator})
+        assert (response.status_code, response.content) == (206, data[:10])
+    for validator in ('"other"', "Thu, 01 Jan 1970 00:00:00 GMT"):
+        response = api.get(url, headers={"Range": "bytes=0-9", "If-Range": validator})
+        assert (response.status_code, response.content) == (200, data)
+
+def test_unsatisfiable_range_route(api, stored_file):
+    url, data = stored_file
+    response = api.get(url, headers={"Range": f"bytes={len(data)}-"})
+    assert response.status_code == 416
+    assert response.headers['content-range'] == f"bytes */{len(data)}"
+
+def test_head_sends_no_body(api, stored_file):
+    url, data = stored_file
+    response = api.head(url, headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.headers['content-length'] == "10"
+    assert response.content == b""
@@ -0,0 +1,105 @@
+import asyncio
+import os
+
+import pytest
+
+from audio_storage import LocalStorage, S3Storage
+from tests.audio_files import sine, write_wav
+
+async def round_trip(storage, scratch):
+    (scratch / "upload.tmp").write_bytes(b"audio bytes")
+    assert not await storage.exists("abc.wav")
+    await storage.put_file(scratch / "upload.tmp", "abc.wav")
+    assert not (scratch / "upload.tmp").exists()  # the upload was consumed
+    assert await storage.exists("abc.wav")
+    assert await storage.read("abc.wav") == b"audio bytes"
+
+    async with storage.local_copy("abc.wav") as path:
+        assert path.read_bytes() == b"audio bytes"
+    async with storage.local_output("abc.wav.peaks") as path:
+        path.write_bytes(b"peaks")
+    assert await storage.read("abc.wav.peaks") == b"peaks"
+    async with storage.local_output("abc.wav.preview") as path:
+        pass  # nothing written: nothing stored
+    assert not await storage.exists("abc.wav.preview")
+
+    await storage.delete("abc.wav")
+    await storage.delete("abc.wav")  # deleting twice is harmless
+    assert not await storage.exists("abc.wav")
+    with pytest.raises(FileNotFoundError):
+        await storage.read("abc.wav")
+    with pytest.raises(FileNotFoundError):
+        async with storage.local_copy("abc.wav"):
+            pass
+
+def test_local_storage(tmp_path):
+    (tmp_path / "store").mkdir()
+    storage = LocalStorage(tmp_path / "store")
+    asyncio.run(round_trip(storage, tmp_path))
+    assert sorted(os.listdir(tmp_path / "store")) == ["abc.wav.peaks"]
+    assert storage.path("abc.wav.peaks") == tmp_path / "store" / "abc.wav.peaks"
+    assert storage.download_url("abc.wav.peaks") is None
+
+@pytest.fixture
+def s3():
+    moto = pytest.importorskip("moto")
+    with moto.mock_aws():
+        yield
+
+def s3_storage(tmp_path, **options):
+    storage = S3Storage(
+        "audio", tmp_path, region="us-east-1", access_key_id="test", secret_access_key="test", **options
+    )
+    storage.client.create_bucket(Bucket="audio")
+    return storage
+
+def test_s3_storage(s3, tmp_path):
+    storage = s3_storage(tmp_path, prefix="/studio/")
+    asyncio.run(round_trip(storage, tmp_path))
+    listed = storage.client.list_objects_v2(Bucket="audio")
+    assert [entry['Key'] for entry in listed['Contents']] == ["studio/abc.wav.peaks"]
+    assert [path.name for path in tmp_path.iterdir()] == []  # scratch copies are cleaned up
+    assert storage.metrics() == {"driver": "s3", "uploads": 2, "downloads": 1, "presigned_urls": 0}
+
+def test_s3_objects_carry_their_media_type(s3, tmp_path):
+    storage = s3_storage(tmp_path)
+    async def scenario():
+        for key in ("abc.mp3", "abc.wav.preview.wav", "abc.wav.peaks"):
+            (tmp_path / "upload.tmp").write_bytes(b"bytes")
+            await storage.put_file(tmp_path / "upload.tmp", key)
+    asyncio.run(scenario())
+    types = [storage.client.head_object(Bucket="audio", Key=key)['ContentType']
+             for key in ("abc.mp3", "abc.wav.preview.wav", "abc.wav.peaks")]
+    assert types == ["audio/mpeg", "audio/wav", "application/octet-stream"]
+
+def test_s3_presigned_urls(s3, tmp_path):
+    storage = s3_storage(tmp_path, prefix="studio", presign_ttl=120)
+    url = storage.download_url("abc.wav")
+    assert url.startswith("https://audio.s3.amazonaws.com/studio/abc.wav?")
+    assert "X-Amz-Expires=120" in url
+    assert storage.presigned == 1
+
+def test_s3_multipart_uploads(s3, tmp_path):
+    storage = s3_storage(tmp_path, multipart_threshold=5 * 1024 * 1024, multipart_chunk=5 * 1024 * 1024)
+    data = os.urandom(11 * 1024 * 1024)
+    (tmp_path / "upload.tmp").write_bytes(data)
+    async def scenario():
+        await storage.put_file(tmp_path / "upload.tmp", "big.wav")
+        async with storage.local_copy("big.wav") as path:
+            return path.read_bytes()
+    assert asyncio.run(scenario()) == data
+    head = storage.client.head_object(Bucket="audio", Key="big.wav")
+    assert head['ETag'].endswith('-3"')  # sent in three parts
+
+def test_uploaded_clip_points_at_the_storage_key(api, db, project, tmp_path):
+    project_id, headers = project
+    tracks = api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks']
+    write_wav(tmp_path / "take.wav", sine(0.5, 8000), 8000)
+    response = api.post(
+        "/api/audio/upload", files={"file": ("take.wav", (tmp_path / "take.wav").read_bytes(), "audio/wav")},
+        data={"project_id": project_id, "track_id": tracks[0]['id']}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    file_id, clip = response.json()['file_id'], response.json()['clip']
+    assert (clip['file_path'], clip['file_url']) == (file_id, f"/api/audio/file/{file_id}")
+    assert (tmp_path / file_id).read_bytes() == (tmp_path / "take.wav").read_bytes()
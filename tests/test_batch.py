@@ -0,0 +1,105 @@
+import pytest
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+def batch(api, project_id, headers, operations):
+    return api.post(f"/api/projects/{project_id}/batch", json=operations, headers=headers)
+
+def load(api, project_id, headers):
+    response = api.get(f"/api/projects/{project_id}", headers=headers)
+    return response.json(), response.headers['etag']
+
+def stored(api, db, project_id):
+    """Every stored track and clip document of a project, as the database has them"""
+    return tuple(
+        sorted(api.portal.call(collection.find({"project_id": project_id}).to_list, None), key=lambda doc: doc['id'])
+        for collection in (db.tracks, db.clips)
+    )
+
+def clip(clip_id, **fields):
+    return {"id": clip_id, "name": clip_id, "start_time": 0.0, "duration": 1.5, **fields}
+
+def test_batch_applies_operations_in_order(api, project):
+    project_id, headers = project
+    vocals, drums = load(api, project_id, headers)[0]['tracks']
+    response = batch(api, project_id, headers, [
+        {"op": "add_track", "index": 0, "data": {"id": "bass", "name": "Bass", "instrument": "bass"}},
+        {"op": "add_clip", "track_id": "bass", "data": clip("c1")},
+        {"op": "update_clip", "clip_id": "c1", "data": {"start_time": 8.0}},
+        {"op": "update_clip", "clip_id": "c1", "data": {"track_id": drums['id']}},
+        {"op": "add_effect", "track_id": vocals['id'], "data": {"type": "reverb"}},
+        {"op": "update_track", "track_id": drums['id'], "data": {"volume": 0.5}},
+        {"op": "reorder_tracks", "track_ids": [drums['id'], vocals['id'], "bass"]},
+    ])
+    assert response.status_code == 200, response.text
+    assert [result.get('id') for result in response.json()['results']] == ["bass", "c1", "c1", "c1", vocals['id'], drums['id'], None]
+
+    document, etag = load(api, project_id, headers)
+    assert response.headers['etag'] == etag
+    assert [t['id'] for t in document['tracks']] == [drums['id'], vocals['id'], "bass"]
+    drums_now = document['tracks'][0]
+    assert drums_now['volume'] == 0.5
+    assert [(c['id'], c['start_time'], c['track_id']) for c in drums_now['clips']] == [("c1", 8.0, drums['id'])]
+    assert document['tracks'][1]['effects'] == [{"type": "reverb"}]
+    assert document['tracks'][2]['clips'] == []
+
+@pytest.mark.parametrize("operation, status, detail", [
+    ({"op": "update_track", "track_id": "{drums}", "data": {"volume": "loud"}}, 422, "Operation 2 (update_track): Invalid Track"),
+    ({"op": "update_track", "track_id": "{drums}", "data": {"owner": "me"}}, 422, "cannot be patched"),
+    ({"op": "delete_clip", "clip_id": "missing"}, 404, "Clip not found"),
+    ({"op": "add_clip", "track_id": "missing", "data": clip("c2")}, 404, "Track not found"),
+    ({"op": "add_clip", "track_id": "{drums}", "data": clip("c1")}, 409, "already exists"),
+    ({"op": "update_effect", "track_id": "{drums}", "data": {"type": "delay"}}, 422, "requires an index"),
+    ({"op": "remove_effect", "track_id": "{drums}", "index": 3}, 409, "out of range"),
+    ({"op": "reorder_tracks", "track_ids": ["{drums}"]}, 422, "every track"),
+    ({"op": "rename_project", "track_id": "{drums}"}, 422, "Unsupported operation"),
+])
+def test_invalid_batch_writes_nothing(api, db, project, operation, status, detail):
+    project_id, headers = project
+    drums = load(api, project_id, headers)[0]['tracks'][1]
+    operation = {
+        key: value.replace("{drums}", drums['id']) if isinstance(value, str)
+        else [v.replace("{drums}", drums['id']) for v in value] if isinstance(value, list) else value
+        for key, value in operation.items()
+    }
+    before = load(api, project_id, headers), stored(api, db, project_id)
+
+    response = batch(api, project_id, headers, [
+        {"op": "update_track", "track_id": drums['id'], "data": {"name": "Percussion"}},
+        {"op": "add_clip", "track_id": drums['id'], "data": clip("c1")},
+        operation,
+    ])
+    assert response.status_code == status
+    assert detail in response.json()['detail']
+    assert (load(api, project_id, headers), stored(api, db, project_id)) == before
+
+def test_batch_size_is_limited(api, project, server):
+    project_id, headers = project
+    response = batch(api, project_id, headers, [{"op": "delete_clip", "clip_id": "x"}] * (server.BATCH_MAX_OPERATIONS + 1))
+    assert response.status_code == 422
+
+def test_failed_write_is_undone_without_transactions(api, db, server, project, monkeypatch):
+    project_id, headers = project
+    vocals, drums = load(api, project_id, headers)[0]['tracks']
+    batch(api, project_id, headers, [{"op": "add_clip", "track_id": vocals['id'], "data": clip("old")}])
+    before = load(api, project_id, headers), stored(api, db, project_id)
+
+    # Track writes go through; the clip inserts that follow them fail
+    monkeypatch.setattr(server, "_TRANSACTIONS_SUPPORTED", False)
+    collection_type = type(db.clips)
+    bulk_write = collection_type.bulk_write
+    async def failing_bulk_write(self, requests, *args, **kwargs):
+        if self.name == "clips" and any(isinstance(request, InsertOne) for request in requests):
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate key"}]})
+        return await bulk_write(self, requests, *args, **kwargs)
+    monkeypatch.setattr(collection_type, "bulk_write", failing_bulk_write)
+
+    response = batch(api, project_id, headers, [
+        {"op": "update_track", "track_id": drums['id'], "data": {"name": "Percussion", "muted": True}},
+        {"op": "reorder_tracks", "track_ids": [drums['id'], vocals['id']]},
+        {"op": "delete_clip", "clip_id": "old"},
+        {"op": "add_track", "data": {"id": "bass", "name": "Bass", "instrument": "bass"}},
+        {"op": "add_clip", "track_id": "bass", "data": clip("new")},
+    ])
+    assert response.status_code == 409
+    assert (load(api, project_id, headers), stored(api, db, project_id)) == before
@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.audio_files import sine, write_wav
+
+@pytest.fixture
+def wav(tmp_path):
+    write_wav(tmp_path / "take.wav", sine(0.5, 8000), 8000)
+    return (tmp_path / "take.wav").read_bytes()
+
+@pytest.fixture
+def tracks(api, project):
+    project_id, headers = project
+    return [track['id'] for track in api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks']]
+
+def upload(api, project_id, headers, track_id, data):
+    response = api.post(
+        "/api/audio/upload", files={"file": ("take.wav", data, "audio/wav")},
+        data={"project_id": project_id, "track_id": track_id}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def get_blob(api, db, file_id):
+    return api.portal.call(db.blobs.find_one, {"file_id": file_id}, {"_id": 0})
+
+def test_identical_uploads_share_one_file(server, api, db, project, tracks, wav, tmp_path):
+    project_id, headers = project
+    before = server.blob_metrics()
+    first = upload(api, project_id, headers, tracks[0], wav)
+    second = upload(api, project_id, headers, tracks[1], wav)
+    assert first['file_id'] == second['file_id'] == f"{hashlib.sha256(wav).hexdigest()}.wav"
+    assert get_blob(api, db, first['file_id'])['refcount'] == 2
+    assert (tmp_path / first['file_id']).read_bytes() == wav
+    after = server.blob_metrics()
+    assert (after['stored'] - before['stored'], after['deduplicated'] - before['deduplicated']) == (1, 1)
+    assert second['jobs'] == []  # the content was already queued for processing
+
+def test_file_is_collected_with_its_last_clip(api, db, project, tracks, wav, tmp_path):
+    project_id, headers = project
+    file_id = upload(api, project_id, headers, tracks[0], wav)['file_id']
+    upload(api, project_id, headers, tracks[1], wav)
+    for derived in (f"{file_id}.peaks", f"{file_id}.preview.wav"):
+        (tmp_path / derived).write_bytes(b"derived")
+
+    assert api.delete(f"/api/projects/{project_id}/tracks/{tracks[0]}", headers=headers).status_code == 200
+    assert get_blob(api, db, file_id)['refcount'] == 1
+    assert (tmp_path / file_id).exists()
+
+    assert api.delete(f"/api/projects/{project_id}", headers=headers).status_code == 200
+    assert get_blob(api, db, file_id) is None
+    assert not any(path.name.startswith(file_id) for path in tmp_path.iterdir())
+
+def test_clips_removed_by_a_patch_release_their_file(api, db, project, tracks, wav, tmp_path):
+    project_id, headers = project
+    file_id = upload(api, project_id, headers, tracks[0], wav)['file_id']
+    response = api.patch(f"/api/projects/{project_id}", json=[{"op": "remove", "path": "/tracks/0/clips/0"}], headers=headers)
+    assert response.status_code == 200, response.text
+    assert get_blob(api, db, file_id) is None
+    assert not (tmp_path / file_id).exists()
+
+def test_collection_keeps_files_clips_still_use(server, api, db, project, tracks, wav, tmp_path):
+    project_id, headers = project
+    uploaded = upload(api, project_id, headers, tracks[0], wav)
+    file_id = uploaded['file_id']
+    # A copy made without taking a reference, then the references dropping to zero
+    copy = {**uploaded['clip'], "id": "copy", "track_id": tracks[1], "project_id": project_id}
+    api.portal.call(db.clips.insert_one, copy)
+    assert api.delete(f"/api/projects/{project_id}/tracks/{tracks[0]}", headers=headers).status_code == 200
+
+    blob = get_blob(api, db, file_id)
+    assert (blob['refcount'], blob.get('deleting')) == (1, None)  # restored to the clips that use it
+    assert (tmp_path / file_id).exists()
+    assert api.portal.call(server.collect_blob, blob['digest']) is False
+
+def test_failed_store_releases_its_reference(server, api, db, wav, tmp_path, monkeypatch):
+    async def failing_put_file(path, key):
+        raise OSError("disk full")
+    monkeypatch.setattr(server.audio_storage, "put_file", failing_put_file)
+    (tmp_path / "upload.tmp").write_bytes(wav)
+    digest = hashlib.sha256(wav).hexdigest()
+    with pytest.raises(OSError):
+        api.portal.call(server.store_blob, tmp_path / "upload.tmp", digest, len(wav), "wav")
+    assert api.portal.call(db.blobs.count_documents, {}) == 0
+
+def test_stale_delete_claim_is_taken_over(server, api, db, wav, tmp_path):
+    digest = hashlib.sha256(wav).hexdigest()
+    crashed = datetime.utcnow() - server.BLOB_STALE_DELETE_CLAIM - timedelta(seconds=1)
+    api.portal.call(db.blobs.insert_one, {
+        "digest": digest, "file_id": f"{digest}.wav", "size": len(wav), "refcount": 0, "deleting": crashed
+    })
+    (tmp_path / "upload.tmp").write_bytes(wav)
+    blob = api.portal.call(server.store_blob, tmp_path / "upload.tmp", digest, len(wav), "wav")
+    assert (blob['refcount'], blob.get('deleting')) == (1, None)
+    assert api.portal.call(db.blobs.count_documents, {"digest": digest}) == 1
+    assert (tmp_path / blob['file_id']).read_bytes() == wav
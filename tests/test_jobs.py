@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+@pytest.fixture
+def queue(server, db):
+    queue = server.JobQueue(
+        lease_seconds=60, poll_interval=0.01, retry_base=5, retry_max=600, executor_kind='thread', processes=1
+    )
+
+    @queue.handler("echo", max_attempts=2)
+    async def echo(payload):
+        if payload.get('fail'):
+            raise RuntimeError("boom")
+        return payload
+
+    return queue
+
+def stored_job(db, job_id):
+    return asyncio.run(db.jobs.find_one({"id": job_id}, {"_id": 0}))
+
+def test_claim_runs_due_jobs_in_order(queue, db):
+    async def scenario():
+        later = await queue.enqueue("echo", {"n": 2}, delay=3600)
+        first = await queue.enqueue("echo", {"n": 1})
+        claimed = await queue.claim("echo")
+        assert (claimed['id'], claimed['status'], claimed['attempts']) == (first['id'], "running", 1)
+        assert claimed['lease_owner'] == queue.worker_id
+        assert await queue.claim("echo") is None  # the other one is not due yet
+        await queue._run(claimed)
+        return first, later
+    first, later = asyncio.run(scenario())
+
+    job = stored_job(db, first['id'])
+    assert (job['status'], job['result'], job['attempts']) == ("succeeded", {"n": 1}, 1)
+    assert "lease_owner" not in job and "lease_expires_at" not in job
+    assert stored_job(db, later['id'])['status'] == "queued"
+    assert (queue.enqueued, queue.succeeded) == (2, 1)
+
+def test_failures_are_retried_with_backoff_then_failed(queue, db, monkeypatch):
+    monkeypatch.setattr("random.uniform", lambda low, high: high)
+    async def attempt(job_id):
+        await db.jobs.update_one({"id": job_id}, {"$set": {"run_at": datetime.utcnow()}})
+        job = await queue.claim("echo")
+        await queue._run(job)
+        return job
+
+    job = asyncio.run(queue.enqueue("echo", {"fail": True}))
+    before = datetime.utcnow()
+    asyncio.run(attempt(job['id']))
+    retried = stored_job(db, job['id'])
+    assert (retried['status'], retried['attempts'], retried['last_error']) == ("queued", 1, "RuntimeError: boom")
+    assert timedelta(seconds=4) < retried['run_at'] - before <= timedelta(seconds=6)
+
+    asyncio.run(attempt(job['id']))
+    failed = stored_job(db, job['id'])
+    assert (failed['status'], failed['attempts']) == ("failed", 2)
+    assert failed['expires_at'] > datetime.utcnow()
+    assert (queue.retried, queue.failed) == (1, 1)
+
+def test_backoff_is_exponential_capped_and_jittered(queue, monkeypatch):
+    monkeypatch.setattr("random.uniform", lambda low, high: high)
+    assert [queue.backoff(attempts) for attempts in (1, 2, 3, 4)] == [5, 10, 20, 40]
+    assert queue.backoff(30) == 600
+    monkeypatch.setattr("random.uniform", lambda low, high: low)
+    assert queue.backoff(2) == 5
+
+def test_expired_leases_are_recovered(queue, db):
+    async def scenario():
+        job = await queue.enqueue("echo", {"n": 1})
+        claimed = await queue.claim("echo")
+        assert await queue.recover() == 0  # lease still valid
+        await db.jobs.update_one({"id": job['id']}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+        assert await queue.recover() == 1
+        # The worker that lost its lease can no longer finish the job
+        await queue.complete(claimed, {"late": True})
+        return job
+    job = asyncio.run(scenario())
+
+    recovered = stored_job(db, job['id'])
+    assert (recovered['status'], recovered['last_error'], recovered['result']) == ("queued", "Worker lease expired", None)
+    assert "lease_owner" not in recovered
+    assert (queue.recovered, queue.succeeded) == (1, 0)
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(queue, db):
+    async def scenario():
+        job = await queue.enqueue("echo", {"n": 1})
+        await db.jobs.update_one({"id": job['id']}, {"$set": {
+            "status": "running", "attempts": 2, "lease_owner": "crashed-worker",
+            "lease_expires_at": datetime.utcnow() - timedelta(seconds=1)
+        }})
+        assert await queue.recover() == 1
+        return job
+    job = asyncio.run(scenario())
+    assert stored_job(db, job['id'])['status'] == "failed"
+
+def test_cancelled_job_goes_back_without_using_an_attempt(queue, db):
+    async def scenario():
+        started = asyncio.Event()
+        @queue.handler("slow")
+        async def slow(payload):
+            started.set()
+            await asyncio.sleep(60)
+        job = await queue.enqueue("slow", {})
+        task = asyncio.create_task(queue._run(await queue.claim("slow")))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return job
+    job = stored_job(db, asyncio.run(scenario())['id'])
+    assert (job['status'], job['attempts']) == ("queued", 0)
+
+def test_workers_pick_up_new_jobs(queue, db):
+    async def scenario():
+        queue.start()
+        try:
+            job = await queue.enqueue("echo", {"n": 3})
+            for _ in range(200):
+                if (await db.jobs.find_one({"id": job['id']}))['status'] == "succeeded":
+                    return True
+                await asyncio.sleep(0.01)
+            return False
+        finally:
+            await queue.stop()
+    assert asyncio.run(scenario())
+
+def test_processing_is_queued_once_per_stored_file(server, db, monkeypatch):
+    queue = server.JobQueue(60, 1, 5, 600, 'thread', 1)
+    for job_type in ("audio.probe", "audio.peaks", "audio.preview"):
+        queue.handler(job_type)(lambda payload: payload)
+    monkeypatch.setattr(server, "jobs", queue)
+
+    async def scenario():
+        await db.blobs.insert_one({"file_id": "abc.wav", "digest": "abc", "refcount": 2})
+        blob = await db.blobs.find_one({"file_id": "abc.wav"})
+        first = await server.enqueue_audio_processing(blob, "user")
+        second = await server.enqueue_audio_processing(blob, "user")  # an identical upload before the jobs ran
+        probed = await server.enqueue_audio_processing({**blob, "audio": {"format": "wav"}}, "user")
+        return first, second, probed
+    first, second, probed = asyncio.run(scenario())
+    assert [job['type'] for job in first] == ["audio.probe", "audio.peaks", "audio.preview"]
+    assert second == [] and probed == []
+    assert asyncio.run(db.jobs.count_documents({})) == 3
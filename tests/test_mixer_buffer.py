@@ -0,0 +1,191 @@
+import pytest
+
+@pytest.fixture
+def tracks(api, project):
+    project_id, headers = project
+    return project_id, [t['id'] for t in api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks']]
+
+def stored_track(api, db, project_id, track_id):
+    return api.portal.call(db.tracks.find_one, {"project_id": project_id, "id": track_id})
+
+def test_updates_are_coalesced_per_track(api, db, server, tracks):
+    project_id, (vocals, drums) = tracks
+    buffer = server.MixerWriteBuffer(60, 100)
+    for volume in (10.0, 20.0, 30.0):
+        api.portal.call(buffer.put, project_id, vocals, {"volume": volume})
+    api.portal.call(buffer.put, project_id, vocals, {"pan": -0.5})
+    api.portal.call(buffer.put, project_id, drums, {"muted": True})
+    assert buffer.pending_tracks == 2
+    assert buffer.overlay(project_id, {"id": vocals, "volume": 100.0})['volume'] == 30.0
+    assert stored_track(api, db, project_id, vocals)['volume'] == 75.0  # nothing written yet
+
+    before = api.portal.call(db.projects.find_one, {"id": project_id})
+    api.portal.call(buffer.flush_all)
+    track = stored_track(api, db, project_id, vocals)
+    assert (track['volume'], track['pan']) == (30.0, -0.5)
+    assert stored_track(api, db, project_id, drums)['muted'] is True
+    after = api.portal.call(db.projects.find_one, {"id": project_id})
+    assert after['version'] == before['version']  # If-Match copies stay valid
+    assert after['mixer_version'] == (before.get('mixer_version') or 0) + 1  # one bump per flush
+    metrics = buffer.metrics()
+    assert (metrics['received'], metrics['written'], metrics['flushes'], metrics['pending_tracks']) == (5, 2, 1, 0)
+
+def test_full_buffer_flushes_only_the_writing_project(api, db, server, tracks):
+    project_id, (vocals, drums) = tracks
+    buffer = server.MixerWriteBuffer(60, 2)
+    api.portal.call(buffer.put, "other-project", "t1", {"volume": 50.0})
+    api.portal.call(buffer.put, project_id, vocals, {"volume": 40.0})  # the second pending track: over the limit
+
+    assert buffer.backpressure_flushes == 1
+    assert stored_track(api, db, project_id, vocals)['volume'] == 40.0
+    assert buffer.pending_tracks == 1
+    assert buffer.overlay("other-project", {"id": "t1"}) == {"id": "t1", "volume": 50.0}  # still waiting for its timer
+    buffer.discard_project("other-project")
+    assert buffer.pending_tracks == 0
+    api.portal.call(buffer.flush_all)
+
+def test_failed_flush_keeps_values_behind_newer_ones(api, db, server, tracks, monkeypatch):
+    project_id, (vocals, drums) = tracks
+    buffer = server.MixerWriteBuffer(60, 100)
+    api.portal.call(buffer.put, project_id, vocals, {"volume": 10.0, "pan": 0.2})
+
+    collection_type = type(db.tracks)
+    bulk_write = collection_type.bulk_write
+    async def failing_bulk_write(self, *args, **kwargs):
+        raise server.PyMongoError("unavailable")
+    monkeypatch.setattr(collection_type, "bulk_write", failing_bulk_write)
+    api.portal.call(buffer.flush_project, project_id)
+    assert (buffer.failures, buffer.pending_tracks) == (1, 1)
+
+    api.portal.call(buffer.put, project_id, vocals, {"volume": 90.0})
+    monkeypatch.setattr(collection_type, "bulk_write", bulk_write)
+    api.portal.call(buffer.flush_all)
+    track = stored_track(api, db, project_id, vocals)
+    assert (track['volume'], track['pan']) == (90.0, 0.2)
+    assert buffer.pending_tracks == 0
+
+def test_only_mixer_fields_are_buffered(server):
+    buffer = server.MixerWriteBuffer(0.25, 100)
+    assert buffer.accepts({"volume": 50.0, "solo": True})
+    assert not buffer.accepts({"volume": 50.0, "name": "Lead"})
+    assert not buffer.accepts({})
+    assert not server.MixerWriteBuffer(0, 100).accepts({"volume": 50.0})
+
+def test_fader_moves_are_visible_before_they_are_written(api, db, project, tracks):
+    project_id, headers = project
+    _, (vocals, _) = tracks
+    response = api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"volume": 35.0}, headers=headers)
+    assert response.status_code == 200 and response.json()['volume'] == 35.0
+    assert api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks'][0]['volume'] == 35.0
+
+    # Any other write to the project flushes the buffer first
+    api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"name": "Lead"}, headers=headers)
+    track = stored_track(api, db, project_id, vocals)
+    assert (track['volume'], track['name']) == (35.0, "Lead")
+
+def load(api, project_id, headers, etag=None):
+    response = api.get(f"/api/projects/{project_id}", headers={**headers, **({"If-None-Match": etag} if etag else {})})
+    return response.status_code, response.headers['etag']
+
+def test_buffered_moves_do_not_invalidate_if_match(api, server, project, tracks):
+    project_id, headers = project
+    _, (vocals, _) = tracks
+    def rename(name, etag):
+        response = api.patch(f"/api/projects/{project_id}", json=[{"op": "replace", "path": "/name", "value": name}],
+                             headers={**headers, "If-Match": etag})
+        assert response.status_code == 200, response.text
+        return response.headers['etag']
+
+    _, etag = load(api, project_id, headers)
+    api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"volume": 35.0}, headers=headers)
+    etag = rename("One", etag)  # the client's copy only lacks a fader position
+    api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"volume": 40.0}, headers=headers)
+    _, current = load(api, project_id, headers)
+    etag = rename("Two", current)
+    api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"volume": 45.0}, headers=headers)
+    api.portal.call(server.mixer_buffer.flush_all)
+    response = api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"name": "Lead"},
+                       headers={**headers, "If-Match": etag})
+    assert response.status_code == 200, response.text
+    assert response.json()['volume'] == 45.0
+
+def test_etag_changes_with_pending_and_flushed_moves(api, server, project, tracks):
+    project_id, headers = project
+    _, (vocals, _) = tracks
+    _, before = load(api, project_id, headers)
+    assert load(api, project_id, headers, before) == (304, before)
+
+    api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"volume": 35.0}, headers=headers)
+    status, pending = load(api, project_id, headers, before)
+    assert status == 200 and pending != before
+    assert load(api, project_id, headers, pending) == (304, pending)
+    api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"volume": 36.0}, headers=headers)
+    status, moved = load(api, project_id, headers, pending)
+    assert status == 200 and moved not in (before, pending)
+
+    api.portal.call(server.mixer_buffer.flush_all)
+    status, flushed = load(api, project_id, headers, moved)
+    assert status == 200 and flushed not in (before, pending, moved)
+    assert load(api, project_id, headers, flushed) == (304, flushed)
+
+def test_mixer_patches_are_buffered(api, db, server, project, tracks):
+    project_id, headers = project
+    _, (vocals, drums) = tracks
+    _, etag = load(api, project_id, headers)
+    received = server.mixer_buffer.received
+    response = api.patch(f"/api/projects/{project_id}", json=[
+        {"op": "replace", "path": "/tracks/0/volume", "value": 20},
+        {"op": "replace", "path": "/tracks/1/muted", "value": True},
+        {"op": "replace", "path": "/tracks/0/volume", "value": 25},
+    ], headers={**headers, "If-Match": etag})
+    assert response.status_code == 200, response.text
+    assert server.mixer_buffer.received == received + 2  # one update per track
+    assert stored_track(api, db, project_id, vocals)['volume'] == 75.0
+    assert response.headers['etag'] == load(api, project_id, headers)[1] != etag
+    tracks = api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks']
+    assert (tracks[0]['volume'], tracks[1]['muted']) == (25.0, True)
+
+    api.portal.call(server.mixer_buffer.flush_all)
+    assert stored_track(api, db, project_id, vocals)['volume'] == 25.0
+
+@pytest.mark.parametrize("operations, status", [
+    ([{"op": "replace", "path": "/tracks/0/volume", "value": "loud"}], 422),
+    ([{"op": "replace", "path": "/tracks/1/pan", "value": 0.5}, {"op": "replace", "path": "/tracks/0/solo", "value": []}], 422),
+    ([{"op": "replace", "path": "/tracks/5/volume", "value": 20}], 409),
+    ([{"op": "replace", "path": "/tracks/01/volume", "value": 20}], 422),
+])
+def test_invalid_mixer_patches_buffer_nothing(api, server, project, tracks, operations, status):
+    project_id, headers = project
+    received = server.mixer_buffer.received
+    assert api.patch(f"/api/projects/{project_id}", json=operations, headers=headers).status_code == status
+    assert server.mixer_buffer.received == received
+
+def test_other_patches_are_written_with_the_buffer(api, db, server, project, tracks):
+    project_id, headers = project
+    _, (vocals, _) = tracks
+    response = api.patch(f"/api/projects/{project_id}", json=[
+        {"op": "replace", "path": "/tracks/0/volume", "value": 20},
+        {"op": "replace", "path": "/tracks/0/name", "value": "Lead"},
+    ], headers=headers)
+    assert response.status_code == 200, response.text
+    track = stored_track(api, db, project_id, vocals)
+    assert (track['volume'], track['name']) == (20.0, "Lead")
+
+def test_a_drag_reads_the_track_once(api, db, project, tracks, monkeypatch):
+    project_id, headers = project
+    _, (vocals, _) = tracks
+    reads = []
+    collection_type = type(db.tracks)
+    find_one = collection_type.find_one
+    def counting_find_one(self, *args, **kwargs):
+        if self.name == "tracks":
+            reads.append(args)
+        return find_one(self, *args, **kwargs)
+    monkeypatch.setattr(collection_type, "find_one", counting_find_one)
+    for volume in (10.0, 20.0, 30.0):
+        response = api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"volume": volume}, headers=headers)
+        assert response.json()['volume'] == volume
+    response = api.put(f"/api/projects/{project_id}/tracks/{vocals}", json={"pan": 0.5}, headers=headers)
+    assert (response.json()['volume'], response.json()['pan']) == (30.0, 0.5)
+    assert len(reads) == 1
+    assert api.put(f"/api/projects/{project_id}/tracks/missing", json={"volume": 1.0}, headers=headers).status_code == 404
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+@pytest.mark.parametrize("sort_value", [
+    datetime(2025, 3, 1, 12, 30, 15, 250000), "Zebra", 42, 2.5, None,
+])
+def test_cursor_round_trip(server, sort_value):
+    cursor = server.encode_cursor(sort_value, "item-7")
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor  # safe in a query string as is
+    assert server.decode_cursor(cursor) == (sort_value, "item-7")
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "bm90IGpzb24", "eyJrIjoxfQ"])  # ..., not JSON, {"k":1}
+def test_invalid_cursor_is_400(server, cursor):
+    with pytest.raises(HTTPException) as raised:
+        server.decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+def test_keyset_filter(server):
+    assert server.keyset_filter("updated_at", None) == {}
+    cursor = server.encode_cursor(5, "b")
+    assert server.keyset_filter("position", cursor) == {"$or": [{"position": {"$lt": 5}}, {"position": 5, "id": {"$lt": "b"}}]}
+    assert server.keyset_filter("position", cursor, descending=False) == {"$or": [{"position": {"$gt": 5}}, {"position": 5, "id": {"$gt": "b"}}]}
+
+def test_pages_cover_every_project_once(api, db, register):
+    headers = register()
+    created = {api.post("/api/projects", json={"name": f"P{n}"}, headers=headers).json()['id'] for n in range(7)}
+    # Ties on the sort key are broken by id
+    api.portal.call(db.projects.update_many, {"id": {"$in": sorted(created)[:4]}}, {"$set": {"updated_at": datetime(2025, 1, 1)}})
+
+    seen, after, pages = [], None, 0
+    while True:
+        response = api.get("/api/projects", params={"limit": 3, **({"after": after} if after else {})}, headers=headers)
+        assert response.status_code == 200
+        seen += [project['id'] for project in response.json()]
+        pages += 1
+        after = response.headers.get("X-Next-Cursor")
+        if not after:
+            break
+    assert pages == 3
+    assert len(seen) == len(set(seen)) and set(seen) == created
+
+def test_summary_listing_returns_next_cursor(api, register):
+    headers = register()
+    for n in range(3):
+        api.post("/api/projects", json={"name": f"P{n}"}, headers=headers)
+    first = api.get("/api/projects/summary", params={"limit": 2}, headers=headers).json()
+    assert len(first['items']) == 2 and first['next_cursor']
+    second = api.get("/api/projects/summary", params={"limit": 2, "after": first['next_cursor']}, headers=headers).json()
+    assert len(second['items']) == 1 and second['next_cursor'] is None
+    assert not {p['id'] for p in first['items']} & {p['id'] for p in second['items']}
+
+def test_bad_cursor_on_a_route_is_400(api, register):
+    response = api.get("/api/projects", params={"after": "garbage"}, headers=register())
+    assert response.status_code == 400
@@ -0,0 +1,177 @@
+import pytest
+from pymongo import DeleteMany, InsertOne, ReplaceOne, UpdateOne
+
+def clip(clip_id, **fields):
+    return {"id": clip_id, "name": clip_id, "start_time": 0.0, "duration": 2.0, **fields}
+
+def patch(api, project_id, headers, operations, etag=None):
+    if etag:
+        headers = {**headers, "If-Match": etag}
+    return api.patch(f"/api/projects/{project_id}", json=operations, headers=headers)
+
+def load(api, project_id, headers):
+    response = api.get(f"/api/projects/{project_id}", headers=headers)
+    return response.json(), response.headers['etag']
+
+def compiled(api, server, project_id, operations):
+    """The writes a patch compiles to, without committing it"""
+    project_patch = server.ProjectPatch(project_id)
+    api.portal.call(project_patch.load)
+    for operation in operations:
+        api.portal.call(project_patch.apply, operation)
+    return project_patch.compile()
+
+def test_field_replace_compiles_to_a_single_set(api, server, project):
+    project_id, headers = project
+    tracks = load(api, project_id, headers)[0]['tracks']
+    project_update, track_writes, clip_writes = compiled(api, server, project_id, [
+        {"op": "replace", "path": "/name", "value": "Renamed"},
+        {"op": "replace", "path": "/tracks/1/volume", "value": 0.25},
+    ])
+    assert project_update == {"$set": {"name": "Renamed"}}
+    assert track_writes == [UpdateOne({"project_id": project_id, "id": tracks[1]['id']}, {"$set": {"volume": 0.25}})]
+    assert clip_writes == []
+
+def test_append_compiles_to_inserts(api, server, project):
+    project_id, headers = project
+    track_id = load(api, project_id, headers)[0]['tracks'][0]['id']
+    _, track_writes, clip_writes = compiled(api, server, project_id, [
+        {"op": "add", "path": "/tracks/0/clips/-", "value": clip("c1")},
+        {"op": "add", "path": "/tracks/0/effects/-", "value": {"type": "reverb"}},
+    ])
+    assert [type(write) for write in clip_writes] == [InsertOne]
+    assert clip_writes[0]._doc['id'] == "c1" and clip_writes[0]._doc['project_id'] == project_id
+    # Appending writes the new element only
+    assert track_writes == [UpdateOne({"project_id": project_id, "id": track_id}, {"$set": {"effects.0": {"type": "reverb"}}})]
+
+def test_patch_is_written_and_bumps_the_etag(api, project):
+    project_id, headers = project
+    _, etag = load(api, project_id, headers)
+    response = patch(api, project_id, headers, [
+        {"op": "replace", "path": "/tracks/0/muted", "value": True},
+        {"op": "add", "path": "/tracks/1/clips/-", "value": clip("c1", start_time=4.0)},
+    ], etag)
+    assert response.status_code == 200, response.text
+    document, new_etag = load(api, project_id, headers)
+    assert response.headers['etag'] == new_etag != etag
+    assert document['tracks'][0]['muted'] is True
+    assert [c['id'] for c in document['tracks'][1]['clips']] == ["c1"]
+
+@pytest.mark.parametrize("operation, status, detail", [
+    ({"op": "replace", "path": "tracks/0/name", "value": "x"}, 422, "Invalid JSON pointer"),
+    ({"op": "replace", "path": "/tracks/7/name", "value": "x"}, 409, "out of range"),
+    ({"op": "replace", "path": "/tracks/01/name", "value": "x"}, 422, "Invalid array index"),
+    ({"op": "replace", "path": "/tracks/0/position", "value": 3}, 422, "cannot be patched"),
+    ({"op": "replace", "path": "/owner_id", "value": "me"}, 422, "cannot be patched"),
+    ({"op": "replace", "path": "/tracks", "value": []}, 422, "individually"),
+    ({"op": "remove", "path": "/tracks/0/clips/0"}, 409, "out of range"),
+    ({"op": "replace", "path": "/tracks/0/volume"}, 422, "requires a value"),
+    ({"op": "replace", "path": "/tracks/0/volume", "value": "loud"}, 422, "Invalid Track"),
+    ({"op": "add", "path": "/tracks/0/clips/-", "value": {"name": "no times"}}, 422, "Invalid AudioClip"),
+    ({"op": "merge", "path": "/name", "value": "x"}, 422, "Unsupported operation"),
+])
+def test_invalid_operations_write_nothing(api, project, operation, status, detail):
+    project_id, headers = project
+    before, etag = load(api, project_id, headers)
+    response = patch(api, project_id, headers, [{"op": "replace", "path": "/name", "value": "Changed"}, operation])
+    assert response.status_code == status
+    assert detail in response.json()['detail']
+    assert load(api, project_id, headers) == (before, etag)
+
+def test_failed_test_operation_aborts_the_patch(api, project):
+    project_id, headers = project
+    before, etag = load(api, project_id, headers)
+    response = patch(api, project_id, headers, [
+        {"op": "replace", "path": "/tracks/0/name", "value": "Lead"},
+        {"op": "test", "path": "/tracks/1/name", "value": "Bass"},
+    ])
+    assert response.status_code == 409
+    assert "Test failed" in response.json()['detail']
+    assert load(api, project_id, headers) == (before, etag)
+
+    response = patch(api, project_id, headers, [
+        {"op": "test", "path": "/tracks/1/name", "value": "Drums"},
+        {"op": "replace", "path": "/tracks/0/name", "value": "Lead"},
+    ])
+    assert response.status_code == 200
+
+def test_stale_if_match_is_412(api, project):
+    project_id, headers = project
+    _, etag = load(api, project_id, headers)
+    assert patch(api, project_id, headers, [{"op": "replace", "path": "/name", "value": "One"}], etag).status_code == 200
+    response = patch(api, project_id, headers, [{"op": "replace", "path": "/name", "value": "Two"}], etag)
+    assert response.status_code == 412
+    assert load(api, project_id, headers)[0]['name'] == "One"
+
+def test_clip_moves_to_another_track(api, db, project):
+    project_id, headers = project
+    patch(api, project_id, headers, [{"op": "add", "path": "/tracks/0/clips/-", "value": clip(cid)} for cid in ("c1", "c2")])
+
+    response = patch(api, project_id, headers, [{"op": "move", "from": "/tracks/0/clips/0", "path": "/tracks/1/clips/-"}])
+    assert response.status_code == 200, response.text
+    document, _ = load(api, project_id, headers)
+    assert [c['id'] for c in document['tracks'][0]['clips']] == ["c2"]
+    assert [c['id'] for c in document['tracks'][1]['clips']] == ["c1"]
+    stored = api.portal.call(db.clips.find_one, {"project_id": project_id, "id": "c1"})
+    assert stored['track_id'] == document['tracks'][1]['id']
+    assert api.portal.call(db.clips.count_documents, {"project_id": project_id}) == 2
+
+def test_clips_can_only_be_appended(api, project):
+    project_id, headers = project
+    patch(api, project_id, headers, [{"op": "add", "path": "/tracks/0/clips/-", "value": clip("c1")}])
+    response = patch(api, project_id, headers, [{"op": "move", "from": "/tracks/0/clips/0", "path": "/tracks/1/clips/0"}])
+    assert response.status_code == 200  # index 0 of an empty list is its end
+    response = patch(api, project_id, headers, [{"op": "add", "path": "/tracks/1/clips/0", "value": clip("c2")}])
+    assert response.status_code == 422
+
+def test_track_move_reorders(api, project):
+    project_id, headers = project
+    names = [t['name'] for t in load(api, project_id, headers)[0]['tracks']]
+    response = patch(api, project_id, headers, [{"op": "move", "from": "/tracks/1", "path": "/tracks/0"}])
+    assert response.status_code == 200
+    assert [t['name'] for t in load(api, project_id, headers)[0]['tracks']] == names[::-1]
+
+def test_copy_of_a_clip_needs_a_new_id(api, project):
+    project_id, headers = project
+    patch(api, project_id, headers, [{"op": "add", "path": "/tracks/0/clips/-", "value": clip("c1")}])
+    response = patch(api, project_id, headers, [{"op": "copy", "from": "/tracks/0/clips/0", "path": "/tracks/1/clips/-"}])
+    assert response.status_code == 409
+    assert "already exists" in response.json()['detail']
+
+def test_pointer_escapes(server):
+    assert server.parse_pointer("") == []
+    assert server.parse_pointer("/a~1b/c~0d/~01") == ["a/b", "c~d", "~1"]
+
+def test_replaced_clips_keep_their_place(api, server, db, project):
+    project_id, headers = project
+    patch(api, project_id, headers, [{"op": "add", "path": "/tracks/0/clips/-", "value": clip(cid)} for cid in "abc"])
+    _, _, clip_writes = compiled(api, server, project_id, [
+        {"op": "replace", "path": "/tracks/0/clips/0", "value": clip("x")},
+        {"op": "replace", "path": "/tracks/0/clips/0", "value": clip("y")},  # replacing the replacement
+    ])
+    assert [type(write) for write in clip_writes] == [ReplaceOne]
+    assert clip_writes[0]._filter == {"project_id": project_id, "id": "a"} and clip_writes[0]._doc['id'] == "y"
+
+    stored_id = api.portal.call(db.clips.find_one, {"project_id": project_id, "id": "b"})['_id']
+    response = patch(api, project_id, headers, [
+        {"op": "replace", "path": "/tracks/0/clips/0", "value": clip("x", duration=3.0)},
+        {"op": "replace", "path": "/tracks/0/clips/2", "value": clip("c", name="same id")},
+        {"op": "replace", "path": "/tracks/0/clips/1/name", "value": "edited"},
+    ])
+    assert response.status_code == 200, response.text
+    clips = load(api, project_id, headers)[0]['tracks'][0]['clips']
+    assert [(c['id'], c['name'], c['duration']) for c in clips] == [("x", "x", 3.0), ("b", "edited", 2.0), ("c", "same id", 2.0)]
+    assert api.portal.call(db.clips.find_one, {"project_id": project_id, "id": "b"})['_id'] == stored_id
+
+def test_replaced_clip_whose_id_moves_elsewhere_is_reinserted(api, server, project):
+    project_id, headers = project
+    patch(api, project_id, headers, [{"op": "add", "path": "/tracks/0/clips/-", "value": clip(cid)} for cid in "ab"])
+    operations = [
+        {"op": "replace", "path": "/tracks/0/clips/0", "value": clip("x")},
+        {"op": "add", "path": "/tracks/1/clips/-", "value": clip("a")},
+    ]
+    _, _, clip_writes = compiled(api, server, project_id, operations)
+    assert clip_writes[0] == DeleteMany({"project_id": project_id, "id": {"$in": ["a"]}})
+    assert patch(api, project_id, headers, operations).status_code == 200
+    tracks = load(api, project_id, headers)[0]['tracks']
+    assert ({c['id'] for c in tracks[0]['clips']}, [c['id'] for c in tracks[1]['clips']]) == ({"x", "b"}, ["a"])
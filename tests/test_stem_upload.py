@@ -0,0 +1,103 @@
+import hashlib
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from tests.audio_files import sine, write_wav
+
+def wav_bytes(tmp_path, frequency):
+    write_wav(tmp_path / "stem.wav", sine(0.25, 8000, frequency=frequency), 8000)
+    return (tmp_path / "stem.wav").read_bytes()
+
+def upload_stems(api, project_id, headers, stems, track_ids):
+    return api.post(
+        "/api/audio/upload/stems", files=[("files", (name, data, "audio/wav")) for name, data in stems],
+        data={"project_id": project_id, "track_ids": json.dumps(track_ids)}, headers=headers
+    )
+
+def stored(api, db, project_id):
+    clips = api.portal.call(lambda: db.clips.find({"project_id": project_id}, {"_id": 0}).to_list(None))
+    blobs = api.portal.call(lambda: db.blobs.find({}, {"_id": 0}).to_list(None))
+    return clips, blobs
+
+@pytest.fixture
+def tracks(api, project):
+    project_id, headers = project
+    return [track['id'] for track in api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks']]
+
+def test_manifest_follows_the_order_of_the_files(api, db, project, tracks, tmp_path):
+    project_id, headers = project
+    version = api.get(f"/api/projects/{project_id}", headers=headers).json()['version']
+    stems = [(f"{name}.wav", wav_bytes(tmp_path, frequency))
+             for name, frequency in (("kick", 110), ("lead", 440), ("snare", 220))]
+    response = upload_stems(api, project_id, headers, stems, [tracks[1], tracks[0], tracks[1]])
+    assert response.status_code == 200, response.text
+
+    manifest = response.json()['files']
+    assert [(entry['filename'], entry['track_id']) for entry in manifest] == [
+        ("kick.wav", tracks[1]), ("lead.wav", tracks[0]), ("snare.wav", tracks[1])
+    ]
+    for entry, (_, data) in zip(manifest, stems):
+        assert (tmp_path / entry['file_id']).read_bytes() == data
+        assert [job['type'] for job in entry['jobs']] == ["audio.probe", "audio.peaks", "audio.preview"]
+    after = api.get(f"/api/projects/{project_id}", headers=headers).json()
+    assert after['version'] == version + 1  # one write for all the clips
+    assert [clip['name'] for clip in after['tracks'][1]['clips']] == ["kick.wav", "snare.wav"]
+
+def test_the_same_content_twice_is_stored_once(api, db, project, tracks, tmp_path):
+    project_id, headers = project
+    data = wav_bytes(tmp_path, 440)
+    response = upload_stems(api, project_id, headers, [("a.wav", data), ("b.wav", data)], tracks)
+    assert response.status_code == 200, response.text
+
+    first, second = response.json()['files']
+    assert first['file_id'] == second['file_id']
+    assert first['clip']['id'] != second['clip']['id']
+    assert first['jobs'] == second['jobs'] and len(first['jobs']) == 3  # processed once
+    assert api.portal.call(db.jobs.count_documents, {}) == 3
+    clips, blobs = stored(api, db, project_id)
+    assert len(clips) == 2
+    assert [(blob['file_id'], blob['refcount']) for blob in blobs] == [(first['file_id'], 2)]
+
+@pytest.mark.parametrize("track_ids", ["vocals", json.dumps({"a": 1}), json.dumps(["one"]), json.dumps([1, 2])])
+def test_track_ids_must_name_a_track_per_file(api, db, project, tmp_path, track_ids):
+    project_id, headers = project
+    response = api.post(
+        "/api/audio/upload/stems",
+        files=[("files", ("a.wav", wav_bytes(tmp_path, 110), "audio/wav")), ("files", ("b.wav", wav_bytes(tmp_path, 220), "audio/wav"))],
+        data={"project_id": project_id, "track_ids": track_ids}, headers=headers
+    )
+    assert response.status_code == 422
+    assert stored(api, db, project_id) == ([], [])
+    assert [path.name for path in tmp_path.iterdir()] == ["stem.wav"]  # temporary files are removed
+
+def test_unknown_track_rejects_every_file(api, db, project, tracks, tmp_path):
+    project_id, headers = project
+    stems = [("a.wav", wav_bytes(tmp_path, 110)), ("b.wav", wav_bytes(tmp_path, 220))]
+    response = upload_stems(api, project_id, headers, stems, [tracks[0], "nope"])
+    assert (response.status_code, response.json()['detail']) == (404, "Track not found in project")
+    assert stored(api, db, project_id) == ([], [])
+    assert [path.name for path in tmp_path.iterdir()] == ["stem.wav"]
+
+def test_failed_store_releases_the_files_already_stored(server, api, db, project, tracks, tmp_path, monkeypatch):
+    project_id, headers = project
+    store_blob = server.store_blob
+    kept, failing = wav_bytes(tmp_path, 110), wav_bytes(tmp_path, 220)
+    async def failing_store_blob(path, digest, size, extension):
+        if digest == hashlib.sha256(failing).hexdigest():
+            raise HTTPException(status_code=503, detail="Audio storage is busy, please retry the upload")
+        return await store_blob(path, digest, size, extension)
+    monkeypatch.setattr(server, "store_blob", failing_store_blob)
+
+    response = upload_stems(api, project_id, headers, [("a.wav", kept), ("b.wav", failing)], tracks)
+    assert response.status_code == 503
+    assert stored(api, db, project_id) == ([], [])  # the stored file was released and collected
+    assert [path.name for path in tmp_path.iterdir()] == ["stem.wav"]
+    assert api.portal.call(db.jobs.count_documents, {}) == 0
+
+def test_stems_need_editor_access(api, db, project, tracks, register, tmp_path):
+    project_id, _ = project
+    response = upload_stems(api, project_id, register("stranger"), [("a.wav", wav_bytes(tmp_path, 110))], tracks[:1])
+    assert response.status_code == 403
+    assert stored(api, db, project_id) == ([], [])
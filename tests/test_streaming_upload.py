@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+BOUNDARY = "b0undary"
+
+def multipart(*parts):
+    """A multipart/form-data body from (name, value) fields and (name, filename, content type, data) files"""
+    body = b""
+    for part in parts:
+        if len(part) == 2:
+            name, value = part
+            body += f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        else:
+            name, filename, content_type, data = part
+            body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n').encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+def request(body, content_type=f"multipart/form-data; boundary={BOUNDARY}", chunk_size=100, content_length=True):
+    headers = [(b"content-type", content_type.encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+    return Request({"type": "http", "method": "POST", "path": "/", "query_string": b"", "headers": headers}, receive)
+
+@pytest.fixture
+def parse(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_WRITE_BUFFER_BYTES", 256)  # several writes per file
+    def parse_upload(request, **options):
+        upload = server.StreamingUpload(request, directory=tmp_path, **{"max_file_bytes": 10000, **options})
+        asyncio.run(upload.parse())
+        return upload
+    return parse_upload
+
+def refused(parse, request, **options):
+    with pytest.raises(HTTPException) as raised:
+        parse(request, **options)
+    return raised.value
+
+def test_fields_and_files_are_streamed_to_disk(parse, tmp_path):
+    data = bytes(range(256)) * 20
+    upload = parse(request(multipart(("project_id", "p1"), ("file", "take.wav", "audio/wav", data), ("track_id", "t1"))))
+    assert upload.fields == {"project_id": "p1", "track_id": "t1"}
+    uploaded = upload.file("file")
+    assert (uploaded.filename, uploaded.content_type, uploaded.size) == ("take.wav", "audio/wav", len(data))
+    assert uploaded.digest == hashlib.sha256(data).hexdigest()
+    assert uploaded.temp_path.parent == tmp_path and uploaded.temp_path.read_bytes() == data
+    assert uploaded.extension("mp3") == "wav"
+    with pytest.raises(HTTPException):
+        upload.field("name")
+
+def test_declared_size_over_the_limit_is_refused(parse, tmp_path):
+    body = multipart(("file", "a.wav", "audio/wav", b"\0" * 20000))
+    error = refused(parse, request(body))
+    assert error.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+def test_streamed_size_over_the_limit_is_refused(parse, tmp_path):
+    body = multipart(("file", "a.wav", "audio/wav", b"\0" * 10001))
+    assert refused(parse, request(body, content_length=False)).status_code == 413
+    assert list(tmp_path.iterdir()) == []  # the partial file is removed
+
+def test_truncated_body(parse, tmp_path):
+    body = multipart(("file", "a.wav", "audio/wav", b"\1" * 5000))
+    error = refused(parse, request(body[:3000], content_length=False))
+    assert (error.status_code, error.detail) == (400, "Upload ended before the file was complete")
+    assert list(tmp_path.iterdir()) == []
+
+def test_client_disconnect(server, tmp_path):
+    body = multipart(("file", "a.wav", "audio/wav", b"\1" * 5000))
+    messages = [{"type": "http.request", "body": body[:3000], "more_body": True}]
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+    upload = server.StreamingUpload(
+        Request({"type": "http", "method": "POST", "path": "/", "query_string": b"",
+                 "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]}, receive),
+        directory=tmp_path
+    )
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(upload.parse())
+    assert raised.value.status_code == 400
+    assert list(tmp_path.iterdir()) == []
+
+def test_too_many_files(parse, tmp_path):
+    body = multipart(("file", "a.wav", "audio/wav", b"a"), ("file", "b.wav", "audio/wav", b"b"))
+    error = refused(parse, request(body))
+    assert (error.status_code, error.detail) == (400, "Too many files (max 1)")
+    assert list(tmp_path.iterdir()) == []
+    assert len(parse(request(body), max_files=2).files) == 2
+
+@pytest.mark.parametrize("content_type", ["text/plain", "application/octet-stream"])
+def test_files_that_are_not_audio_are_refused(parse, tmp_path, content_type):
+    error = refused(parse, request(multipart(("file", "a.txt", content_type, b"text"))))
+    assert (error.status_code, error.detail) == (400, f"Invalid file type: {content_type}")
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize("content_type", ["application/json", "multipart/form-data"])
+def test_body_that_is_not_multipart_is_refused(parse, content_type):
+    error = refused(parse, request(b"{}", content_type=content_type))
+    assert (error.status_code, error.detail) == (400, "Expected a multipart/form-data upload")
+
+def test_discard_keeps_only_stored_files(parse, tmp_path):
+    upload = parse(request(multipart(("a", "a.wav", "audio/wav", b"a" * 300), ("b", "b.wav", "audio/wav", b"b" * 300))),
+                   max_files=2)
+    stored = asyncio.run(upload.store(upload.file("a"), tmp_path / "a.wav"))
+    asyncio.run(upload.discard())
+    assert [path.name for path in tmp_path.iterdir()] == ["a.wav"]
+    assert stored.read_bytes() == b"a" * 300
@@ -0,0 +1,55 @@
+def get_tracks(api, project_id, headers):
+    response = api.get(f"/api/projects/{project_id}", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()['tracks']
+
+def test_track_update_only_writes_the_fields_sent(api, project):
+    project_id, headers = project
+    vocals, drums = get_tracks(api, project_id, headers)
+
+    assert api.put(f"/api/projects/{project_id}/tracks/{vocals['id']}", json={"name": "Lead"}, headers=headers).status_code == 200
+    # A second client holding a stale copy of the track only sends what it changed
+    response = api.put(f"/api/projects/{project_id}/tracks/{vocals['id']}", json={"instrument": "synth"}, headers=headers)
+    assert response.status_code == 200
+
+    vocals, after = get_tracks(api, project_id, headers)
+    assert (vocals['name'], vocals['instrument']) == ("Lead", "synth")
+    assert after == drums
+
+def test_track_update_of_missing_track_is_404(api, project):
+    project_id, headers = project
+    etag = api.get(f"/api/projects/{project_id}", headers=headers).headers['etag']
+    for conditional in ({}, {"If-Match": etag}):
+        for body in ({"name": "Lead"}, {"clips": []}):
+            response = api.put(f"/api/projects/{project_id}/tracks/nope", json=body, headers={**headers, **conditional})
+            assert response.status_code == 404
+    # Nothing changed, so every client's copy is still current
+    assert api.get(f"/api/projects/{project_id}", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+def test_effects_are_appended_server_side(api, project):
+    project_id, headers = project
+    track_id = get_tracks(api, project_id, headers)[0]['id']
+    for name in ("Reverb", "Delay"):
+        response = api.post(f"/api/projects/{project_id}/tracks/{track_id}/effects", json={"type": name.lower(), "name": name}, headers=headers)
+        assert response.status_code == 200
+
+    assert [effect['name'] for effect in get_tracks(api, project_id, headers)[0]['effects']] == ["Reverb", "Delay"]
+
+def test_effect_on_missing_track_is_404(api, project):
+    project_id, headers = project
+    response = api.post(f"/api/projects/{project_id}/tracks/nope/effects", json={"type": "reverb"}, headers=headers)
+    assert response.status_code == 404
+
+def test_track_delete_leaves_other_tracks(api, project):
+    project_id, headers = project
+    vocals, drums = get_tracks(api, project_id, headers)
+    assert api.delete(f"/api/projects/{project_id}/tracks/{vocals['id']}", headers=headers).status_code == 200
+    assert get_tracks(api, project_id, headers) == [drums]
+
+def test_edits_need_editor_access(api, project, register):
+    project_id, headers = project
+    track_id = get_tracks(api, project_id, headers)[0]['id']
+    stranger = register("stranger")
+    response = api.put(f"/api/projects/{project_id}/tracks/{track_id}", json={"name": "Mine"}, headers=stranger)
+    assert response.status_code == 403
+    assert get_tracks(api, project_id, headers)[0]['name'] == "Vocals"
@@ -0,0 +1,74 @@
+from contextlib import ExitStack
+
+import pytest
+from fastapi import HTTPException
+
+@pytest.fixture
+def admission(server):
+    return server.UploadAdmission(max_uploads=3, max_bytes=1000, max_user_uploads=2, max_user_bytes=600, retry_after=7)
+
+def refused(admission, user_id, size):
+    with pytest.raises(HTTPException) as raised:
+        with admission.admit(user_id, size):
+            pass
+    assert raised.value.status_code == 503
+    assert raised.value.headers == {"Retry-After": "7"}
+    return raised.value
+
+def test_upload_count_limit(admission):
+    with ExitStack() as held:
+        for user_id in ("a", "b", "c"):
+            held.enter_context(admission.admit(user_id, 10))
+        assert refused(admission, "d", 10).detail == "Upload capacity exhausted, please retry"
+    with admission.admit("d", 10):
+        pass
+    assert admission.metrics()['rejected'] == {"uploads": 1}
+    assert (admission.admitted, admission.peak_uploads) == (4, 3)
+
+def test_byte_budget_limit(admission):
+    with admission.admit("a", 500), admission.admit("b", 400):
+        refused(admission, "c", 200)
+        with admission.admit("c", 100):
+            assert admission.metrics()['inflight_bytes'] == 1000
+    assert admission.rejected["bytes"] == 1
+
+def test_an_idle_server_admits_any_size(admission):
+    with admission.admit("a", 50000):
+        refused(admission, "b", 1)
+    assert admission.rejected["bytes"] == 1
+
+def test_per_user_limits(admission):
+    with admission.admit("a", 100), admission.admit("a", 100):
+        assert refused(admission, "a", 1).detail == "Too many uploads in progress, please retry"
+        with admission.admit("b", 100):  # other users are not affected
+            pass
+    with admission.admit("a", 500):
+        refused(admission, "a", 200)
+    assert admission.metrics()['rejected'] == {"user_uploads": 1, "user_bytes": 1}
+
+def test_slots_are_released_when_the_upload_fails(admission):
+    with pytest.raises(RuntimeError):
+        with admission.admit("a", 300):
+            raise RuntimeError("client went away")
+    metrics = admission.metrics()
+    assert (metrics['uploads'], metrics['inflight_bytes'], metrics['users']) == (0, 0, 0)
+
+def test_declared_body_size(server):
+    class FakeRequest:
+        def __init__(self, headers):
+            self.headers = headers
+    assert server.declared_body_size(FakeRequest({"content-length": "1234"}), 10000) == 1234
+    assert server.declared_body_size(FakeRequest({"content-length": "99999"}), 10000) == 10000
+    assert server.declared_body_size(FakeRequest({}), 10000) == 10000
+    assert server.declared_body_size(FakeRequest({"content-length": "-5"}), 10000) == 10000
+
+def test_upload_route_answers_503_with_retry_after(api, server, register, monkeypatch):
+    headers = register()
+    admission = server.UploadAdmission(1, 1 << 30, 1, 1 << 30, retry_after=11)
+    monkeypatch.setattr(server, "upload_admission", admission)
+    with admission.admit("someone-else", 1):
+        response = api.post("/api/audio/upload", files={"file": ("a.wav", b"RIFF", "audio/wav")},
+                            data={"project_id": "p", "track_id": "t"}, headers=headers)
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == "11"
+    assert admission.rejected == {"uploads": 1}
@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.audio_files import sine, write_wav
+
+@pytest.fixture
+def wav(tmp_path):
+    write_wav(tmp_path / "take.wav", sine(0.5, 8000), 8000)
+    return (tmp_path / "take.wav").read_bytes()
+
+@pytest.fixture
+def start(api, project):
+    project_id, headers = project
+    track_id = api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks'][0]['id']
+    def start_session(size, **fields):
+        return api.post("/api/audio/uploads", json={
+            "project_id": project_id, "track_id": track_id, "filename": "take.wav", "content_type": "audio/wav", "size": size,
+            **fields
+        }, headers=headers)
+    return start_session
+
+def send(api, headers, session_id, data, offset):
+    return api.put(f"/api/audio/uploads/{session_id}", params={"offset": offset}, content=data, headers=headers)
+
+def get_session(api, db, session_id):
+    return api.portal.call(db.upload_sessions.find_one, {"id": session_id}, {"_id": 0})
+
+def test_chunks_in_any_order(api, db, project, start, wav, tmp_path):
+    project_id, headers = project
+    session = start(len(wav)).json()
+    assert (session['status'], session['offset'], session['missing']) == ("open", 0, [[0, len(wav)]])
+    assert (tmp_path / f".{session['id']}.upload").stat().st_size == len(wav)  # reserved up front
+
+    third = len(wav) // 3
+    status = send(api, headers, session['id'], wav[2 * third:], 2 * third).json()
+    assert (status['offset'], status['missing']) == (0, [[0, 2 * third]])
+    status = send(api, headers, session['id'], wav[:third], 0).json()
+    assert (status['offset'], status['received'], status['missing']) == (third, [[0, third], [2 * third, len(wav)]], [[third, 2 * third]])
+    # A resend overlapping what already arrived
+    status = send(api, headers, session['id'], wav[third - 10:2 * third + 10], third - 10).json()
+    assert (status['offset'], status['received'], status['missing']) == (len(wav), [[0, len(wav)]], [])
+    assert api.get(f"/api/audio/uploads/{session['id']}", headers=headers).json() == status
+
+    completed = api.post(f"/api/audio/uploads/{session['id']}/complete", headers=headers)
+    assert completed.status_code == 200, completed.text
+    completed = completed.json()
+    assert completed['status'] == "complete"
+    assert (tmp_path / completed['file_id']).read_bytes() == wav
+    assert not (tmp_path / f".{session['id']}.upload").exists()
+    assert [job['type'] for job in completed['jobs']] == ["audio.probe", "audio.peaks", "audio.preview"]
+    clips = api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks'][0]['clips']
+    assert [clip['id'] for clip in clips] == [completed['clip']['id']]
+
+    # Retrying the completion returns the same clip instead of adding another
+    assert api.post(f"/api/audio/uploads/{session['id']}/complete", headers=headers).json() == completed
+    assert len(api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks'][0]['clips']) == 1
+    assert send(api, headers, session['id'], wav[:10], 0).status_code == 409
+
+def test_chunks_in_parallel(api, db, project, start, wav, tmp_path):
+    _, headers = project
+    session = start(len(wav)).json()
+    offsets = range(0, len(wav), 1000)
+    with ThreadPoolExecutor(4) as pool:
+        sent = list(pool.map(lambda offset: send(api, headers, session['id'], wav[offset:offset + 1000], offset), offsets))
+    assert {response.status_code for response in sent} == {200}
+    status = api.get(f"/api/audio/uploads/{session['id']}", headers=headers).json()
+    assert (status['received'], status['missing']) == ([[0, len(wav)]], [])
+    assert len(get_session(api, db, session['id'])['received']) == len(offsets)  # every chunk was recorded
+    assert (tmp_path / f".{session['id']}.upload").read_bytes() == wav
+
+@pytest.mark.parametrize("fields, status_code", [
+    ({"content_type": "text/plain"}, 400),
+    ({"size": 0}, 413),
+    ({"size": 10 ** 12}, 413),
+    ({"track_id": "nope"}, 404),
+])
+def test_sessions_are_checked_when_created(api, db, start, tmp_path, fields, status_code):
+    response = start(**{"size": 1000, **fields})
+    assert response.status_code == status_code
+    assert api.portal.call(db.upload_sessions.count_documents, {}) == 0
+    assert list(tmp_path.glob(".*.upload")) == []
+
+def test_chunks_must_fit_the_declared_size(api, db, project, start):
+    _, headers = project
+    session = start(100).json()
+    assert send(api, headers, session['id'], b"x", 100).status_code == 400
+    assert send(api, headers, session['id'], b"x", -1).status_code == 400
+    assert send(api, headers, session['id'], b"x" * 11, 90).status_code == 413
+    assert get_session(api, db, session['id'])['received'] == []
+
+def test_incomplete_upload_cannot_be_completed(api, db, project, start, wav):
+    _, headers = project
+    session = start(len(wav)).json()
+    send(api, headers, session['id'], wav[:100], 0)
+    response = api.post(f"/api/audio/uploads/{session['id']}/complete", headers=headers)
+    assert response.status_code == 409
+    assert f"[[100, {len(wav)}]]" in response.json()['detail']
+    assert get_session(api, db, session['id'])['status'] == "open"
+
+def test_sessions_belong_to_their_user(api, project, start, register, wav):
+    _, headers = project
+    session = start(len(wav)).json()
+    stranger = register("stranger")
+    assert api.get(f"/api/audio/uploads/{session['id']}", headers=stranger).status_code == 404
+    assert send(api, stranger, session['id'], wav, 0).status_code == 404
+    assert api.delete(f"/api/audio/uploads/{session['id']}", headers=stranger).status_code == 404
+
+def test_completion_is_claimed_once(api, db, project, start, wav):
+    project_id, headers = project
+    session = start(len(wav)).json()
+    send(api, headers, session['id'], wav, 0)
+    lease = {"status": "finalizing", "finalize_expires_at": datetime.utcnow() + timedelta(minutes=1)}
+    api.portal.call(db.upload_sessions.update_one, {"id": session['id']}, {"$set": lease})
+    assert api.post(f"/api/audio/uploads/{session['id']}/complete", headers=headers).status_code == 409
+    assert api.delete(f"/api/audio/uploads/{session['id']}", headers=headers).status_code == 409
+
+    # The completing worker died: once its lease lapses the completion can be retried
+    lapsed = {"finalize_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    api.portal.call(db.upload_sessions.update_one, {"id": session['id']}, {"$set": lapsed})
+    response = api.post(f"/api/audio/uploads/{session['id']}/complete", headers=headers)
+    assert response.status_code == 200, response.text
+    assert len(api.get(f"/api/projects/{project_id}", headers=headers).json()['tracks'][0]['clips']) == 1
+
+def test_lapsed_completion_whose_data_is_gone(api, db, project, start, wav, tmp_path):
+    _, headers = project
+    session = start(len(wav)).json()
+    send(api, headers, session['id'], wav, 0)
+    lapsed = {"status": "finalizing", "finalize_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    api.portal.call(db.upload_sessions.update_one, {"id": session['id']}, {"$set": lapsed})
+    (tmp_path / f".{session['id']}.upload").unlink()
+    assert api.post(f"/api/audio/uploads/{session['id']}/complete", headers=headers).status_code == 410
+    assert get_session(api, db, session['id']) is None
+
+def test_failed_completion_can_be_retried(api, db, project, start, wav):
+    project_id, headers = project
+    session = start(len(wav)).json()
+    send(api, headers, session['id'], wav, 0)
+    api.delete(f"/api/projects/{project_id}/tracks/{session['track_id']}", headers=headers)
+    assert api.post(f"/api/audio/uploads/{session['id']}/complete", headers=headers).status_code == 404
+    assert get_session(api, db, session['id'])['status'] == "open"  # the data is still there
+    assert api.portal.call(db.blobs.count_documents, {}) == 0
+
+def test_abort_removes_the_partial_file(api, db, project, start, wav, tmp_path):
+    _, headers = project
+    session = start(len(wav)).json()
+    send(api, headers, session['id'], wav[:100], 0)
+    assert api.delete(f"/api/audio/uploads/{session['id']}", headers=headers).status_code == 200
+    assert get_session(api, db, session['id']) is None
+    assert list(tmp_path.glob(".*.upload")) == []
+    assert api.get(f"/api/audio/uploads/{session['id']}", headers=headers).status_code == 404
+
+def test_sweeper_removes_expired_sessions(server, api, db, project, start, wav, tmp_path):
+    _, headers = project
+    expired, current = start(len(wav)).json(), start(len(wav)).json()
+    past = {"expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    api.portal.call(db.upload_sessions.update_one, {"id": expired['id']}, {"$set": past})
+    assert api.portal.call(server.sweep_upload_sessions) == 1
+    assert get_session(api, db, expired['id']) is None
+    assert [path.name for path in tmp_path.glob(".*.upload")] == [f".{current['id']}.upload"]
+    # Sending a chunk keeps a session alive
+    send(api, headers, current['id'], wav[:100], 0)
+    assert get_session(api, db, current['id'])['expires_at'] > datetime.utcnow() + timedelta(hours=1)
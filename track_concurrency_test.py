@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+BandLab DAW Track Concurrency Test
+Fires hundreds of parallel track edits at one project and verifies that no
+edit is lost to a read-modify-write race.
+"""
+
+import requests
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('/app/frontend/.env')
+
+# Get backend URL from environment
+BACKEND_URL = os.getenv('REACT_APP_BACKEND_URL', 'http://localhost:8001')
+API_BASE = f"{BACKEND_URL}/api"
+
+TRACK_COUNT = int(os.getenv('CONCURRENCY_TRACKS', '20'))
+EFFECT_COUNT = int(os.getenv('CONCURRENCY_EFFECTS', '200'))
+WORKERS = int(os.getenv('CONCURRENCY_WORKERS', '50'))
+
+def create_session():
+    session = requests.Session()
+    timestamp = str(int(datetime.now().timestamp() * 1000))
+    response = session.post(f"{API_BASE}/auth/register", json={
+        "username": f"concurrency_{timestamp}",
+        "email": f"concurrency_{timestamp}@bandlab.com",
+        "password": "Concurrency123!",
+        "display_name": f"Concurrency {timestamp}"
+    })
+    response.raise_for_status()
+    session.headers.update({'Authorization': f"Bearer {response.json()['token']}"})
+    return session
+
+def main():
+    print("🧪 Track concurrency test")
+    print(f"Backend URL: {API_BASE}")
+    print("=" * 60)
+
+    session = create_session()
+    project_id = session.post(f"{API_BASE}/projects", json={"name": "Concurrency Test"}).json()['id']
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        # Create tracks in parallel; every one of them must survive
+        responses = list(executor.map(
+            lambda i: session.post(f"{API_BASE}/projects/{project_id}/tracks",
+                                   json={"name": f"Track {i}", "instrument": "Audio"}),
+            range(TRACK_COUNT)
+        ))
+        track_ids = [r.json()['id'] for r in responses if r.status_code == 200]
+        target = track_ids[0]
+
+        # Hammer one track with effect additions plus volume and pan edits,
+        # and every other track with its own volume edit, all at once
+        jobs = [("effect", target, i) for i in range(EFFECT_COUNT)]
+        jobs += [("volume", track_id, i) for i, track_id in enumerate(track_ids[1:], start=1)]
+        jobs += [("pan", target, 0), ("volume", target, 0)]
+
+        def run(job):
+            kind, track_id, i = job
+            if kind == "effect":
+                return session.post(f"{API_BASE}/projects/{project_id}/tracks/{track_id}/effects",
+                                    json={"type": "reverb", "name": f"Reverb {i}"})
+            if kind == "pan":
+                return session.put(f"{API_BASE}/projects/{project_id}/tracks/{track_id}", json={"pan": -25.0})
+            return session.put(f"{API_BASE}/projects/{project_id}/tracks/{track_id}", json={"volume": float(i)})
+
+        statuses = [r.status_code for r in executor.map(run, jobs)]
+
+    failures = [status for status in statuses if status != 200]
+    project = session.get(f"{API_BASE}/projects/{project_id}").json()
+    tracks = {track['id']: track for track in project['tracks']}
+
+    problems = []
+    if failures:
+        problems.append(f"{len(failures)} requests failed: {sorted(set(failures))}")
+    if len(tracks) != TRACK_COUNT:
+        problems.append(f"expected {TRACK_COUNT} tracks, found {len(tracks)}")
+    effect_names = {effect.get('name') for effect in tracks.get(target, {}).get('effects', [])}
+    missing_effects = EFFECT_COUNT - len(effect_names & {f"Reverb {i}" for i in range(EFFECT_COUNT)})
+    if missing_effects:
+        problems.append(f"{missing_effects} of {EFFECT_COUNT} effects lost")
+    if tracks.get(target, {}).get('pan') != -25.0 or tracks.get(target, {}).get('volume') != 0.0:
+        problems.append("concurrent pan/volume edits on the same track clobbered each other")
+    lost_volumes = [i for i, track_id in enumerate(track_ids[1:], start=1)
+                    if tracks.get(track_id, {}).get('volume') != float(i)]
+    if lost_volumes:
+        problems.append(f"{len(lost_volumes)} volume edits lost")
+
+    session.delete(f"{API_BASE}/projects/{project_id}")
+
+    print(f"Sent {len(jobs) + TRACK_COUNT} parallel edits with {WORKERS} workers")
+    print("=" * 60)
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        return False
+    print("✅ No edits lost")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)